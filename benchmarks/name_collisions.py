@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""Microbenchmark: numbered-variant lookup on heavily clashing names.
+
+Builds a folder snapshot where every name has many numbered duplicates
+(IMG_0001.jpg, IMG_0001(1).jpg, ... as in burst and screenshot libraries)
+and reports how many variants per second are found by probing from (1)
+every time (checkIfSameName) and by NameAllocator, plus full matching
+with resolveMedia() on a MediaIndex.
+
+Usage:
+    python benchmarks/name_collisions.py [--bases N] [--duplicates D] [--repeat R]
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+from typing import Callable
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "files"))
+
+from auxFunctions import checkIfSameName, resolveMedia  # noqa: E402
+from media_index import MediaIndex  # noqa: E402
+from names import NameAllocator  # noqa: E402
+
+
+def make_titles(bases: int, duplicates: int) -> list[str]:
+    """Sidecar titles: each base name ``duplicates`` times, interleaved."""
+    return [f"IMG_{b:04d}.jpg" for _ in range(duplicates) for b in range(bases)]
+
+
+def make_folder(bases: int, duplicates: int) -> list[str]:
+    """Media names in the folder: each base name and its numbered duplicates."""
+    names = []
+    for b in range(bases):
+        names.append(f"IMG_{b:04d}.jpg")
+        names.extend(f"IMG_{b:04d}({i}).jpg" for i in range(1, duplicates))
+    return names
+
+
+def linear_probe(titles: list[str], duplicates: int) -> None:
+    claimed: set[str] = set()
+    for title in titles:
+        claimed.add(checkIfSameName(title, claimed, max_attempts=duplicates))
+
+
+def allocator(titles: list[str], duplicates: int) -> None:
+    names = NameAllocator()
+    for title in titles:
+        names.allocate(title)
+
+
+def match_folder(folder: list[str]) -> Callable[[list[str], int], None]:
+    def run(titles: list[str], duplicates: int) -> None:
+        index = MediaIndex("/takeout", folder)
+        for title in titles:
+            match = resolveMedia(title, index, "edited")
+            index.claim(match.name)
+    return run
+
+
+def measure(label: str, run: Callable[[list[str], int], None], titles: list[str], duplicates: int,
+            repeat: int) -> None:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run(titles, duplicates)
+        best = min(best, time.perf_counter() - start)
+    print(f"{label:<26} {len(titles) / best:>12,.0f} names/s  ({best:.3f} s)")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bases", type=int, default=20, help="Distinct base names (default: 20)")
+    parser.add_argument("--duplicates", type=int, default=1000, help="Copies of each name (default: 1000)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per method; the best is reported")
+    args = parser.parse_args()
+
+    titles = make_titles(args.bases, args.duplicates)
+    print(f"{len(titles)} names, {args.bases} bases with {args.duplicates} copies each\n")
+    measure("checkIfSameName (probe)", linear_probe, titles, args.duplicates, args.repeat)
+    measure("NameAllocator", allocator, titles, args.duplicates, args.repeat)
+    measure("resolveMedia + MediaIndex", match_folder(make_folder(args.bases, args.duplicates)), titles,
+            args.duplicates, args.repeat)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
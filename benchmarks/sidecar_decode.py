@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""Microbenchmark: sidecar parse throughput per decoding backend.
+
+Generates a corpus of realistic Google Takeout sidecars (people, URLs,
+imageViews, googlePhotosOrigin, ...) and reports how many sidecars per
+second each installed backend decodes, next to a plain json.load of the
+whole document.
+
+Usage:
+    python benchmarks/sidecar_decode.py [--count N] [--repeat R]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Callable
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "files"))
+
+from sidecar import BACKENDS, decode_sidecar  # noqa: E402
+
+
+def make_sidecar(i: int, rng: random.Random) -> dict:
+    """A sidecar shaped like the ones in a Google Takeout export."""
+    taken = 1262304000 + rng.randrange(400_000_000)
+    lat, lng = rng.uniform(-90, 90), rng.uniform(-180, 180)
+    return {
+        "title": f"IMG_{i:06d}.jpg",
+        "description": "",
+        "imageViews": str(rng.randrange(1000)),
+        "creationTime": {"timestamp": str(taken + 60), "formatted": "1 Jan 2021, 00:01:00 UTC"},
+        "photoTakenTime": {"timestamp": str(taken), "formatted": "1 Jan 2021, 00:00:00 UTC"},
+        "geoData": {"latitude": lat, "longitude": lng, "altitude": rng.uniform(0, 500),
+                    "latitudeSpan": 0.0, "longitudeSpan": 0.0},
+        "geoDataExif": {"latitude": lat, "longitude": lng, "altitude": rng.uniform(0, 500),
+                        "latitudeSpan": 0.0, "longitudeSpan": 0.0},
+        "people": [{"name": f"Person {rng.randrange(50)}"} for _ in range(rng.randrange(4))],
+        "url": f"https://photos.google.com/photo/AF1Qip{rng.getrandbits(128):032x}",
+        "googlePhotosOrigin": {"mobileUpload": {"deviceFolder": {"localFolderName": "Camera"},
+                                                "deviceType": "ANDROID_PHONE"}},
+        "appSource": {"androidPackageName": "com.google.android.GoogleCamera"},
+    }
+
+
+def measure(label: str, decode: Callable[[bytes], object], corpus: list[bytes], repeat: int) -> None:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for raw in corpus:
+            decode(raw)
+        best = min(best, time.perf_counter() - start)
+    print(f"{label:<22} {len(corpus) / best:>12,.0f} sidecars/s")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=20_000, help="Sidecars in the corpus (default: 20000)")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per backend; the best is reported")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as folder:
+        # Written to disk and read back, so the corpus matches real files byte for byte
+        for i in range(args.count):
+            with open(os.path.join(folder, f"IMG_{i:06d}.jpg.json"), "w", encoding="utf8") as f:
+                json.dump(make_sidecar(i, rng), f, indent=2)
+        corpus = []
+        for name in sorted(os.listdir(folder)):
+            with open(os.path.join(folder, name), "rb") as f:
+                corpus.append(f.read())
+
+    size = sum(len(raw) for raw in corpus) / len(corpus)
+    print(f"{len(corpus)} sidecars, {size:.0f} bytes each on average\n")
+    measure("json.loads (full)", json.loads, corpus, args.repeat)
+    for backend in BACKENDS:
+        measure(f"decode_sidecar[{backend}]", lambda raw, b=backend: decode_sidecar(raw, b), corpus, args.repeat)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,262 @@
+"""Reading Takeout exports straight out of their .zip/.tgz archives.
+
+Google splits large exports into parts (takeout-...-001.zip, -002.zip, ...)
+and a sidecar can end up in a different part than its media. All parts are
+indexed into one TreeIndex of archive member paths, so matching works as for
+an extracted folder. Sidecars are decoded from memory, and only matched media
+(and EditedRaw originals) are written to disk, directly at their destination
+under MatchedMedia/EditedRaw, where the executor then fixes them in place.
+
+Zip parts are indexed from their central directory and read in member
+order. Tar parts (.tgz, .tar.gz, .tar) can only be streamed, so they are
+read twice: once for names and sidecars, once for the matched media.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import posixpath
+import shutil
+import tarfile
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import IO, Iterable, Iterator, NamedTuple, Optional
+
+from media_index import MediaIndex, TreeIndex
+from sidecar import SidecarRecord, decode_sidecar
+
+logger = logging.getLogger("GooglePhotosMatcher")
+
+__all__ = ["ARCHIVE_SUFFIXES", "ArchiveMember", "TakeoutArchive", "find_archives", "is_archive"]
+
+ARCHIVE_SUFFIXES = (".zip", ".tgz", ".tar.gz", ".tar")
+
+# Copy buffer for extracted media
+_COPY_BUFFER = 1 << 20
+
+
+def is_archive(path: str) -> bool:
+    """Return True if ``path`` names a supported archive."""
+    return path.casefold().endswith(ARCHIVE_SUFFIXES)
+
+
+def find_archives(path: str) -> list[str]:
+    """Archive parts to read: ``path`` itself, or every archive in the folder.
+
+    Raises:
+        FileNotFoundError: If ``path`` is not an archive or a folder
+                           containing archives
+    """
+    if os.path.isfile(path):
+        if not is_archive(path):
+            raise FileNotFoundError(f"Not a Takeout archive: {path}")
+        return [path]
+    parts = sorted(
+        entry.path for entry in os.scandir(path)
+        if entry.is_file() and is_archive(entry.name)
+    )
+    if not parts:
+        raise FileNotFoundError(f"No Takeout archives found in {path}")
+    return parts
+
+
+def _is_tar(part: str) -> bool:
+    return not part.casefold().endswith(".zip")
+
+
+def _is_safe(member: str) -> bool:
+    """Whether ``member`` is a relative path that stays inside the export."""
+    parts = member.replace("\\", "/").split("/")
+    # "C:" in the first component is a Windows drive
+    return not (parts[0] == "" or ":" in parts[0] or ".." in parts)
+
+
+def _split(member: str) -> tuple[str, str]:
+    """Folder and name of an archive member path."""
+    folder, name = posixpath.split(member)
+    return folder or ".", name
+
+
+class ArchiveMember(NamedTuple):
+    """Where a file of the export is stored.
+
+    Attributes:
+        part: Archive part containing the file
+        name: Member name inside the part
+        order: Position of the member in its part, for sequential reads
+    """
+    part: str
+    name: str
+    order: int
+
+
+class TakeoutArchive:
+    """The files of a Takeout export, spread over one or more archive parts.
+
+    Attributes:
+        parts: Archive paths, in sorted order
+        members: Location of every file, keyed by (folder, name)
+    """
+
+    def __init__(self, parts: Iterable[str]) -> None:
+        self.parts = list(parts)
+        self.members: dict[tuple[str, str], ArchiveMember] = {}
+        self._sidecars: dict[tuple[str, str], bytes] = {}
+
+    @classmethod
+    def open(cls, path: str) -> TakeoutArchive:
+        """Index the archive at ``path``, or every archive part in that folder."""
+        archive = cls(find_archives(path))
+        for part in archive.parts:
+            if _is_tar(part):
+                archive._index_tar(part)
+            else:
+                archive._index_zip(part)
+        logger.debug(f"Indexed {len(archive.members)} file(s) in {len(archive.parts)} archive part(s)")
+        return archive
+
+    def _add(self, part: str, name: str, order: int) -> bool:
+        if not _is_safe(name):
+            logger.warning(f"Ignoring {name} in {part}: absolute path or '..' component")
+            return False
+        key = _split(name)
+        if key in self.members:
+            logger.warning(f"Ignoring {name} in {part}: already found in {self.members[key].part}")
+            return False
+        self.members[key] = ArchiveMember(part, name, order)
+        return True
+
+    def _index_zip(self, part: str) -> None:
+        with zipfile.ZipFile(part) as zf:
+            for order, info in enumerate(zf.infolist()):
+                if not info.is_dir():
+                    self._add(part, info.filename, order)
+
+    def _index_tar(self, part: str) -> None:
+        # Sidecars are small; keep them so the stream is only read once here
+        with tarfile.open(part, "r|*") as tf:
+            for order, info in enumerate(tf):
+                if info.isfile() and self._add(part, info.name, order) and info.name.endswith(".json"):
+                    source = tf.extractfile(info)
+                    if source is not None:
+                        self._sidecars[_split(info.name)] = source.read()
+
+    def tree(self) -> TreeIndex:
+        """A TreeIndex over the member paths of every part.
+
+        The root is the deepest folder above every folder with sidecars
+        (typically Takeout/Google Photos), so each album maps to a folder
+        under MatchedMedia, whichever parts are read.
+        """
+        by_folder: dict[str, list[str]] = {}
+        for folder, name in self.members:
+            by_folder.setdefault(folder, []).append(name)
+        parents = {posixpath.dirname(folder) for folder, name in self.members if name.endswith(".json")}
+        root = posixpath.commonpath(parents) if parents else "."
+
+        tree = TreeIndex(root or ".")
+        for folder in sorted(by_folder):
+            names = by_folder[folder]
+            tree.folders[folder] = MediaIndex(folder, names)
+            tree.sidecars[folder] = [name for name in names if name.endswith(".json")]
+        return tree
+
+    def read_sidecars(self, paths: list[str]) -> list[tuple[Optional[SidecarRecord], Optional[str]]]:
+        """Decode sidecars by member path; planner reader for archive runs."""
+        results: list[tuple[Optional[SidecarRecord], Optional[str]]] = []
+        handles: dict[str, zipfile.ZipFile] = {}
+        try:
+            for path in paths:
+                key = os.path.split(path)
+                try:
+                    raw = self._sidecars.get(key)
+                    if raw is None:
+                        member = self.members[key]
+                        if member.part not in handles:
+                            handles[member.part] = zipfile.ZipFile(member.part)
+                        raw = handles[member.part].read(member.name)
+                    results.append((decode_sidecar(raw), None))
+                except Exception as e:
+                    results.append((None, str(e)))
+        finally:
+            for zf in handles.values():
+                zf.close()
+        return results
+
+    def extract(self, targets: dict[tuple[str, str], str], max_workers: int = 1) -> dict[tuple[str, str], str]:
+        """Write members to their destinations, one part per worker.
+
+        Args:
+            targets: Destination path per (folder, name) member key
+            max_workers: Number of parts read concurrently
+
+        Returns:
+            Error message per member that could not be written
+        """
+        by_part: dict[str, list[tuple[ArchiveMember, str, tuple[str, str]]]] = {}
+        errors: dict[tuple[str, str], str] = {}
+        for key, destination in targets.items():
+            member = self.members.get(key)
+            if member is None:
+                errors[key] = "not found in the archives"
+                continue
+            by_part.setdefault(member.part, []).append((member, destination, key))
+
+        def extract_part(part: str) -> None:
+            wanted = sorted(by_part[part], key=lambda item: item[0].order)
+            if _is_tar(part):
+                self._extract_tar(part, wanted, errors)
+            else:
+                self._extract_zip(part, wanted, errors)
+
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(by_part) or 1))) as pool:
+            for part, future in [(part, pool.submit(extract_part, part)) for part in by_part]:
+                try:
+                    future.result()
+                except (OSError, zipfile.BadZipFile, tarfile.TarError) as e:
+                    logger.error(f"Could not read {part}: {e}")
+                    for _, _, key in by_part[part]:
+                        errors.setdefault(key, str(e))
+        return errors
+
+    @staticmethod
+    def _write(source: IO[bytes], destination: str) -> None:
+        with open(destination, "wb") as target:
+            shutil.copyfileobj(source, target, _COPY_BUFFER)
+
+    def _extract_zip(self, part: str, wanted: list, errors: dict) -> None:
+        with zipfile.ZipFile(part) as zf:
+            for member, destination, key in wanted:
+                try:
+                    with zf.open(member.name) as source:
+                        self._write(source, destination)
+                except (OSError, zipfile.BadZipFile) as e:
+                    errors[key] = str(e)
+
+    def _extract_tar(self, part: str, wanted: list, errors: dict) -> None:
+        pending: dict[str, tuple[str, tuple[str, str]]] = {
+            member.name: (destination, key) for member, destination, key in wanted
+        }
+        with tarfile.open(part, "r|*") as tf:
+            for info in tf:
+                target = pending.pop(info.name, None)
+                if target is None:
+                    continue
+                destination, key = target
+                source = tf.extractfile(info)
+                try:
+                    if source is None:
+                        raise OSError(f"{info.name} is not a regular file")
+                    self._write(source, destination)
+                except OSError as e:
+                    errors[key] = str(e)
+                if not pending:
+                    break
+        for destination, key in pending.values():
+            errors[key] = "not found in the archives"
+
+    def __iter__(self) -> Iterator[tuple[str, str]]:
+        return iter(self.members)
+
+    def __len__(self) -> int:
+        return len(self.members)
@@ -1,15 +1,23 @@
 from __future__ import annotations
 
+import io
 import logging
 import os
 import platform
+import re
+import shutil
+import struct
+import tempfile
 import time
 from datetime import datetime
-from typing import Optional
+from typing import NamedTuple, Optional
 
 import piexif
 from fractions import Fraction
 
+from fileops import copy_range
+from media_index import MediaIndex
+
 # Get logger (initialized in main.py via setup_logging)
 logger = logging.getLogger("GooglePhotosMatcher")
 
@@ -19,94 +27,150 @@ if platform.system() == "Windows":
 
 # Public API
 __all__ = [
+    'MediaMatch',
+    'resolveMedia',
     'searchMedia',
     'fixTitle',
     'checkIfSameName',
     'createFolders',
     'set_file_times',
     'set_EXIF',
+    'copy_EXIF',
+    'exif_matches',
+    'build_EXIF',
+    'atomic_write',
 ]
 
+# Google Photos truncates long media names to 46-51 characters with the
+# extension, depending on the extension, before suffixes like -edited and
+# (1). Only longer titles are looked up, by their first TRUNCATED_PREFIX
+# characters, and only names cut at one of these lengths are taken for
+# truncated ones.
+TRUNCATED_LENGTHS = range(46, 52)
+TRUNCATED_PREFIX = 30
+
+_NUMBERED = re.compile(r"\((\d+)\)$")
+
+
+class MediaMatch(NamedTuple):
+    """Media file resolved for a JSON title.
+
+    Attributes:
+        name: Filename of the matched media
+        raw_original: Unedited original to move to the nonEdited folder, if any
+    """
+    name: str
+    raw_original: Optional[str] = None
+
+
+def resolveMedia(title: str, index: MediaIndex, editedWord: str) -> Optional[MediaMatch]:
+    """Resolve the media file for a JSON title without touching the filesystem.
+
+    Tries multiple filename patterns in priority order against ``index``.
+    Claimed names in the index are skipped. When an edited or (1) version
+    wins, the unedited original is reported so the caller can move it.
+    """
+    title = fixTitle(title)
+    base, ext = title.rsplit('.', 1) if '.' in title else (title, '')
+    ext = '.' + ext if ext else ''
+
+    def with_original(candidate: str, original: str) -> MediaMatch:
+        return MediaMatch(candidate, original if index.is_available(original) else None)
+
+    # Edited version - the original goes to the nonEdited folder
+    edited_candidate = f"{base}-{editedWord}{ext}"
+    if index.is_available(edited_candidate):
+        return with_original(edited_candidate, title)
+
+    # Duplicate (1) version, unless it has its own JSON
+    dup_candidate = f"{base}(1){ext}"
+    if index.is_available(dup_candidate) and not index.exists(f"{title}(1).json"):
+        return with_original(dup_candidate, title)
+
+    # Original name
+    if index.is_available(title):
+        return MediaMatch(title)
+
+    # Numbered variants
+    variant = index.unclaimed_variant(title)
+    if index.exists(variant):
+        return MediaMatch(variant)
+
+    # Truncated versions
+    if len(title) > TRUNCATED_LENGTHS.start:
+        return _resolve_truncated(base, ext, index, editedWord)
+
+    return None
+
+
+def _resolve_truncated(base: str, ext: str, index: MediaIndex, editedWord: str) -> Optional[MediaMatch]:
+    """Resolve a title whose media name was truncated by Google Photos.
+
+    Candidates come from one prefix lookup in ``index``. A candidate fits
+    if, without its -edited or (n) suffix, it is a shorter prefix of the
+    title cut at one of TRUNCATED_LENGTHS. The longest fit wins; on ties the edited version comes first,
+    then the (1) duplicate, the plain name and the other numbered variants,
+    as for untruncated names.
+    """
+    best: Optional[tuple[tuple[int, int, int], str, str]] = None
+    for name in index.with_prefix(base[:TRUNCATED_PREFIX]):
+        if not name.endswith(ext) or not index.is_available(name):
+            continue
+        stem = name[:len(name) - len(ext)]
+        number = -1
+        if stem.endswith(f"-{editedWord}"):
+            stem = stem[:-len(editedWord) - 1]
+        else:
+            numbered = _NUMBERED.search(stem)
+            number = int(numbered.group(1)) if numbered else 0
+            stem = stem[:numbered.start()] if numbered else stem
+        if len(stem) + len(ext) not in TRUNCATED_LENGTHS or len(stem) >= len(base) or not base.startswith(stem):
+            continue
+        rank = (-len(stem), 0 if number == -1 else 1 if number == 1 else 2, number)
+        if best is None or rank < best[0]:
+            best = (rank, name, stem)
+
+    if best is None:
+        return None
+    rank, name, stem = best
+    original = stem + ext
+    # Like untruncated names, the edited and (1) versions bring their original
+    if rank[1] < 2 and index.is_available(original):
+        return MediaMatch(name, original)
+    return MediaMatch(name)
+
 
 def searchMedia(
     path: str,
     title: str,
     mediaMoved: set[str],
     nonEdited: str,
-    editedWord: str
+    editedWord: str,
+    index: Optional[MediaIndex] = None
 ) -> Optional[str]:
     """Search for media file associated with JSON metadata.
 
     Tries multiple filename patterns in priority order.
     Returns the found filename or None if not found.
+
+    Existence checks are answered by ``index`` rather than the filesystem.
+    When no index is given, ``path`` is listed once to build one with
+    ``mediaMoved`` as its claimed set. If an edited version is found, the
+    original is moved to ``nonEdited`` right away; use resolveMedia() to
+    get the match without moving anything.
     """
-    title = fixTitle(title)
-    base, ext = title.rsplit('.', 1) if '.' in title else (title, '')
-    ext = '.' + ext if ext else ''
+    if index is None:
+        index = MediaIndex.scan(path, claimed=mediaMoved)
 
-    # Define search patterns in priority order
-    candidates = [
-        f"{base}-{editedWord}{ext}",      # Edited version (e.g., photo-edited.jpg)
-        f"{base}(1){ext}",                 # Duplicate naming (e.g., photo(1).jpg)
-        title,                             # Original name
-    ]
-
-    # Also try truncated versions (Google Photos limits to 47 chars)
-    truncated_base = base[:47]
-    if truncated_base != base:
-        candidates.extend([
-            f"{truncated_base}-{editedWord}{ext}",  # Truncated + edited
-            f"{truncated_base}(1){ext}",            # Truncated + duplicate
-            f"{truncated_base}{ext}",               # Truncated original
-        ])
-
-    # Check for edited version - if found, move original to nonEdited folder
-    edited_candidate = f"{base}-{editedWord}{ext}"
-    edited_path = os.path.join(path, edited_candidate)
-    if os.path.exists(edited_path) and edited_candidate not in mediaMoved:
-        # Move original to nonEdited folder
-        original_path = os.path.join(path, title)
-        if os.path.exists(original_path):
-            os.replace(original_path, os.path.join(nonEdited, title))
-        return edited_candidate
-
-    # Check duplicate (1) version
-    dup_candidate = f"{base}(1){ext}"
-    dup_path = os.path.join(path, dup_candidate)
-    dup_json_path = os.path.join(path, f"{title}(1).json")
-    if os.path.exists(dup_path) and not os.path.exists(dup_json_path) and dup_candidate not in mediaMoved:
-        original_path = os.path.join(path, title)
-        if os.path.exists(original_path):
-            os.replace(original_path, os.path.join(nonEdited, title))
-        return dup_candidate
-
-    # Check original name
-    if os.path.exists(os.path.join(path, title)) and title not in mediaMoved:
-        return title
+    match = resolveMedia(title, index, editedWord)
+    if match is None:
+        return None
 
-    # Check with checkIfSameName for numbered variants
-    variant = checkIfSameName(title, mediaMoved)
-    if os.path.exists(os.path.join(path, variant)):
-        return variant
-
-    # Try truncated versions
-    if truncated_base != base:
-        truncated_title = f"{truncated_base}{ext}"
-        for candidate in [f"{truncated_base}-{editedWord}{ext}", f"{truncated_base}(1){ext}", truncated_title]:
-            candidate_path = os.path.join(path, candidate)
-            if os.path.exists(candidate_path) and candidate not in mediaMoved:
-                if candidate != truncated_title:
-                    original_path = os.path.join(path, truncated_title)
-                    if os.path.exists(original_path):
-                        os.replace(original_path, os.path.join(nonEdited, truncated_title))
-                return candidate
-
-        # Check truncated with checkIfSameName
-        variant = checkIfSameName(truncated_title, mediaMoved)
-        if os.path.exists(os.path.join(path, variant)):
-            return variant
+    if match.raw_original is not None:
+        os.replace(os.path.join(path, match.raw_original), os.path.join(nonEdited, match.raw_original))
+        index.discard(match.raw_original)
 
-    return None
+    return match.name
 
 
 def fixTitle(title: str) -> str:
@@ -205,37 +269,242 @@ def change_to_rational(number: float) -> tuple[int, int]:
     return (f.numerator, f.denominator)
 
 
-def set_EXIF(filepath: str, lat: float, lng: float, altitude: float, timeStamp: int) -> None:
-    exif_dict = piexif.load(filepath)
+def build_EXIF(
+    lat: Optional[float],
+    lng: Optional[float],
+    altitude: Optional[float],
+    timeStamp: int,
+    existing: Optional[bytes] = None
+) -> bytes:
+    """Return EXIF bytes with the sidecar date and GPS applied.
+
+    Tags already present in ``existing`` (raw JPEG/TIFF/Exif data) are kept;
+    date and GPS tags are overwritten.
+    """
+    exif_dict: dict = {"0th": {}, "Exif": {}, "GPS": {}, "1st": {}, "thumbnail": None}
+    if existing:
+        try:
+            exif_dict = piexif.load(existing)
+        except Exception as e:
+            logger.warning(f"Existing EXIF unreadable, writing new EXIF: {e}")
 
     dateTime = datetime.fromtimestamp(timeStamp).strftime("%Y:%m:%d %H:%M:%S")  # Create date object
     exif_dict['0th'][piexif.ImageIFD.DateTime] = dateTime
     exif_dict['Exif'][piexif.ExifIFD.DateTimeOriginal] = dateTime
     exif_dict['Exif'][piexif.ExifIFD.DateTimeDigitized] = dateTime
 
+    if lat is None or lng is None:
+        logger.debug("No coordinates in sidecar, setting date only")
+    else:
+        try:
+            lat_deg = to_deg(lat, ["S", "N"])
+            lng_deg = to_deg(lng, ["W", "E"])
+
+            exiv_lat = (change_to_rational(lat_deg[0]), change_to_rational(lat_deg[1]), change_to_rational(lat_deg[2]))
+            exiv_lng = (change_to_rational(lng_deg[0]), change_to_rational(lng_deg[1]), change_to_rational(lng_deg[2]))
+
+            gps_ifd = {
+                piexif.GPSIFD.GPSVersionID: (2, 0, 0, 0),
+                piexif.GPSIFD.GPSAltitudeRef: 1,
+                piexif.GPSIFD.GPSAltitude: change_to_rational(round(altitude or 0.0, 2)),
+                piexif.GPSIFD.GPSLatitudeRef: lat_deg[3],
+                piexif.GPSIFD.GPSLatitude: exiv_lat,
+                piexif.GPSIFD.GPSLongitudeRef: lng_deg[3],
+                piexif.GPSIFD.GPSLongitude: exiv_lng,
+            }
+
+            exif_dict['GPS'] = gps_ifd
+
+        except Exception as e:
+            logger.warning(f"Coordinates not settled: {e}")
+
+    return piexif.dump(exif_dict)
+
+
+def atomic_write(filepath: str, data: bytes | memoryview) -> None:
+    """Replace ``filepath`` with ``data`` via a temp file in the same folder.
+
+    Readers see either the old or the new content, never a partial file.
+    """
+    directory = os.path.dirname(filepath) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".gpm-", suffix=".tmp")
     try:
-        lat_deg = to_deg(lat, ["S", "N"])
-        lng_deg = to_deg(lng, ["W", "E"])
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        try:
+            shutil.copymode(filepath, tmp_path)
+        except OSError:
+            pass  # Original vanished or mode not copyable; keep mkstemp's mode
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def set_EXIF(
+    filepath: str,
+    lat: Optional[float],
+    lng: Optional[float],
+    altitude: Optional[float],
+    timeStamp: int
+) -> None:
+    """Write the sidecar date and GPS into a JPEG/WebP file.
+
+    The file is read once into memory, its EXIF segment is parsed and
+    replaced there, and the result is written once through a temp file
+    that is atomically renamed over the original.
+    """
+    with open(filepath, "rb") as f:
+        data = f.read()
 
-        exiv_lat = (change_to_rational(lat_deg[0]), change_to_rational(lat_deg[1]), change_to_rational(lat_deg[2]))
-        exiv_lng = (change_to_rational(lng_deg[0]), change_to_rational(lng_deg[1]), change_to_rational(lng_deg[2]))
+    if data[0:2] != b"\xff\xd8" and not (data[0:4] == b"RIFF" and data[8:12] == b"WEBP"):
+        raise ValueError(f"{filepath} is neither JPEG nor WebP")
 
-        gps_ifd = {
-            piexif.GPSIFD.GPSVersionID: (2, 0, 0, 0),
-            piexif.GPSIFD.GPSAltitudeRef: 1,
-            piexif.GPSIFD.GPSAltitude: change_to_rational(round(altitude, 2)),
-            piexif.GPSIFD.GPSLatitudeRef: lat_deg[3],
-            piexif.GPSIFD.GPSLatitude: exiv_lat,
-            piexif.GPSIFD.GPSLongitudeRef: lng_deg[3],
-            piexif.GPSIFD.GPSLongitude: exiv_lng,
-        }
+    exif_bytes = build_EXIF(lat, lng, altitude, timeStamp, data)
 
-        exif_dict['GPS'] = gps_ifd
+    output = io.BytesIO()
+    piexif.insert(exif_bytes, data, output)
+    atomic_write(filepath, output.getbuffer())
 
-    except Exception as e:
-        logger.warning(f"Coordinates not settled: {e}")
 
-    exif_bytes = piexif.dump(exif_dict)
-    piexif.insert(exif_bytes, filepath)
+def _is_exif_segment(segment: bytes) -> bool:
+    return segment[1] == 0xE1 and segment[4:10] == b"Exif\x00\x00"
+
+
+def _read_jpeg_header(f: io.BufferedReader) -> tuple[list[bytes], int]:
+    """Read the APPn/COM segments that follow the SOI marker of a JPEG.
+
+    Returns:
+        The segments (marker included) and the offset where the rest of
+        the file (tables and image data) starts
 
+    Raises:
+        ValueError: If the file does not start with a well-formed JPEG header
+    """
+    if f.read(2) != b"\xff\xd8":
+        raise ValueError("Not a JPEG")
+    segments = []
+    while True:
+        marker = f.read(4)
+        if len(marker) < 4 or marker[0] != 0xFF:
+            raise ValueError("Corrupt JPEG header")
+        if not (0xE0 <= marker[1] <= 0xEF or marker[1] == 0xFE):
+            return segments, f.tell() - 4
+        length = struct.unpack(">H", marker[2:])[0]
+        payload = f.read(length - 2)
+        if length < 2 or len(payload) != length - 2:
+            raise ValueError("Corrupt JPEG header")
+        segments.append(marker + payload)
+
+
+def _dms_to_degrees(dms: tuple, ref: bytes, negative: bytes) -> float:
+    degrees = sum(numerator / denominator / 60 ** i for i, (numerator, denominator) in enumerate(dms))
+    return -degrees if ref == negative else degrees
+
+
+def exif_matches(
+    filepath: str,
+    lat: Optional[float],
+    lng: Optional[float],
+    altitude: Optional[float],
+    timeStamp: int
+) -> bool:
+    """Whether a JPEG already carries the sidecar date and GPS.
+
+    Only the header segments are read, not the image data. The date must
+    be the DateTimeOriginal set_EXIF would write; coordinates are compared
+    to within about 10 cm, the altitude to the centimetre.
+    """
+    with open(filepath, "rb") as f:
+        segments, _ = _read_jpeg_header(f)
+    existing = next((segment[4:] for segment in segments if _is_exif_segment(segment)), None)
+    if existing is None:
+        return False
+    try:
+        exif_dict = piexif.load(existing)
+        dateTime = datetime.fromtimestamp(timeStamp).strftime("%Y:%m:%d %H:%M:%S").encode()
+        if exif_dict["Exif"].get(piexif.ExifIFD.DateTimeOriginal) != dateTime:
+            return False
+        if lat is None or lng is None:
+            return True
+
+        gps = exif_dict["GPS"]
+        stored_lat = _dms_to_degrees(gps[piexif.GPSIFD.GPSLatitude], gps[piexif.GPSIFD.GPSLatitudeRef], b"S")
+        stored_lng = _dms_to_degrees(gps[piexif.GPSIFD.GPSLongitude], gps[piexif.GPSIFD.GPSLongitudeRef], b"W")
+        numerator, denominator = gps[piexif.GPSIFD.GPSAltitude]
+        stored_altitude = numerator / denominator
+    except (KeyError, TypeError, ValueError, ZeroDivisionError) as e:
+        logger.debug(f"Unexpected EXIF in {filepath}: {e}")
+        return False
+    return (abs(stored_lat - lat) < 1e-6 and abs(stored_lng - lng) < 1e-6
+            and abs(stored_altitude - round(altitude or 0.0, 2)) < 0.005)
+
+
+def copy_EXIF(
+    source: str,
+    destination: str,
+    lat: Optional[float],
+    lng: Optional[float],
+    altitude: Optional[float],
+    timeStamp: int
+) -> int:
+    """Write ``source`` to ``destination`` with the sidecar date and GPS.
+
+    ``source`` is left untouched. Only the JPEG header is rebuilt in
+    memory; the rest of the file is copied with copy_range, in the kernel
+    where possible. Files whose header cannot be parsed that way (e.g.
+    WebP) are converted in memory as by set_EXIF.
 
+    Returns:
+        Size of the written file, for verifying it before ``source`` is
+        removed
+    """
+    with open(source, "rb") as src:
+        try:
+            segments, offset = _read_jpeg_header(src)
+        except ValueError:
+            src.seek(0)
+            data = src.read()
+            if data[0:2] != b"\xff\xd8" and not (data[0:4] == b"RIFF" and data[8:12] == b"WEBP"):
+                raise ValueError(f"{source} is neither JPEG nor WebP")
+            output = io.BytesIO()
+            piexif.insert(build_EXIF(lat, lng, altitude, timeStamp, data), data, output)
+            atomic_write(destination, output.getbuffer())
+            return output.getbuffer().nbytes
+
+        # Same segment layout as piexif.insert, so both modes write the same
+        # file: the EXIF replaces a leading JFIF (APP0) segment and the EXIF
+        # segment that directly follows the SOI or the JFIF segment
+        head = segments[:2]
+        if head and head[0][1] == 0xE0:
+            head = head[1:] if len(head) > 1 and _is_exif_segment(head[1]) else []
+            rest = segments[1 + len(head):]
+        else:
+            head = head[:1] if head and _is_exif_segment(head[0]) else []
+            rest = segments[len(head):]
+        existing = next((segment[4:] for segment in segments if _is_exif_segment(segment)), None)
+        exif_bytes = build_EXIF(lat, lng, altitude, timeStamp, existing)
+        if len(exif_bytes) + 2 > 0xFFFF:
+            raise ValueError("EXIF data too large for a JPEG segment")
+        header = b"".join([b"\xff\xd8\xff\xe1", struct.pack(">H", len(exif_bytes) + 2), exif_bytes, *rest])
+
+        directory = os.path.dirname(destination) or "."
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".gpm-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(header)
+                f.flush()
+                size = os.fstat(src.fileno()).st_size - offset
+                copy_range(src.fileno(), f.fileno(), offset, size)
+            shutil.copymode(source, tmp_path)
+            os.replace(tmp_path, destination)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+    return len(header) + size
@@ -0,0 +1,178 @@
+"""Persistent catalog of parsed sidecars, so re-runs skip unchanged JSON.
+
+Rows are keyed by the sidecar's path relative to the Takeout folder and
+validated by its size and mtime. Each row keeps the fields the planner
+needs (title, photoTakenTime, geoData) and the media it was matched to,
+which is reused as long as that media is still available.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import sqlite3
+from typing import Iterable, NamedTuple, Optional
+
+from auxFunctions import MediaMatch
+from sidecar import SidecarRecord
+
+logger = logging.getLogger("GooglePhotosMatcher")
+
+__all__ = ["CATALOG_NAME", "CatalogEntry", "SidecarCatalog"]
+
+# Stored in the Takeout folder, next to MatchedMedia (in the output root
+# in copy and link modes)
+CATALOG_NAME = ".matcher-catalog.sqlite"
+
+# Bumped whenever the table layout changes; older catalogs are rebuilt
+SCHEMA_VERSION = 2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sidecars (
+    path TEXT PRIMARY KEY,
+    folder TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    title TEXT,
+    timestamp INTEGER,
+    latitude REAL,
+    longitude REAL,
+    altitude REAL,
+    match TEXT,
+    raw_original TEXT
+)
+"""
+
+_COLUMNS = "path, folder, size, mtime_ns, title, timestamp, latitude, longitude, altitude, match, raw_original"
+
+
+class CatalogEntry(NamedTuple):
+    """A cached sidecar.
+
+    Attributes:
+        record: Sidecar fields used for matching
+        match: Media matched on the previous run, if any
+    """
+    record: SidecarRecord
+    match: Optional[MediaMatch]
+
+
+class SidecarCatalog:
+    """SQLite-backed cache of parsed sidecars under one Takeout folder.
+
+    Example:
+        with SidecarCatalog.open(root) as catalog:
+            entry = catalog.lookup(path)
+    """
+
+    def __init__(self, root: str, db_path: Optional[str] = None, readonly: bool = False) -> None:
+        self.root = root
+        self.db_path = db_path or os.path.join(root, CATALOG_NAME)
+        self.readonly = readonly
+        if readonly:
+            uri = "file:" + os.path.abspath(self.db_path) + "?mode=ro"
+            self._conn = sqlite3.connect(uri, uri=True)
+        else:
+            self._conn = sqlite3.connect(self.db_path)
+            if self._conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                with self._conn:
+                    self._conn.execute("DROP TABLE IF EXISTS sidecars")
+                    self._conn.execute(_SCHEMA)
+                    self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self._rows: Optional[dict[str, tuple]] = None
+        self._pending: list[tuple] = []
+
+    @classmethod
+    def open(cls, root: str, readonly: bool = False, folder: Optional[str] = None) -> Optional["SidecarCatalog"]:
+        """Open the catalog of ``root``, kept in ``folder`` (default: ``root``); None if it cannot be used.
+
+        A read-only catalog is only opened if it already exists.
+        """
+        db_path = os.path.join(folder or root, CATALOG_NAME)
+        if readonly and not os.path.exists(db_path):
+            return None
+        try:
+            return cls(root, db_path, readonly)
+        except sqlite3.Error as e:
+            logger.warning(f"Sidecar catalog unavailable, parsing every JSON: {e}")
+            return None
+
+    def __enter__(self) -> "SidecarCatalog":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    def _key(self, path: str) -> str:
+        return os.path.relpath(path, self.root)
+
+    def _load(self) -> dict[str, tuple]:
+        if self._rows is None:
+            try:
+                cursor = self._conn.execute(f"SELECT {_COLUMNS} FROM sidecars")
+                self._rows = {row[0]: row for row in cursor}
+            except sqlite3.Error as e:
+                logger.warning(f"Could not read sidecar catalog: {e}")
+                self._rows = {}
+        return self._rows
+
+    def lookup(self, path: str, stat: Optional[os.stat_result]) -> Optional[CatalogEntry]:
+        """Return the cached entry for ``path`` if the file is unchanged."""
+        if stat is None:
+            return None
+        row = self._load().get(self._key(path))
+        if row is None or row[2] != stat.st_size or row[3] != stat.st_mtime_ns:
+            return None
+        match, raw_original = row[9:]
+        return CatalogEntry(SidecarRecord(*row[4:9]), MediaMatch(match, raw_original) if match is not None else None)
+
+    def record(
+        self,
+        path: str,
+        stat: os.stat_result,
+        record: SidecarRecord,
+        match: Optional[MediaMatch]
+    ) -> None:
+        """Queue ``path`` to be stored; written by flush()."""
+        key = self._key(path)
+        self._pending.append((
+            key,
+            os.path.dirname(key),
+            stat.st_size,
+            stat.st_mtime_ns,
+            record.title,
+            record.timestamp,
+            record.latitude,
+            record.longitude,
+            record.altitude,
+            match.name if match else None,
+            match.raw_original if match else None,
+        ))
+
+    def flush(self, folders: Iterable[str] = ()) -> None:
+        """Write queued entries and forget sidecars gone from ``folders``.
+
+        Args:
+            folders: Folders that were fully scanned; rows under them that
+                     were not recorded in this run are deleted
+        """
+        if self.readonly:
+            self._pending.clear()
+            return
+        seen = {row[0] for row in self._pending}
+        scanned = {os.path.relpath(folder, self.root) for folder in folders}
+        scanned = {"" if folder == "." else folder for folder in scanned}
+        stale = [(path,) for path, row in self._load().items() if row[1] in scanned and path not in seen]
+        try:
+            with self._conn:
+                self._conn.executemany("DELETE FROM sidecars WHERE path = ?", stale)
+                self._conn.executemany(
+                    f"INSERT OR REPLACE INTO sidecars ({_COLUMNS}) VALUES ({', '.join('?' * 11)})",
+                    self._pending
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"Could not update sidecar catalog: {e}")
+        self._pending.clear()
+        self._rows = None
+
+    def close(self) -> None:
+        self._conn.close()
@@ -13,6 +13,37 @@ except ImportError:
     from .logger import setup_logging
 
 
+# Size suffixes, by power of 1024
+_SIZE_UNITS = "KMGT"
+
+
+def parse_stage_workers(value: str) -> dict[str, int]:
+    """Parse 'stage=N[,stage=N...]' into a dict of worker counts."""
+    workers: dict[str, int] = {}
+    for part in value.split(","):
+        name, sep, count = part.partition("=")
+        if not sep or not name.strip() or not count.strip().isdigit() or int(count) < 1:
+            raise argparse.ArgumentTypeError(f"invalid stage worker count: {part!r} (expected stage=N)")
+        workers[name.strip()] = int(count)
+    return workers
+
+
+def parse_memory_size(value: str) -> int:
+    """Parse a size like '4G', '512M' or '1.5GiB' into bytes (powers of 1024)."""
+    number = value.strip().upper().removesuffix("B").removesuffix("I")
+    scale = 1
+    if number and number[-1] in _SIZE_UNITS:
+        scale = 1024 ** (_SIZE_UNITS.index(number[-1]) + 1)
+        number = number[:-1]
+    try:
+        size = float(number) * scale
+    except ValueError:
+        size = -1
+    if size < 1:
+        raise argparse.ArgumentTypeError(f"invalid memory size: {value!r} (expected e.g. 512M or 4G)")
+    return int(size)
+
+
 def create_parser() -> argparse.ArgumentParser:
     """Create argument parser for CLI."""
     parser = argparse.ArgumentParser(
@@ -21,7 +52,7 @@ def create_parser() -> argparse.ArgumentParser:
     )
     parser.add_argument(
         "path",
-        help="Path to Google Takeout folder"
+        help="Path to Google Takeout folder (or archive, with --archives)"
     )
     parser.add_argument(
         "-e", "--edited-suffix",
@@ -56,6 +87,90 @@ def create_parser() -> argparse.ArgumentParser:
         default=0,
         help="Number of parallel workers (default: auto-detect, use 1 for sequential)"
     )
+    parser.add_argument(
+        "--executor",
+        choices=("thread", "process"),
+        default="thread",
+        help="Run per-file work in threads or in worker processes; "
+             "processes use every core (default: thread)"
+    )
+    parser.add_argument(
+        "--video-workers",
+        type=int,
+        default=0,
+        help="Number of parallel workers for videos, separate from --workers (default: auto-detect)"
+    )
+    parser.add_argument(
+        "--stage-workers",
+        type=parse_stage_workers,
+        default=None,
+        metavar="STAGE=N[,STAGE=N]",
+        help="Workers per execution stage in parallel mode: prepare, transform, metadata, video, finalize "
+             "(default: --workers each, --video-workers for video)"
+    )
+    parser.add_argument(
+        "--max-decode-memory",
+        type=parse_memory_size,
+        default=0,
+        metavar="SIZE",
+        help="Memory that image decodes (TIFF/HEIC conversion, --reencode-jpeg) may use at once across "
+             "all workers, e.g. 4G; larger images wait for room (default: no limit)"
+    )
+    parser.add_argument(
+        "--no-catalog",
+        action="store_true",
+        help="Do not keep parsed sidecars in a catalog; every JSON is read on every run"
+    )
+    parser.add_argument(
+        "-r", "--recursive",
+        action="store_true",
+        help="Process every subfolder of path (e.g. a whole 'Takeout/Google Photos' folder) in one run"
+    )
+    parser.add_argument(
+        "--reencode-jpeg",
+        action="store_true",
+        default=None,
+        help="Decode and re-save JPEGs instead of only replacing their EXIF (slower and lossy)"
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Finish an interrupted run from its journal, skipping work that was already done; "
+             "it keeps the interrupted run's --output-mode, --metadata-mode, --layout and --reencode-jpeg "
+             "(a copy or link run also needs its --output)"
+    )
+    parser.add_argument(
+        "--output-mode",
+        choices=("move", "copy", "link"),
+        default=None,
+        help="move: move media and delete sidecars (default); copy/link: leave the Takeout folder "
+             "untouched, reflinking (copy) or hardlinking (link) files whose content does not change"
+    )
+    parser.add_argument(
+        "-o", "--output",
+        metavar="DIR",
+        help="Folder to write MatchedMedia and EditedRaw to (default: the Takeout folder); "
+             "may be on another filesystem"
+    )
+    parser.add_argument(
+        "--layout",
+        choices=("flat", "year", "month", "hash"),
+        default=None,
+        help="Output folders: flat (default), year (YYYY/), month (YYYY/MM/) by photo date, "
+             "or hash (256 buckets by name) for very large libraries"
+    )
+    parser.add_argument(
+        "--metadata-mode",
+        choices=("embed", "xmp"),
+        default=None,
+        help="embed: write date and location into the media (default); xmp: never rewrite the media, "
+             "write them to <media name>.xmp sidecars instead, for every format including RAW"
+    )
+    parser.add_argument(
+        "--archives",
+        action="store_true",
+        help="Read a Takeout .zip/.tgz archive (or a folder of archive parts) without extracting it"
+    )
     return parser
 
 
@@ -110,6 +225,8 @@ def main() -> int:
     """
     parser = create_parser()
     args = parser.parse_args()
+    if args.resume and args.dry_run:
+        parser.error("--resume cannot be combined with --dry-run")
 
     # Determine log level
     if args.quiet:
@@ -124,7 +241,7 @@ def main() -> int:
     logger = setup_logging(level=log_level, log_file=args.log_file)
 
     # Validate path
-    if not os.path.isdir(args.path):
+    if not (os.path.isdir(args.path) or (args.archives and os.path.isfile(args.path))):
         logger.error(f"Invalid path: {args.path}")
         return 2
 
@@ -138,7 +255,26 @@ def main() -> int:
     window = CLIWindow(quiet=args.quiet)
 
     try:
-        result = mainProcess(args.path, window, args.edited_suffix, dry_run=args.dry_run, max_workers=args.workers)
+        result = mainProcess(
+            args.path,
+            window,
+            args.edited_suffix,
+            dry_run=args.dry_run,
+            max_workers=args.workers,
+            recursive=args.recursive,
+            reencode_jpeg=args.reencode_jpeg,
+            video_workers=args.video_workers,
+            stage_workers=args.stage_workers,
+            executor=args.executor,
+            use_catalog=not args.no_catalog,
+            resume=args.resume,
+            archives=args.archives,
+            output_mode=args.output_mode,
+            output_dir=args.output,
+            layout=args.layout,
+            max_decode_memory=args.max_decode_memory,
+            metadata_mode=args.metadata_mode
+        )
 
         # Check for errors in result
         if result.get("error"):
@@ -0,0 +1,90 @@
+"""Collision-free destination names for the output folders.
+
+Two operations can want the same destination: photo.tif and photo.jpg are
+both written as photo.jpg, and a folder may already hold files from an
+earlier run. The registry lists each output folder once and hands out
+names in memory, adding (1), (2), ... like Google Photos does, so nothing
+is overwritten and no file is stat'ed before it is moved.
+"""
+from __future__ import annotations
+
+import dataclasses
+import logging
+import os
+from typing import Iterable, Optional
+
+from names import NameAllocator
+from planner import PlannedOperation
+
+logger = logging.getLogger("GooglePhotosMatcher")
+
+__all__ = ["DestinationRegistry"]
+
+
+class DestinationRegistry:
+    """Names taken in each output folder.
+
+    Names are compared case-insensitively, since the output may be on a
+    case-insensitive filesystem (Windows, macOS, SMB shares).
+    """
+
+    def __init__(self) -> None:
+        self._folders: dict[str, NameAllocator] = {}
+
+    @classmethod
+    def scan(cls, folders: Iterable[str]) -> DestinationRegistry:
+        """Seed the registry with one listing of each existing folder."""
+        registry = cls()
+        for folder in folders:
+            try:
+                with os.scandir(folder) as entries:
+                    taken = {entry.name.casefold() for entry in entries}
+            except FileNotFoundError:
+                continue
+            registry._folders[folder] = NameAllocator(taken, casefold=True)
+        return registry
+
+    def allocate(self, folder: str, name: str) -> str:
+        """Reserve ``name`` in ``folder``, or its first free numbered variant."""
+        names = self._folders.get(folder)
+        if names is None:
+            names = self._folders[folder] = NameAllocator(casefold=True)
+        return names.allocate(name)
+
+    def reserve(
+        self,
+        op: PlannedOperation,
+        media_name: str,
+        fixed_media_path: str,
+        non_edited_media_path: str
+    ) -> PlannedOperation:
+        """Reserve the destinations of ``op``.
+
+        Args:
+            op: Planned operation
+            media_name: Name the media will have in MatchedMedia (e.g. with
+                        a .jpg extension when it is converted)
+            fixed_media_path: MatchedMedia folder
+            non_edited_media_path: EditedRaw folder
+
+        Returns:
+            ``op`` with output_name, unconverted_name and raw_output_name
+            set where they differ from the source names
+        """
+        folder = os.path.join(fixed_media_path, op.output_subdir)
+        output_name = self.allocate(folder, media_name)
+        unconverted_name: Optional[str] = None
+        if os.path.splitext(media_name)[1].casefold() != os.path.splitext(op.title)[1].casefold():
+            # A conversion can fail, or be left to the next stage (archives)
+            unconverted_name = self.allocate(folder, op.title)
+        raw_output_name: Optional[str] = None
+        if op.raw_original is not None:
+            raw_output_name = self.allocate(os.path.join(non_edited_media_path, op.output_subdir), op.raw_original)
+        if output_name != media_name or (raw_output_name or op.raw_original) != op.raw_original:
+            logger.debug(f"{op.title} is written as {output_name} to avoid overwriting another file")
+        return dataclasses.replace(
+            op,
+            output_name=output_name if output_name != op.title else "",
+            unconverted_name=unconverted_name if unconverted_name != op.title else "",
+            raw_output_name=raw_output_name if raw_output_name != op.raw_original else "",
+        )
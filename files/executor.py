@@ -0,0 +1,687 @@
+"""Execution stage: apply a planned JSON -> media match to the filesystem.
+
+Each PlannedOperation owns its media file, its sidecar and its EditedRaw
+original, so operations can run concurrently without locks. The work is
+split into STAGES (prepare -> transform/metadata/video -> finalize) so the
+parallel path can give each one its own workers.
+"""
+from __future__ import annotations
+
+import logging
+import os
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Optional, Sequence
+
+from PIL import Image
+import formats
+from auxFunctions import build_EXIF, copy_EXIF, exif_matches, set_file_times, set_EXIF
+from fileops import copy_file, move_file, place_file, verify_copy
+from handlers import FormatHandler, handler_for_name, registered_handlers, resolve_handler
+from journal import journal_writer
+from logger import setup_logging
+from planner import PlannedOperation
+from scheduler import MemoryBudget
+from video_metadata import set_video_metadata, supports_native_metadata, video_metadata_matches
+from xmp import write_xmp, xmp_path
+
+logger = logging.getLogger("GooglePhotosMatcher")
+
+# Bytes per pixel of decoded images by mode; Pillow keeps the other modes
+# (RGB included) in 4 bytes per pixel
+_PIXEL_SIZES = {"1": 1, "L": 1, "P": 1, "I;16": 2, "I;16L": 2, "I;16B": 2, "I;16N": 2}
+
+# Seconds an output's modification time may be off from the sidecar's;
+# filesystems keep it at different resolutions (2 s on FAT)
+_MTIME_TOLERANCE = 2.0
+
+# Memory budget image decodes reserve from, if the run has one
+_decode_budget: Optional[MemoryBudget] = None
+
+__all__ = [
+    "ProcessResult",
+    "ResultTally",
+    "ExecutionSettings",
+    "Job",
+    "STAGES",
+    "run_stage",
+    "execute_job",
+    "execute_operation",
+    "execute_batch",
+    "init_worker",
+    "set_decode_budget",
+    "decode_memory",
+    "describe_operation",
+    "planned_name",
+    "already_placed",
+    "final_name",
+]
+
+
+@dataclass
+class ProcessResult:
+    """Result of processing a single JSON file.
+
+    Attributes:
+        filename: Name of the JSON file processed
+        success: Whether processing completed successfully
+        title: Media file title if found
+        error: Error message if processing failed
+        operation: Planned operation details for dry-run mode
+        skipped: Whether the media already had the sidecar metadata, so
+                 it was only moved and given its file times
+        placed: Whether an earlier copy or link run already wrote the
+                output, so nothing was done
+    """
+    filename: str
+    success: bool
+    title: Optional[str] = None
+    error: Optional[str] = None
+    operation: Optional[dict[str, Any]] = None
+    skipped: bool = False
+    placed: bool = False
+
+
+class ResultTally:
+    """Running counters that results are folded into as they complete.
+
+    Failed results are logged immediately and dropped; only dry-run
+    operation descriptions are kept, since they are printed at the end.
+
+    Attributes:
+        success_count: Number of successful results
+        error_count: Number of failed results
+        skipped_count: Successful results whose metadata was already correct
+        placed_count: Successful results already in the output
+        operations: Dry-run operation descriptions, in completion order
+    """
+
+    def __init__(self, keep_operations: bool = False) -> None:
+        self.success_count = 0
+        self.error_count = 0
+        self.skipped_count = 0
+        self.placed_count = 0
+        self.operations: list[dict[str, Any]] = []
+        self._keep_operations = keep_operations
+
+    @property
+    def total(self) -> int:
+        return self.success_count + self.error_count
+
+    def add(self, result: ProcessResult) -> None:
+        """Fold ``result`` into the counters."""
+        if result.success:
+            self.success_count += 1
+            if result.skipped:
+                self.skipped_count += 1
+            if result.placed:
+                self.placed_count += 1
+            if self._keep_operations and result.operation:
+                self.operations.append(result.operation)
+        else:
+            self.error_count += 1
+            if result.error:
+                logger.error(f"{result.filename}: {result.error}")
+
+
+@dataclass(frozen=True)
+class ExecutionSettings:
+    """Run-wide settings shared by every operation.
+
+    Attributes:
+        fixed_media_path: Destination path for matched media
+        non_edited_media_path: Path for non-edited originals
+        handlers: Format handlers, by default those registered when the
+                  settings were made
+        dry_run: If True, don't modify files
+        ffmpeg_available: Whether ffmpeg is available for video processing
+        heic_available: Whether pillow-heif is available
+        reencode_jpeg: If True, JPEGs are decoded and re-saved like TIFFs
+                       instead of only having their EXIF segment replaced
+        journal_path: Journal that completed stages are recorded in, if any
+        output_mode: One of fileops.OUTPUT_MODES; anything but 'move' leaves
+                     the source tree untouched
+        cross_device: Whether the output folders are on another filesystem
+                      than the media, so moves are streamed copies
+        metadata_mode: One of xmp.METADATA_MODES; 'xmp' never rewrites the
+                       media and writes an XMP sidecar next to each instead
+    """
+    fixed_media_path: str
+    non_edited_media_path: str
+    handlers: tuple[FormatHandler, ...] = field(default_factory=registered_handlers)
+    dry_run: bool = False
+    ffmpeg_available: bool = False
+    heic_available: bool = False
+    reencode_jpeg: bool = False
+    journal_path: Optional[str] = None
+    output_mode: str = "move"
+    cross_device: bool = False
+    metadata_mode: str = "embed"
+
+    def handler(self, title: str) -> FormatHandler:
+        """Handler for ``title``, by extension."""
+        return handler_for_name(self.handlers, title)
+
+    def format_type(self, title: str) -> str:
+        """Classify ``title`` by extension."""
+        return self.handler(title).kind
+
+    def supports(self, handler: FormatHandler) -> bool:
+        """Whether the dependency the handler's stage needs is available."""
+        if handler.requires == "heic":
+            return self.heic_available
+        if handler.requires == "ffmpeg":
+            return self.ffmpeg_available
+        return True
+
+
+def _destination(root: str, op: PlannedOperation, name: str) -> str:
+    """Path of ``name`` in the operation's output folder under ``root``."""
+    return os.path.join(root, op.output_subdir, name)
+
+
+def planned_name(op: PlannedOperation, settings: ExecutionSettings) -> str:
+    """Name the media is expected to have in MatchedMedia.
+
+    TIFFs and (with pillow-heif) HEICs are converted to JPEG. This is
+    decided from the extension, without opening the file.
+    """
+    if settings.metadata_mode == "xmp":
+        return op.title
+    handler = settings.handler(op.title)
+    if handler.stage == "transform" and settings.supports(handler):
+        return op.title.rpartition('.')[0] + ".jpg"
+    return op.title
+
+
+def final_name(op: PlannedOperation, title: str) -> str:
+    """Name to write media currently called ``title`` under.
+
+    This is the name reserved at planning, or the one reserved next to it
+    if the media did not end up in the planned format (e.g. a HEIC that
+    could not be converted).
+    """
+    extension = os.path.splitext(title)[1].casefold()
+    for name in (op.output_name, op.unconverted_name):
+        if name and os.path.splitext(name)[1].casefold() == extension:
+            return name
+    return title
+
+
+def set_decode_budget(budget: Optional[MemoryBudget]) -> None:
+    """Make image decodes in this process reserve from ``budget`` (None: no limit)."""
+    global _decode_budget
+    _decode_budget = budget
+
+
+def decode_memory(filepath: str) -> int:
+    """Estimate the bytes needed to decode ``filepath`` and convert it to RGB.
+
+    Only the header is read. Returns 0 if it cannot be parsed; the decode
+    reports the error.
+    """
+    try:
+        with Image.open(filepath) as im:
+            width, height = im.size
+            mode = im.mode
+    except (OSError, ValueError):
+        return 0
+    # The decoded image and its RGB copy are alive at the same time
+    return width * height * (_PIXEL_SIZES.get(mode, 4) + 4)
+
+
+def _convert_to_jpeg(filepath: str, destination: str, op: PlannedOperation, remove_source: bool = True) -> None:
+    """Decode ``filepath`` and write it as a JPEG carrying the sidecar metadata.
+
+    The EXIF block (existing tags plus sidecar date/GPS) is embedded by the
+    same save, so the output is written exactly once. The source is removed
+    afterwards, if ``remove_source``. With a decode budget, the decode
+    waits until its estimated memory fits in it.
+    """
+    budget = _decode_budget
+    with budget.reserve(decode_memory(filepath)) if budget is not None else nullcontext():
+        with Image.open(filepath) as im:
+            rgb_im = im.convert('RGB')
+            exif_bytes = build_EXIF(op.latitude, op.longitude, op.altitude, op.timestamp, im.info.get('exif'))
+        rgb_im.save(destination, "JPEG", exif=exif_bytes)
+        del rgb_im  # freed before the memory is given back
+    if remove_source and os.path.abspath(destination) != os.path.abspath(filepath):
+        verify_copy(filepath, destination)
+        os.remove(filepath)
+
+
+def describe_operation(op: PlannedOperation, settings: ExecutionSettings) -> dict[str, Any]:
+    """Describe what execute_operation would do, for dry-run mode."""
+    handler = settings.handler(op.title)
+    format_type = handler.kind
+    operation: dict[str, Any] = {
+        "action": settings.output_mode,
+        "source": op.source,
+        "destination": _destination(settings.fixed_media_path, op, final_name(op, planned_name(op, settings))),
+        "json_file": op.json_name,
+        "format_type": format_type,
+    }
+
+    if op.raw_original is not None:
+        operation["edited_raw"] = {
+            "source": os.path.join(op.directory, op.raw_original),
+            "destination": _destination(settings.non_edited_media_path, op, op.raw_output_name or op.raw_original),
+        }
+
+    if settings.metadata_mode == "xmp":
+        operation["xmp_sidecar"] = xmp_path(operation["destination"])
+        return _describe_file_times(operation, op)
+
+    if format_type == "jpeg/tiff":
+        lossless = handler.stage == "metadata" and not settings.reencode_jpeg
+        operation["transform"] = "exif-only" if lossless else "convert-to-jpeg"
+
+    if handler.stage in ("metadata", "transform") and settings.supports(handler):
+        operation["exif_changes"] = {
+            "DateTime": datetime.fromtimestamp(op.timestamp).strftime("%Y:%m:%d %H:%M:%S"),
+        }
+        if op.has_location:
+            operation["gps"] = (op.latitude, op.longitude)
+        if op.altitude is not None:
+            operation["altitude"] = op.altitude
+
+    if handler.stage == "video" and settings.supports(handler):
+        operation["video_metadata"] = {
+            "creation_time": datetime.fromtimestamp(op.timestamp).strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        if op.has_location:
+            operation["video_metadata"]["location"] = (op.latitude, op.longitude)
+
+    if handler.kind == "raw":
+        operation["note"] = "RAW file - file times only, no EXIF modification"
+
+    return _describe_file_times(operation, op)
+
+
+def _describe_file_times(operation: dict[str, Any], op: PlannedOperation) -> dict[str, Any]:
+    """Add the file times every operation sets to ``operation``."""
+    operation["file_times"] = {
+        "timestamp": op.timestamp,
+        "datetime": datetime.fromtimestamp(op.timestamp).strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    return operation
+
+
+@dataclass
+class Job:
+    """An operation travelling through the execution stages.
+
+    Attributes:
+        op: Planned operation being applied
+        filepath: Current location of the media file
+        title: Current media name (changes when converted to JPEG)
+        result: Final result, set when the job leaves the pipeline
+        id: Position of the operation in the plan, used by the journal
+        stage: Next stage to run, None once finished
+        resumed: Whether the job continues an interrupted run, so some of
+                 its steps may already have happened
+        extracted: Whether the media (and EditedRaw original) were written
+                   to their destinations from an archive, which keeps the
+                   sidecar
+        skipped: Whether the media already had the sidecar metadata
+        content: Format sniffed from the file's first bytes ('' if not
+                 recognised), None until read
+    """
+    op: PlannedOperation
+    filepath: str = ""
+    title: str = ""
+    result: Optional[ProcessResult] = None
+    id: int = -1
+    stage: Optional[str] = "prepare"
+    resumed: bool = False
+    extracted: bool = False
+    skipped: bool = False
+    content: Optional[str] = None
+
+    def __post_init__(self) -> None:
+        self.filepath = self.filepath or self.op.source
+        self.title = self.title or self.op.title
+
+    def fail(self, error: str) -> None:
+        self.result = ProcessResult(self.op.json_name, success=False, title=self.title, error=error)
+
+
+def _content(job: Job) -> str:
+    """Format of the media according to its first bytes, read once."""
+    if job.content is None:
+        job.content = formats.sniff(formats.read_header(job.filepath)) or ""
+    return job.content
+
+
+def _handler(job: Job, settings: ExecutionSettings) -> FormatHandler:
+    """Handler for the media, by content first and by extension second."""
+    return resolve_handler(settings.handlers, job.title, _content(job))
+
+
+def _is_mp4(job: Job) -> bool:
+    """Whether the native MP4/MOV writer handles the media."""
+    content = _content(job)
+    return content in formats.MP4_FORMATS if content else supports_native_metadata(job.title)
+
+
+def _already_correct(job: Job, handler: FormatHandler) -> bool:
+    """Whether the media already carries the sidecar date and location.
+
+    Only the JPEG header segments or the MP4 box headers are read, so
+    rerunning over a partly processed folder does not rewrite EXIF or
+    patch videos again.
+    """
+    op = job.op
+    try:
+        if handler.stage == "metadata" and job.content in handler.magic:
+            return exif_matches(job.filepath, op.latitude, op.longitude, op.altitude, op.timestamp)
+        if handler.stage == "video" and _is_mp4(job):
+            return video_metadata_matches(job.filepath, op.timestamp, op.latitude, op.longitude)
+    except (OSError, ValueError) as e:
+        logger.debug(f"Cannot check metadata of {job.filepath}: {e}")
+    return False
+
+
+def _prepare(job: Job, settings: ExecutionSettings) -> Optional[str]:
+    """Move the edited original aside and route the job by format."""
+    op = job.op
+    if settings.dry_run:
+        operation = describe_operation(op, settings)
+        logger.debug(f"[DRY-RUN] Would process: {job.title} (format: {operation['format_type']})")
+        job.result = ProcessResult(op.json_name, success=True, title=job.title, operation=operation)
+        return None
+
+    if op.raw_original is not None and not job.extracted:
+        raw_destination = _destination(settings.non_edited_media_path, op, op.raw_output_name or op.raw_original)
+        try:
+            place_file(os.path.join(op.directory, op.raw_original), raw_destination,
+                       settings.output_mode, settings.cross_device)
+        except FileNotFoundError:
+            # Already moved by the interrupted run
+            if not (job.resumed and os.path.exists(raw_destination)):
+                raise
+
+    logger.debug(f"Processing file: {job.filepath}")
+    if settings.metadata_mode == "xmp":
+        # The media are placed as they are; the metadata goes to sidecars
+        return "finalize"
+
+    handler = _handler(job, settings)
+    if handler is not settings.handler(job.title):
+        logger.debug(f"{job.title} contains {job.content} data, handled as {handler.name}")
+
+    if handler.stage is None:
+        logger.debug(f"{handler.name} file {job.title} - setting file times only")
+        return "finalize"
+    if not settings.supports(handler):
+        logger.debug(f"{handler.name} file {job.title} - {handler.requires} not available, setting file times only")
+        return "finalize"
+    if _already_correct(job, handler):
+        job.skipped = True
+        return "finalize"
+
+    if handler.stage == "metadata" and (job.content not in handler.magic or settings.reencode_jpeg):
+        # Only JPEG data gets its APP1 segment replaced; pixels are decoded
+        # and re-encoded for mislabelled files and when re-encoding is
+        # requested
+        return "transform"
+    return handler.stage
+
+
+def already_placed(op: PlannedOperation, settings: ExecutionSettings) -> bool:
+    """Whether an earlier run already wrote the output of ``op``.
+
+    Copy and link runs leave the source in place, so running again matches
+    the same files. The output under the unnumbered destination name counts
+    as theirs if it has the sidecar's file time and is the source itself
+    (hardlink), a byte-for-byte copy of it, or carries its metadata.
+    """
+    destination = _destination(settings.fixed_media_path, op, planned_name(op, settings))
+    try:
+        placed = os.stat(destination)
+        if abs(placed.st_mtime - op.timestamp) > _MTIME_TOLERANCE:
+            return False
+        try:
+            source = os.stat(op.source)
+        except FileNotFoundError:
+            source = None  # inside an archive
+        if source is not None and os.path.samestat(placed, source):
+            return True
+
+        handler = settings.handler(op.title)
+        if settings.metadata_mode == "xmp" or handler.stage is None or not settings.supports(handler):
+            # Placed untouched
+            return ((source is None or placed.st_size == source.st_size)
+                    and (settings.metadata_mode != "xmp" or os.path.exists(xmp_path(destination))))
+        content = formats.sniff(formats.read_header(destination))
+        if content == "jpeg":
+            return exif_matches(destination, op.latitude, op.longitude, op.altitude, op.timestamp)
+        if content in formats.MP4_FORMATS:
+            return video_metadata_matches(destination, op.timestamp, op.latitude, op.longitude)
+        # Remuxed by ffmpeg; only the file time can tell
+        return True
+    except (OSError, ValueError) as e:
+        logger.debug(f"Cannot check earlier output {destination}: {e}")
+        return False
+
+
+def _keeps_source(job: Job, settings: ExecutionSettings) -> bool:
+    """Whether the media must stay untouched where it is."""
+    return settings.output_mode != "move" and not job.extracted
+
+
+def _writes_copy(job: Job, settings: ExecutionSettings) -> bool:
+    """Whether changed content is written straight to the output folder.
+
+    Besides the non-destructive modes, this is the case across filesystems,
+    where modifying the media in place and then moving it would write it
+    twice.
+    """
+    return (settings.output_mode != "move" or settings.cross_device) and not job.extracted
+
+
+def _resumed_output(job: Job, *destinations: str) -> Optional[str]:
+    """Destination the interrupted run already moved or converted the media to.
+
+    A run can stop after the source is gone but before that step is
+    journaled; the job then continues from the output.
+    """
+    if job.resumed and not os.path.exists(job.filepath):
+        return next((destination for destination in destinations if os.path.exists(destination)), None)
+    return None
+
+
+def _transform(job: Job, settings: ExecutionSettings) -> Optional[str]:
+    """Decode and re-encode as JPEG, written straight to MatchedMedia with EXIF."""
+    op = job.op
+    converted = _resumed_output(job, *(_destination(settings.fixed_media_path, op, final_name(op, title))
+                                       for title in (job.title.rsplit('.', 1)[0] + ".jpg", job.title)))
+    if converted is not None:
+        # Converted by the interrupted run before it was recorded
+        job.filepath, job.title = converted, os.path.basename(converted)
+        return "finalize"
+
+    remove_source = not _keeps_source(job, settings)
+    if _handler(job, settings).kind == "heic":
+        # pillow-heif is already registered, so Image.open works on HEIC
+        jpg_title = final_name(op, job.title.rsplit('.', 1)[0] + ".jpg")
+        destination = _destination(settings.fixed_media_path, op, jpg_title)
+        try:
+            _convert_to_jpeg(job.filepath, destination, op, remove_source)
+            job.filepath, job.title = destination, jpg_title
+        except Exception as e:
+            logger.warning(f"Could not process HEIC {job.title}: {e}")
+        return "finalize"
+
+    title = job.title
+    if _content(job) != "jpeg":
+        # The content becomes JPEG, so the name must say so too
+        title = title.rsplit('.', 1)[0] + ".jpg"
+    title = final_name(op, title)
+    destination = _destination(settings.fixed_media_path, op, title)
+    try:
+        _convert_to_jpeg(job.filepath, destination, op, remove_source)
+    except ValueError as e:
+        logger.error(f"Error converting to JPG in {title}: {e}")
+        job.title = title
+        job.fail(f"JPG conversion error: {e}")
+        return None
+    job.filepath, job.title = destination, title
+    return "finalize"
+
+
+def _write_metadata(job: Job, settings: ExecutionSettings) -> Optional[str]:
+    """Replace the EXIF segment of a JPEG, in place or into a new copy."""
+    op = job.op
+    try:
+        if _writes_copy(job, settings):
+            destination = _destination(settings.fixed_media_path, op, final_name(op, job.title))
+            size = copy_EXIF(job.filepath, destination, op.latitude, op.longitude, op.altitude, op.timestamp)
+            if not _keeps_source(job, settings):
+                # The source is unlinked by _finalize, as by move_file
+                verify_copy(job.filepath, destination, size)
+            job.filepath = destination
+        else:
+            set_EXIF(job.filepath, op.latitude, op.longitude, op.altitude, op.timestamp)
+    except Exception as e:
+        logger.warning(f"Inexistent EXIF data for {job.filepath}: {e}")
+        # Continue processing - file times will still be set
+    return "finalize"
+
+
+def _write_video_metadata(job: Job, settings: ExecutionSettings) -> Optional[str]:
+    """Set video creation time and location."""
+    op = job.op
+    try:
+        if _writes_copy(job, settings):
+            # Patched in place afterwards, so it cannot be a hardlink
+            destination = _destination(settings.fixed_media_path, op, final_name(op, job.title))
+            if _resumed_output(job, destination):
+                # Moved by the interrupted run before it was recorded
+                pass
+            elif _keeps_source(job, settings):
+                copy_file(job.filepath, destination)
+            else:
+                move_file(job.filepath, destination)
+            job.filepath = destination
+        if not set_video_metadata(job.filepath, op.timestamp, op.latitude, op.longitude,
+                                  allow_ffmpeg=settings.ffmpeg_available, native=_is_mp4(job)):
+            logger.warning(f"Could not set video metadata for {job.title}")
+    except Exception as e:
+        logger.warning(f"Could not set video metadata for {job.title}: {e}")
+    return "finalize"
+
+
+def _finalize(job: Job, settings: ExecutionSettings) -> Optional[str]:
+    """Put the media into place, set its file times and delete the JSON."""
+    op = job.op
+    job.title = final_name(op, job.title)
+    destination = _destination(settings.fixed_media_path, op, job.title)
+    if _resumed_output(job, destination):
+        # Moved by the interrupted run before it was recorded
+        job.filepath = destination
+
+    # Converted and rewritten files are already in place
+    if job.filepath != destination:
+        place_file(job.filepath, destination, settings.output_mode, settings.cross_device)
+        job.filepath = destination
+    elif _writes_copy(job, settings) and not _keeps_source(job, settings):
+        # Rewritten into the output folder by an earlier stage
+        try:
+            os.remove(op.source)
+        except FileNotFoundError:
+            pass
+
+    # Always set file creation and modification times (works for all file types)
+    set_file_times(job.filepath, op.timestamp)
+
+    if settings.metadata_mode == "xmp":
+        location = (op.latitude, op.longitude, op.altitude) if op.has_location else (None, None, None)
+        write_xmp(job.filepath, op.timestamp, *location)
+        if op.raw_original is not None:
+            raw_destination = _destination(settings.non_edited_media_path, op, op.raw_output_name or op.raw_original)
+            write_xmp(raw_destination, op.timestamp, *location)
+
+    # Sidecars are kept by the non-destructive modes and inside archives
+    if settings.output_mode == "move" and not job.extracted:
+        try:
+            os.remove(op.json_path)
+        except FileNotFoundError:
+            if not job.resumed:
+                raise
+
+    job.result = ProcessResult(op.json_name, success=True, title=job.title, skipped=job.skipped)
+    return None
+
+
+# Execution stages in pipeline order; each returns the next stage or None
+STAGES: dict[str, Callable[[Job, ExecutionSettings], Optional[str]]] = {
+    "prepare": _prepare,
+    "transform": _transform,
+    "metadata": _write_metadata,
+    "video": _write_video_metadata,
+    "finalize": _finalize,
+}
+
+
+def run_stage(stage: str, job: Job, settings: ExecutionSettings) -> Optional[str]:
+    """Run one stage on ``job``, turning unexpected errors into a failed result.
+
+    The outcome is recorded in the journal, if the run keeps one.
+
+    Returns:
+        Name of the next stage, or None once ``job.result`` is set
+    """
+    try:
+        next_stage = STAGES[stage](job, settings)
+    except Exception as e:
+        logger.error(f"Unexpected error processing {job.op.json_name}: {e}")
+        job.fail(str(e))
+        next_stage = None
+    job.stage = next_stage
+    if settings.journal_path is not None and job.id >= 0:
+        journal_writer(settings.journal_path).record(job, stage, next_stage)
+    return next_stage
+
+
+def execute_job(job: Job, settings: ExecutionSettings) -> ProcessResult:
+    """Run the remaining stages of ``job`` in the calling thread."""
+    while job.stage is not None:
+        run_stage(job.stage, job, settings)
+    assert job.result is not None
+    return job.result
+
+
+def execute_operation(op: PlannedOperation, settings: ExecutionSettings) -> ProcessResult:
+    """Apply a planned match: write metadata, set times, move media, delete JSON.
+
+    Runs every stage of the job in the calling thread. In dry-run mode
+    nothing is touched and the result carries a description of the
+    planned work instead.
+
+    Args:
+        op: Planned operation produced by the planner
+        settings: Run-wide execution settings
+
+    Returns:
+        ProcessResult with success status and details
+    """
+    return execute_job(Job(op), settings)
+
+
+def execute_batch(jobs: Sequence[Job], settings: ExecutionSettings) -> list[ProcessResult]:
+    """Execute a chunk of jobs; the unit of work sent to worker processes."""
+    return [execute_job(job, settings) for job in jobs]
+
+
+def init_worker(heic_available: bool, log_level: int, decode_budget: Optional[MemoryBudget] = None) -> None:
+    """Prepare a worker process: HEIC support, logging and decode budget like the parent's."""
+    set_decode_budget(decode_budget)
+    if heic_available:
+        import pillow_heif
+        pillow_heif.register_heif_opener()
+    if not logger.handlers:
+        # Spawned (not forked) workers start without handlers
+        setup_logging(level=logging.getLevelName(log_level))
+    logger.setLevel(log_level)
@@ -0,0 +1,160 @@
+"""Placing media in the output folders.
+
+In the non-destructive output modes, files whose bytes do not change are
+not copied through user space: 'copy' clones them (a copy-on-write reflink
+via the FICLONE ioctl, on Btrfs, XFS, ...) and 'link' hardlinks them. Both
+fall back to os.copy_file_range, which copies inside the kernel (and
+server-side on NFS 4.2/SMB). Files whose bytes change are written as new
+files by their writer, which copies the unchanged parts with copy_range.
+
+When the output folders are on another filesystem than the Takeout folder,
+a move is a streamed copy (copy_file_range, else sendfile) that is synced
+and checked before the source is unlinked.
+"""
+from __future__ import annotations
+
+import errno
+import logging
+import os
+import shutil
+from typing import Optional
+
+logger = logging.getLogger("GooglePhotosMatcher")
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None  # type: ignore[assignment]
+
+__all__ = [
+    "OUTPUT_MODES", "reflink", "copy_range", "copy_file", "verify_copy", "move_file", "place_file", "same_device",
+]
+
+# move: originals are moved and sidecars deleted (the default)
+# copy: the source tree is left untouched; unchanged files are reflinked or copied
+# link: like copy, but unchanged files are hardlinked (they share file times with the source)
+OUTPUT_MODES = ("move", "copy", "link")
+
+# _IOW(0x94, 9, int) from linux/fs.h
+_FICLONE = 0x40049409
+
+# Chunk size when copy_file_range is not available
+_COPY_BUFFER = 1 << 20
+
+
+def reflink(src_fd: int, dst_fd: int) -> bool:
+    """Make ``dst_fd`` a copy-on-write clone of ``src_fd``, if supported."""
+    if fcntl is None:
+        return False
+    try:
+        fcntl.ioctl(dst_fd, _FICLONE, src_fd)
+        return True
+    except OSError:
+        # Not supported by the filesystem, or source and destination differ
+        return False
+
+
+def copy_range(src_fd: int, dst_fd: int, offset: int, count: int) -> None:
+    """Append ``count`` bytes of ``src_fd`` starting at ``offset`` to ``dst_fd``."""
+    end = offset + count
+    try:
+        while offset < end:
+            copied = os.copy_file_range(src_fd, dst_fd, end - offset, offset)
+            if copied == 0:
+                break
+            offset += copied
+    except (AttributeError, OSError):
+        # copy_file_range is missing here, or refuses this pair of files
+        # (e.g. across filesystems on older kernels); continue from where
+        # it stopped with sendfile, then plain reads and writes
+        try:
+            while offset < end:
+                sent = os.sendfile(dst_fd, src_fd, offset, end - offset)
+                if sent == 0:
+                    break
+                offset += sent
+        except (AttributeError, OSError):
+            pass
+    while offset < end:
+        chunk = os.pread(src_fd, min(_COPY_BUFFER, end - offset), offset)
+        if not chunk:
+            break
+        os.write(dst_fd, chunk)
+        offset += len(chunk)
+    if offset < end:
+        raise OSError(f"Source ended {end - offset} bytes early")
+
+
+def copy_file(src: str, dst: str) -> None:
+    """Copy ``src`` to ``dst`` by reflink, or in the kernel where possible."""
+    with open(src, "rb") as source, open(dst, "wb") as target:
+        if not reflink(source.fileno(), target.fileno()):
+            copy_range(source.fileno(), target.fileno(), 0, os.fstat(source.fileno()).st_size)
+    shutil.copymode(src, dst)
+
+
+def verify_copy(src: str, dst: str, size: Optional[int] = None) -> None:
+    """Sync ``dst``, written from ``src``, to disk before ``src`` is unlinked.
+
+    Raises:
+        OSError: If ``dst`` does not have ``size`` bytes (when given); it
+                 is removed, so only the source remains
+    """
+    fd = os.open(dst, os.O_RDWR)
+    try:
+        os.fsync(fd)
+        copied = os.fstat(fd).st_size
+    finally:
+        os.close(fd)
+    if size is not None and copied != size:
+        os.remove(dst)
+        raise OSError(f"Copy of {src} has {copied} of {size} bytes; source kept")
+
+
+def move_file(src: str, dst: str) -> None:
+    """Move ``src`` to another filesystem.
+
+    The copy is streamed in the kernel where possible and synced to disk,
+    and the source is only unlinked once the copy has its full size.
+    """
+    with open(src, "rb") as source, open(dst, "wb") as target:
+        size = os.fstat(source.fileno()).st_size
+        copy_range(source.fileno(), target.fileno(), 0, size)
+    verify_copy(src, dst, size)
+    shutil.copystat(src, dst)
+    os.remove(src)
+
+
+def same_device(a: str, b: str) -> bool:
+    """Whether two existing paths are on the same filesystem."""
+    return os.stat(a).st_dev == os.stat(b).st_dev
+
+
+def place_file(src: str, dst: str, mode: str, cross_device: bool = False) -> None:
+    """Put ``src`` at ``dst`` according to the output mode; ``dst`` is replaced.
+
+    ``cross_device`` says ``dst`` is on another filesystem, so renames,
+    hardlinks and reflinks are not attempted.
+    """
+    if mode == "move":
+        if cross_device:
+            move_file(src, dst)
+            return
+        try:
+            os.replace(src, dst)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            move_file(src, dst)
+        return
+    if mode == "link" and not cross_device:
+        try:
+            os.remove(dst)
+        except FileNotFoundError:
+            pass
+        try:
+            os.link(src, dst)
+            return
+        except OSError as e:
+            logger.debug(f"Cannot hardlink {src}, copying instead: {e}")
+    copy_file(src, dst)
@@ -0,0 +1,67 @@
+"""Media format detection from the first bytes of a file.
+
+Takeout names files after what was uploaded, not after what they contain:
+.jpg files that are HEIC or PNG, .MP4 files that are QuickTime. The magic
+bytes pick the handler, so such files do not fail deep inside PIL, piexif
+or the MP4 writer. handlers.resolve_handler() falls back to the extension
+when the content is not recognised, or cannot tell (TIFF-based RAW
+formats look like TIFF).
+"""
+from __future__ import annotations
+
+from typing import Optional
+
+__all__ = ["HEADER_SIZE", "MP4_FORMATS", "read_header", "sniff"]
+
+# Bytes read from the start of a file; enough for every signature below
+HEADER_SIZE = 32
+
+# Formats the native MP4/MOV metadata writer handles
+MP4_FORMATS = ("mp4", "mov")
+
+# ISO base media brands of anything but plain MP4
+_FTYP_BRANDS = {
+    b"heic": "heic", b"heix": "heic", b"hevc": "heic", b"hevx": "heic",
+    b"heim": "heic", b"heis": "heic", b"mif1": "heic", b"msf1": "heic",
+    b"avif": "avif", b"avis": "avif",
+    b"crx ": "raw",  # Canon CR3
+    b"qt  ": "mov",
+}
+
+# Top-level boxes a QuickTime file without ftyp can start with
+_QUICKTIME_BOXES = (b"moov", b"mdat", b"wide", b"free", b"skip", b"pnot")
+
+
+def read_header(filepath: str) -> bytes:
+    """Read the first HEADER_SIZE bytes of ``filepath``."""
+    with open(filepath, "rb") as f:
+        return f.read(HEADER_SIZE)
+
+
+def sniff(head: bytes) -> Optional[str]:
+    """Name the format of a file from its first bytes.
+
+    Returns:
+        One of 'jpeg', 'png', 'gif', 'webp', 'tiff', 'heic', 'avif', 'mp4',
+        'mov', 'avi', 'mkv' or 'raw', or None if not recognised
+    """
+    if head.startswith(b"\xff\xd8\xff"):
+        return "jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "gif"
+    if head[:4] == b"RIFF":
+        return {b"WEBP": "webp", b"AVI ": "avi"}.get(head[8:12])
+    if head.startswith(b"\x1a\x45\xdf\xa3"):
+        return "mkv"
+    if head.startswith(b"FUJIFILMCCD-RAW") or head[:4] in (b"IIRO", b"IIRS", b"MMOR"):
+        return "raw"  # Fujifilm RAF, Olympus ORF
+    if head[:4] in (b"II*\x00", b"MM\x00*"):
+        return "raw" if head[8:10] == b"CR" else "tiff"  # Canon CR2 is TIFF-based
+    if head[4:8] == b"ftyp":
+        return _FTYP_BRANDS.get(head[8:12], "mp4")
+    if head[4:8] in _QUICKTIME_BOXES:
+        return "mov"
+    return None
+
@@ -0,0 +1,139 @@
+"""Format handlers: what each media format needs and what it costs.
+
+Every supported format is described by a FormatHandler: the extensions
+and content it is recognised by, the execution stage that writes its
+metadata, and the cost class of that work. The executor routes jobs by
+the handler's stage, so a format is added by registering a handler,
+without touching it. With the process executor, the scheduler also
+picks a pool by the cost class: 'copy' work runs on a thread lane next
+to the worker processes. The threaded pipeline has one pool per stage
+and does not look at cost classes; the 'video' stage has its own
+workers there.
+"""
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional, Sequence
+
+logger = logging.getLogger("GooglePhotosMatcher")
+
+__all__ = [
+    "COST_CLASSES",
+    "FormatHandler",
+    "UNKNOWN",
+    "HANDLERS",
+    "register_handler",
+    "registered_handlers",
+    "handler_for_name",
+    "resolve_handler",
+]
+
+# metadata: a few KB are read and written (EXIF segment, MP4 headers, file times)
+# transform: pixels are decoded and encoded again, bound by CPU
+# copy: the whole file is rewritten by an external tool, bound by I/O
+COST_CLASSES = ("metadata", "transform", "copy")
+
+
+@dataclass(frozen=True)
+class FormatHandler:
+    """How one media format is handled.
+
+    Attributes:
+        name: Short name used in logs
+        kind: Format type reported for it ('jpeg/tiff', 'heic', 'video',
+              'raw', 'image' or 'unknown')
+        extensions: Lower-case extensions it is recognised by, without the dot
+        magic: formats.sniff() names of the content it handles
+        stage: Execution stage that writes the metadata, None if only the
+               file times are set
+        cost: One of COST_CLASSES; only the process executor splits its
+              lanes by it
+        requires: Optional dependency the stage needs ('heic' for
+                  pillow-heif, 'ffmpeg'); without it only the file times
+                  are set
+    """
+    name: str
+    kind: str
+    extensions: tuple[str, ...]
+    magic: tuple[str, ...] = ()
+    stage: Optional[str] = None
+    cost: str = "metadata"
+    requires: Optional[str] = None
+
+    def __post_init__(self) -> None:
+        if self.cost not in COST_CLASSES:
+            raise ValueError(f"Unknown cost class: {self.cost}")
+
+
+# Anything no handler recognises: file times only
+UNKNOWN = FormatHandler("unknown", "unknown", ())
+
+HANDLERS: list[FormatHandler] = [
+    FormatHandler("JPEG", "jpeg/tiff", ("jpg", "jpeg"), ("jpeg",), "metadata"),
+    FormatHandler("TIFF", "jpeg/tiff", ("tif", "tiff"), ("tiff",), "transform", cost="transform"),
+    FormatHandler("HEIC", "heic", ("heic", "heif"), ("heic",), "transform", cost="transform",
+                  requires="heic"),
+    # Patched natively, a few KB at a time
+    FormatHandler("MP4", "video", ("mp4", "mov", "m4v"), ("mp4", "mov"), "video"),
+    # Remuxed by ffmpeg
+    FormatHandler("MKV/AVI", "video", ("mkv", "avi"), ("mkv", "avi"), "video", cost="copy",
+                  requires="ffmpeg"),
+    # TIFF-based RAW formats (DNG, NEF, ARW) are recognised by their extension
+    FormatHandler("RAW", "raw", ("cr2", "nef", "arw", "dng", "raf", "orf"), ("raw", "tiff")),
+    # No magic: PIL decodes them, so one named .jpg is converted by the JPEG handler
+    FormatHandler("PNG", "image", ("png",)),
+    FormatHandler("WebP", "image", ("webp",)),
+    FormatHandler("GIF", "image", ("gif",)),
+]
+
+
+def register_handler(handler: FormatHandler) -> None:
+    """Add a handler; it takes precedence over earlier ones for its extensions.
+
+    Raises:
+        ValueError: If its stage is not an execution stage a job can be
+                    routed to after 'prepare'
+    """
+    # executor imports this module; its stages are complete by the time handlers register
+    from executor import STAGES
+    if handler.stage is not None and handler.stage not in list(STAGES)[1:]:
+        raise ValueError(f"Unknown stage for the {handler.name} handler: {handler.stage}")
+    HANDLERS.append(handler)
+    logger.debug(f"Registered {handler.name} handler for {', '.join(handler.extensions)}")
+
+
+def registered_handlers() -> tuple[FormatHandler, ...]:
+    """Snapshot of the registered handlers, for ExecutionSettings."""
+    return tuple(HANDLERS)
+
+
+@lru_cache(maxsize=8)
+def _lookup(handlers: tuple[FormatHandler, ...]) -> tuple[dict[str, FormatHandler], dict[str, FormatHandler]]:
+    """Handlers by extension (last registered wins) and by content (first wins)."""
+    by_extension: dict[str, FormatHandler] = {}
+    by_content: dict[str, FormatHandler] = {}
+    for handler in handlers:
+        by_extension.update((extension, handler) for extension in handler.extensions)
+        for content in handler.magic:
+            by_content.setdefault(content, handler)
+    return by_extension, by_content
+
+
+def handler_for_name(handlers: Sequence[FormatHandler], name: str) -> FormatHandler:
+    """Handler for a file name, by its extension."""
+    extension = name.rsplit('.', 1)[1].casefold() if '.' in name else ''
+    return _lookup(tuple(handlers))[0].get(extension, UNKNOWN)
+
+
+def resolve_handler(handlers: Sequence[FormatHandler], name: str, content: Optional[str]) -> FormatHandler:
+    """Handler for a file, by its content first and its extension second.
+
+    The extension's handler is kept when it also handles the content (a
+    DNG is TIFF data) or the content is not recognised.
+    """
+    by_name = handler_for_name(handlers, name)
+    if not content or content in by_name.magic:
+        return by_name
+    return _lookup(tuple(handlers))[1].get(content, by_name)
@@ -0,0 +1,214 @@
+"""Write-ahead journal that makes interrupted runs resumable.
+
+Before execution starts, every planned operation is appended to a JSON
+lines file in the Takeout folder (the output root in copy and link
+modes). Each completed stage of an operation is then appended as it
+happens (media moved aside, converted, metadata written, finalized), so
+after a crash ``--resume`` can rebuild the exact same jobs and continue
+each one after its last completed stage, without planning again or
+redoing expensive conversions.
+
+Entries are written with a single O_APPEND write each, so they stay
+whole even when several worker processes share the file; the file is
+fsync'ed at least every CHECKPOINT_INTERVAL seconds.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from typing import TYPE_CHECKING, Any, Iterable, NamedTuple, Optional
+
+from planner import PlannedOperation
+
+if TYPE_CHECKING:
+    from executor import Job
+
+logger = logging.getLogger("GooglePhotosMatcher")
+
+__all__ = [
+    "JOURNAL_NAME",
+    "JournalError",
+    "JournalWriter",
+    "ResumePoint",
+    "JournalState",
+    "journal_writer",
+    "close_journal",
+]
+
+# Stored in the Takeout folder, next to MatchedMedia (in the output root
+# in copy and link modes)
+JOURNAL_NAME = ".matcher-journal.jsonl"
+
+JOURNAL_VERSION = 1
+
+# Maximum time between fsyncs of the journal (seconds)
+CHECKPOINT_INTERVAL = 2.0
+
+# Planned operations are written in blocks of about this many bytes
+_WRITE_BLOCK = 1 << 20
+
+
+class JournalError(ValueError):
+    """The journal cannot be used to resume."""
+
+
+class JournalWriter:
+    """Appends entries to a journal file; safe to share between threads."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._lock = threading.Lock()
+        self._last_sync = time.monotonic()
+
+    def _write(self, data: bytes, sync: bool = False) -> None:
+        with self._lock:
+            os.write(self._fd, data)
+            now = time.monotonic()
+            if sync or now - self._last_sync >= CHECKPOINT_INTERVAL:
+                os.fsync(self._fd)
+                self._last_sync = now
+
+    def _entry(self, entry: dict, sync: bool = False) -> None:
+        self._write(json.dumps(entry, separators=(",", ":")).encode("utf-8") + b"\n", sync)
+
+    def start(
+        self,
+        root: str,
+        jobs: Iterable["Job"],
+        output: Optional[str] = None,
+        options: Optional[dict[str, Any]] = None
+    ) -> None:
+        """Record the run, its options and every planned operation, then checkpoint."""
+        self._entry({"event": "run", "version": JOURNAL_VERSION, "root": os.path.abspath(root),
+                     "output": os.path.abspath(output or root), "options": options or {}})
+        block: list[bytes] = []
+        size = 0
+        for job in jobs:
+            line = json.dumps({"event": "plan", "id": job.id, "op": asdict(job.op)}, separators=(",", ":"))
+            block.append(line.encode("utf-8") + b"\n")
+            size += len(block[-1])
+            if size >= _WRITE_BLOCK:
+                self._write(b"".join(block))
+                block, size = [], 0
+        self._write(b"".join(block), sync=True)
+
+    def record(self, job: "Job", stage: str, next_stage: Optional[str]) -> None:
+        """Record that ``job`` finished ``stage``."""
+        if next_stage is not None:
+            self._entry({"event": "step", "id": job.id, "stage": stage, "next": next_stage,
+                         "filepath": job.filepath, "title": job.title})
+        elif job.result is not None and job.result.success:
+            self._entry({"event": "done", "id": job.id})
+        else:
+            error = job.result.error if job.result is not None else None
+            self._entry({"event": "failed", "id": job.id, "stage": stage, "error": error})
+
+    def close(self) -> None:
+        with self._lock:
+            if self._fd >= 0:
+                os.fsync(self._fd)
+                os.close(self._fd)
+                self._fd = -1
+
+
+# One writer per journal and process; forked workers must not reuse the
+# parent's writer (its lock may have been held while forking)
+_writers: dict[tuple[str, int], JournalWriter] = {}
+_writers_lock = threading.Lock()
+
+
+def journal_writer(path: str) -> JournalWriter:
+    """Return this process's writer for the journal at ``path``."""
+    key = (path, os.getpid())
+    with _writers_lock:
+        writer = _writers.get(key)
+        if writer is None:
+            writer = _writers[key] = JournalWriter(path)
+        return writer
+
+
+def close_journal(path: str) -> None:
+    """Close this process's writer for ``path``, if any."""
+    with _writers_lock:
+        writer = _writers.pop((path, os.getpid()), None)
+    if writer is not None:
+        writer.close()
+
+
+class ResumePoint(NamedTuple):
+    """Where a journaled operation continues.
+
+    Attributes:
+        id: Position of the operation in the original plan
+        op: The planned operation
+        stage: Next stage to run
+        filepath: Current location of the media file
+        title: Current media name
+    """
+    id: int
+    op: PlannedOperation
+    stage: str
+    filepath: str
+    title: str
+
+
+@dataclass
+class JournalState:
+    """Progress of an interrupted run, rebuilt from its journal.
+
+    Attributes:
+        root: Takeout folder the run was started on
+        output: Folder MatchedMedia and EditedRaw were written to
+        options: Run options the run was started with (output mode,
+                 metadata mode, ...), empty for older journals
+        points: Every planned operation, after its last completed stage
+        done: Ids of operations that finished successfully
+    """
+    root: str
+    output: str = ""
+    options: dict[str, Any] = field(default_factory=dict)
+    points: dict[int, ResumePoint] = field(default_factory=dict)
+    done: set[int] = field(default_factory=set)
+
+    @classmethod
+    def load(cls, path: str) -> "JournalState":
+        """Read a journal; a torn last line from a crash is ignored.
+
+        Raises:
+            FileNotFoundError: If there is no journal
+            JournalError: If the file is not a journal this version can read
+        """
+        state: Optional[JournalState] = None
+        with open(path, encoding="utf-8") as f:
+            for number, line in enumerate(f, 1):
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    logger.warning(f"Ignoring damaged journal line {number}")
+                    continue
+                event = entry.get("event")
+                if state is None:
+                    if event != "run" or entry.get("version") != JOURNAL_VERSION:
+                        raise JournalError(f"{path} is not a version {JOURNAL_VERSION} journal")
+                    state = cls(entry["root"], entry.get("output") or entry["root"], entry.get("options") or {})
+                elif event == "plan":
+                    op = PlannedOperation(**entry["op"])
+                    state.points[entry["id"]] = ResumePoint(entry["id"], op, "prepare", op.source, op.title)
+                elif event == "step" and entry["id"] in state.points:
+                    state.points[entry["id"]] = state.points[entry["id"]]._replace(
+                        stage=entry["next"], filepath=entry["filepath"], title=entry["title"])
+                elif event == "done":
+                    state.done.add(entry["id"])
+                # "failed" jobs are retried from their last completed stage
+        if state is None:
+            raise JournalError(f"{path} is empty")
+        return state
+
+    def pending(self) -> list[ResumePoint]:
+        """Operations that did not finish, in planning order."""
+        return [self.points[i] for i in sorted(self.points) if i not in self.done]
@@ -1,272 +1,165 @@
 from __future__ import annotations
 
 import os
-import json
-import threading
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from dataclasses import dataclass
-from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import suppress
+from dataclasses import replace
+from functools import partial
 from typing import Any, Optional, Protocol, TYPE_CHECKING
 
-from PIL import Image
-from auxFunctions import (
-    searchMedia,
-    createFolders,
-    set_file_times,
-    set_EXIF,
+from archive import TakeoutArchive
+from auxFunctions import createFolders
+from catalog import SidecarCatalog
+from destinations import DestinationRegistry
+from fileops import OUTPUT_MODES, same_device
+from executor import (
+    STAGES,
+    ExecutionSettings,
+    Job,
+    ProcessResult,
+    ResultTally,
+    execute_batch,
+    execute_job,
+    already_placed,
+    final_name,
+    init_worker,
+    planned_name,
+    run_stage,
+    set_decode_budget,
 )
+from journal import JOURNAL_NAME, JournalError, JournalState, close_journal, journal_writer
 from logger import setup_logging
-from video_metadata import set_video_metadata, is_ffmpeg_available
+from media_index import TreeIndex
+from planner import LAYOUTS, PlanError, build_tree_plan
+from pipeline import Pipeline, Stage
+from scheduler import IN_FLIGHT_PER_WORKER, Lane, MemoryBudget, batched, run_bounded
+from video_metadata import is_ffmpeg_available
+from xmp import METADATA_MODES
 
 # Optional PySimpleGUI import for type checking only
 if TYPE_CHECKING:
     import PySimpleGUI as sg
 
+__all__ = ["ProcessResult", "ProgressWindow", "mainProcess"]
 
-def _get_default_workers() -> int:
-    """Get sensible default number of workers based on CPU count."""
+# Log stage queue depths every this many results
+PIPELINE_REPORT_INTERVAL = 1000
+
+# Largest batch of operations sent to a worker process at once
+PROCESS_BATCH_SIZE = 64
+
+EXECUTORS = ("thread", "process")
+
+# Options that decide what a run writes; a resumed run keeps the ones
+# recorded in the journal of the interrupted run
+RUN_OPTIONS = {"output_mode": "move", "metadata_mode": "embed", "reencode_jpeg": False, "layout": "flat"}
+
+
+def _get_default_workers(executor: str = "thread") -> int:
+    """Get sensible default number of workers based on CPU count.
+
+    Threads share the GIL, so more than a few rarely help; processes
+    scale with the number of cores.
+    """
     cpu_count = os.cpu_count() or 1
+    if executor == "process":
+        return cpu_count
     return min(4, cpu_count)
 
 
-class ProgressWindow(Protocol):
-    """Protocol for window objects supporting progress updates.
+def _batch_size(total: int, workers: int) -> int:
+    """Operations per batch sent to a worker process."""
+    return max(1, min(PROCESS_BATCH_SIZE, total // (workers * IN_FLIGHT_PER_WORKER)))
 
-    This allows both PySimpleGUI windows and CLI mock windows to be used
-    interchangeably with mainProcess.
-    """
 
-    def __getitem__(self, key: str) -> Any:
-        """Get progress element by key."""
-        ...
+def _is_copy_bound(settings: ExecutionSettings, job: Job) -> bool:
+    """Whether the job's handler rewrites whole files with an external tool."""
+    return settings.handler(job.title).cost == "copy"
 
 
-@dataclass
-class ProcessResult:
-    """Result of processing a single JSON file.
+def _state_folder(path: str, outputRoot: str, output_mode: str) -> str:
+    """Folder for the journal and the sidecar catalog.
 
-    Attributes:
-        filename: Name of the JSON file processed
-        success: Whether processing completed successfully
-        title: Media file title if found
-        error: Error message if processing failed
-        operation: Planned operation details for dry-run mode
+    Copy and link runs leave the Takeout folder untouched, so they keep
+    both in the output root instead.
     """
-    filename: str
-    success: bool
-    title: Optional[str] = None
-    error: Optional[str] = None
-    operation: Optional[dict[str, Any]] = None
+    return path if output_mode == "move" else outputRoot
 
 
-# Initialize logger at module level
-logger = setup_logging(level="DEBUG")
-
+def _is_inside(path: str, folder: str) -> bool:
+    """Whether ``path`` resolves to a location below ``folder``."""
+    folder = os.path.realpath(folder)
+    return os.path.commonpath([os.path.realpath(path), folder]) == folder
 
-def process_single_file(
-    entry: os.DirEntry,
-    path: str,
-    fixedMediaPath: str,
-    nonEditedMediaPath: str,
-    editedWord: str,
-    piexifCodecs: list[str],
-    videoCodecs: list[str],
-    heicCodecs: list[str],
-    rawCodecs: list[str],
-    mediaMoved: set[str],
-    mediaMoved_lock: threading.Lock,
-    dry_run: bool = False,
-    ffmpeg_available: bool = False,
-    heic_available: bool = False
-) -> ProcessResult:
-    """Process a single JSON file and its associated media.
 
-    This function is designed to be called from a thread pool.
-    Thread safety is ensured by using mediaMoved_lock when accessing
-    the shared mediaMoved set and during file search operations.
+def _extract_jobs(
+    archive: TakeoutArchive,
+    jobs: list[Job],
+    fixed_media_path: str,
+    non_edited_media_path: str,
+    max_workers: int,
+    tally: ResultTally
+) -> list[Job]:
+    """Write planned media straight from the archive to their destinations.
 
-    Args:
-        entry: Directory entry for the JSON file
-        path: Source path containing media files
-        fixedMediaPath: Destination path for matched media
-        nonEditedMediaPath: Path for non-edited originals
-        editedWord: Suffix indicating edited versions
-        piexifCodecs: List of image formats supporting EXIF
-        videoCodecs: List of video formats
-        heicCodecs: List of HEIC/HEIF formats
-        rawCodecs: List of RAW image formats
-        mediaMoved: Set tracking processed media files
-        mediaMoved_lock: Lock for thread-safe access to mediaMoved
-        dry_run: If True, don't modify files
-        ffmpeg_available: Whether ffmpeg is available for video processing
-        heic_available: Whether pillow-heif is available
+    Jobs whose files could not be extracted, or whose destinations would
+    fall outside MatchedMedia/EditedRaw, are failed into ``tally``.
 
     Returns:
-        ProcessResult with success status and details
+        Jobs for the extracted media, ready to be fixed in place
     """
-    try:
-        with open(entry, encoding="utf8") as f:
-            data = json.load(f)
-
-        # Validate JSON structure
-        if 'title' not in data:
-            logger.warning(f"Missing 'title' in JSON: {entry.name}")
-            return ProcessResult(entry.name, success=False, error="Missing 'title' in JSON")
-
-        titleOriginal = data['title']
-
-        # Thread-safe search for media file
-        # searchMedia modifies files and checks mediaMoved, so we need to lock
-        with mediaMoved_lock:
-            try:
-                title = searchMedia(path, titleOriginal, mediaMoved, nonEditedMediaPath, editedWord)
-            except Exception as e:
-                logger.error(f"Error on searchMedia() with file {titleOriginal}: {e}")
-                return ProcessResult(entry.name, success=False, error=f"searchMedia error: {e}")
-
-            if title is None:
-                logger.warning(f"{titleOriginal} not found")
-                return ProcessResult(entry.name, success=False, error=f"{titleOriginal} not found")
-
-            # Add to mediaMoved while we still hold the lock
-            mediaMoved.add(title)
-
-        filepath = os.path.join(path, title)
-
-        # METADATA EDITION
-        if 'photoTakenTime' not in data or 'timestamp' not in data.get('photoTakenTime', {}):
-            logger.warning(f"Missing timestamp in JSON: {entry.name}")
-            return ProcessResult(entry.name, success=False, title=title, error="Missing timestamp in JSON")
-
-        timeStamp = int(data['photoTakenTime']['timestamp'])
-        logger.debug(f"Processing file: {filepath}")
-
-        # Determine file extension for format-specific handling
-        file_extension = title.rsplit('.', 1)[1].casefold() if '.' in title else ''
-        supports_exif = file_extension in piexifCodecs
-        is_video = file_extension in videoCodecs
-        is_heic = file_extension in heicCodecs
-        is_raw = file_extension in rawCodecs
-
-        if dry_run:
-            # Track planned operation without modifying files
-            operation: dict[str, Any] = {
-                "action": "move",
-                "source": filepath,
-                "destination": os.path.join(fixedMediaPath, title),
-                "json_file": entry.name,
-                "format_type": "jpeg/tiff" if supports_exif else
-                               "video" if is_video else
-                               "heic" if is_heic else
-                               "raw" if is_raw else "unknown",
-            }
-
-            if supports_exif or (is_heic and heic_available):
-                operation["exif_changes"] = {
-                    "DateTime": datetime.fromtimestamp(timeStamp).strftime("%Y:%m:%d %H:%M:%S"),
-                }
-                try:
-                    operation["gps"] = (data['geoData']['latitude'], data['geoData']['longitude'])
-                    operation["altitude"] = data['geoData']['altitude']
-                except (KeyError, TypeError):
-                    pass
-
-            if is_video and ffmpeg_available:
-                operation["video_metadata"] = {
-                    "creation_time": datetime.fromtimestamp(timeStamp).strftime("%Y-%m-%dT%H:%M:%S"),
-                }
-                try:
-                    operation["video_metadata"]["location"] = (
-                        data['geoData']['latitude'],
-                        data['geoData']['longitude']
-                    )
-                except (KeyError, TypeError):
-                    pass
-
-            if is_raw:
-                operation["note"] = "RAW file - file times only, no EXIF modification"
-
-            operation["file_times"] = {
-                "timestamp": timeStamp,
-                "datetime": datetime.fromtimestamp(timeStamp).strftime("%Y-%m-%d %H:%M:%S"),
-            }
-
-            logger.debug(f"[DRY-RUN] Would process: {title} (format: {operation['format_type']})")
-            return ProcessResult(entry.name, success=True, title=title, operation=operation)
-
-        # Normal mode - actually modify files
-        if supports_exif:
-            # JPEG/TIFF handling with EXIF
-            try:
-                with Image.open(filepath) as im:
-                    rgb_im = im.convert('RGB')
-                    new_filepath = filepath.rsplit('.', 1)[0] + ".jpg"
-                    os.replace(filepath, new_filepath)
-                    filepath = new_filepath
-                    rgb_im.save(filepath)
-            except ValueError as e:
-                logger.error(f"Error converting to JPG in {title}: {e}")
-                return ProcessResult(entry.name, success=False, title=title, error=f"JPG conversion error: {e}")
-
-            try:
-                set_EXIF(filepath, data['geoData']['latitude'], data['geoData']['longitude'], data['geoData']['altitude'], timeStamp)
-            except Exception as e:
-                logger.warning(f"Inexistent EXIF data for {filepath}: {e}")
-                # Continue processing - file times will still be set
-
-        elif is_video:
-            # Video handling with ffmpeg
-            if ffmpeg_available:
-                try:
-                    lat = data.get('geoData', {}).get('latitude')
-                    lng = data.get('geoData', {}).get('longitude')
-                    if not set_video_metadata(filepath, timeStamp, lat, lng):
-                        logger.warning(f"Could not set video metadata for {title}")
-                except Exception as e:
-                    logger.warning(f"Could not set video metadata for {title}: {e}")
-            else:
-                logger.debug(f"Video {title} - ffmpeg not available, setting file times only")
-
-        elif is_heic:
-            # HEIC handling (requires pillow-heif)
-            if heic_available:
-                try:
-                    # pillow-heif is already registered, so Image.open works on HEIC
-                    with Image.open(filepath) as im:
-                        # Convert to JPEG for EXIF modification
-                        rgb_im = im.convert('RGB')
-                        new_filepath = filepath.rsplit('.', 1)[0] + ".jpg"
-                        rgb_im.save(new_filepath)
-                        os.remove(filepath)
-                        filepath = new_filepath
-                        # Update title for the move operation
-                        title = os.path.basename(new_filepath)
-
-                    try:
-                        set_EXIF(filepath, data['geoData']['latitude'], data['geoData']['longitude'], data['geoData']['altitude'], timeStamp)
-                    except Exception as e:
-                        logger.warning(f"Inexistent EXIF data for {filepath}: {e}")
-                except Exception as e:
-                    logger.warning(f"Could not process HEIC {title}: {e}")
-            else:
-                logger.debug(f"HEIC {title} - pillow-heif not available, setting file times only")
+    targets = {}
+    escaping = set()
+    for job in jobs:
+        op = job.op
+        # Media that gets converted is extracted under its own name and
+        # removed once the converted copy is written
+        media = os.path.join(fixed_media_path, op.output_subdir, final_name(op, op.title))
+        raw = None
+        if op.raw_original is not None:
+            raw = os.path.join(non_edited_media_path, op.output_subdir, op.raw_output_name or op.raw_original)
+        if not _is_inside(media, fixed_media_path) or (raw is not None and not _is_inside(raw, non_edited_media_path)):
+            escaping.add(job.id)
+            continue
+        targets[(op.directory, op.title)] = media
+        if raw is not None:
+            targets[(op.directory, op.raw_original)] = raw
+    errors = archive.extract(targets, max_workers)
+
+    extracted = []
+    for job in jobs:
+        op = job.op
+        if job.id in escaping:
+            error = "destination outside the output folders"
+        else:
+            error = errors.get((op.directory, op.title)) or errors.get((op.directory, op.raw_original))
+        if error is not None:
+            job.fail(f"Could not extract from archive: {error}")
+            tally.add(job.result)
+        else:
+            extracted.append(Job(op, targets[(op.directory, op.title)], id=job.id, extracted=True))
+    return extracted
+
+
+def _get_default_video_workers(max_workers: int) -> int:
+    """Videos get their own smaller lane so they cannot starve image workers."""
+    return max(1, min(2, max_workers // 2))
 
-        elif is_raw:
-            # RAW files - just set file times, no EXIF modification
-            logger.debug(f"RAW file {title} - setting file times only")
 
-        # Always set file creation and modification times (works for all file types)
-        set_file_times(filepath, timeStamp)
+class ProgressWindow(Protocol):
+    """Protocol for window objects supporting progress updates.
+
+    This allows both PySimpleGUI windows and CLI mock windows to be used
+    interchangeably with mainProcess.
+    """
 
-        # MOVE FILE AND DELETE JSON
-        os.replace(filepath, os.path.join(fixedMediaPath, title))
-        os.remove(os.path.join(path, entry.name))
+    def __getitem__(self, key: str) -> Any:
+        """Get progress element by key."""
+        ...
 
-        return ProcessResult(entry.name, success=True, title=title)
 
-    except Exception as e:
-        logger.error(f"Unexpected error processing {entry.name}: {e}")
-        return ProcessResult(entry.name, success=False, error=str(e))
+# Initialize logger at module level
+logger = setup_logging(level="DEBUG")
 
 
 def mainProcess(
@@ -274,7 +167,20 @@ def mainProcess(
     window: ProgressWindow,
     editedW: Optional[str],
     dry_run: bool = False,
-    max_workers: int = 0
+    max_workers: int = 0,
+    recursive: bool = False,
+    reencode_jpeg: Optional[bool] = None,
+    video_workers: int = 0,
+    stage_workers: Optional[dict[str, int]] = None,
+    executor: str = "thread",
+    use_catalog: bool = True,
+    resume: bool = False,
+    archives: bool = False,
+    output_mode: Optional[str] = None,
+    output_dir: Optional[str] = None,
+    layout: Optional[str] = None,
+    max_decode_memory: int = 0,
+    metadata_mode: Optional[str] = None
 ) -> dict[str, Any]:
     """Process Google Takeout media files with optional parallel execution.
 
@@ -285,31 +191,87 @@ def mainProcess(
         dry_run: If True, show what would be done without making changes
         max_workers: Number of parallel workers. 0 = auto-detect,
                     1 = sequential, >1 = parallel with N workers
+        recursive: If True, process every subfolder of browserPath in one
+                   run; output mirrors the folder structure under the
+                   top-level MatchedMedia and EditedRaw folders
+        reencode_jpeg: If True, decode and re-save JPEGs instead of only
+                       replacing their EXIF segment (default: False)
+        video_workers: Number of parallel workers for videos, which run in
+                       a separate stage from images (and, with processes,
+                       for formats remuxed by ffmpeg). 0 = auto-detect
+        stage_workers: Optional per-stage worker counts for parallel mode,
+                       keyed by stage name (prepare, transform, metadata,
+                       video, finalize); unset stages use max_workers
+        executor: 'thread' runs the staged pipeline in threads; 'process'
+                  sends batches of planned operations to a process pool
+                  (ffmpeg remuxes stay on a thread lane) and decodes
+                  sidecars in processes too
+        use_catalog: If True, keep parsed sidecars and their matches in a
+                     SQLite catalog in browserPath (in the output folder in
+                     copy and link modes), so later runs only read new or
+                     changed JSON files (read-only in dry-run mode)
+        resume: If True, finish the run that was interrupted in browserPath
+                instead of planning a new one, using its journal (kept in
+                output_dir in copy and link modes): completed
+                operations are skipped and half-done ones continue after
+                their last completed stage. reencode_jpeg, output_mode,
+                layout and metadata_mode are taken from the journal; a
+                different value for any of them is refused
+        archives: If True, browserPath is a Takeout .zip/.tgz archive or a
+                  folder of archive parts; sidecars are read from the
+                  archives and only matched media are written, straight to
+                  MatchedMedia and EditedRaw next to the archives
+        output_mode: 'move' moves media and deletes sidecars; 'copy' and
+                     'link' leave the source tree untouched, reflinking
+                     (copy) or hardlinking (link) files whose content does
+                     not change and writing the others as new files
+                     (default: 'move')
+        output_dir: Folder to create MatchedMedia and EditedRaw in, instead
+                    of browserPath; it may be on another filesystem, in
+                    which case moves become verified streamed copies
+        layout: Output layout below each output folder: 'flat', 'year'
+                (YYYY/), 'month' (YYYY/MM/) from photoTakenTime, or 'hash'
+                (256 buckets by name) (default: 'flat')
+        max_decode_memory: Bytes of memory that image decodes (TIFF, HEIC
+                           and re-encoded JPEG) may use at once across all
+                           workers; larger images wait for headroom.
+                           0 = no limit
+        metadata_mode: 'embed' writes the metadata into the media; 'xmp'
+                       never rewrites them and writes the date and
+                       location to <media name>.xmp sidecars instead, for
+                       every format (RAW included) (default: 'embed')
 
     Returns:
         Dictionary with success_count, error_count, dry_run status, and
         optional operations list (for dry-run mode) or error message
     """
     # Auto-detect workers if not specified
+    if executor not in EXECUTORS:
+        raise ValueError(f"Unknown executor: {executor}")
+    if resume and dry_run:
+        raise ValueError("resume cannot be combined with dry_run")
+    if resume and archives:
+        raise ValueError("resume cannot be combined with archives")
+    if output_mode is not None and output_mode not in OUTPUT_MODES:
+        raise ValueError(f"Unknown output mode: {output_mode}")
+    if layout is not None and layout not in LAYOUTS:
+        raise ValueError(f"Unknown layout: {layout}")
+    if metadata_mode is not None and metadata_mode not in METADATA_MODES:
+        raise ValueError(f"Unknown metadata mode: {metadata_mode}")
+    if max_decode_memory < 0:
+        raise ValueError("max_decode_memory cannot be negative")
     if max_workers <= 0:
-        max_workers = _get_default_workers()
-
-    # Image formats supporting EXIF via piexif
-    piexifCodecs = [k.casefold() for k in ['TIF', 'TIFF', 'JPEG', 'JPG']]
-
-    # Video formats (require ffmpeg)
-    videoCodecs = [k.casefold() for k in ['MP4', 'MOV', 'AVI', 'MKV', 'M4V']]
-
-    # HEIC support (requires pillow-heif)
-    heicCodecs = [k.casefold() for k in ['HEIC', 'HEIF']]
-
-    # RAW formats (file time only, no EXIF modification)
-    rawCodecs = [k.casefold() for k in ['CR2', 'NEF', 'ARW', 'DNG', 'RAF', 'ORF']]
+        max_workers = _get_default_workers(executor)
+    if video_workers <= 0:
+        video_workers = _get_default_video_workers(max_workers)
+    unknown_stages = set(stage_workers or {}) - set(STAGES)
+    if unknown_stages:
+        raise ValueError(f"Unknown stage(s): {', '.join(sorted(unknown_stages))}")
 
     # Check optional dependencies availability
     ffmpeg_available = is_ffmpeg_available()
     if not ffmpeg_available:
-        logger.info("ffmpeg not available - video metadata will not be modified")
+        logger.info("ffmpeg not available - only MP4/MOV/M4V video metadata will be modified")
 
     heic_available = False
     try:
@@ -319,93 +281,257 @@ def mainProcess(
     except ImportError:
         logger.info("pillow-heif not installed - HEIC EXIF will not be modified")
 
-    # Thread-safe set for tracking processed files
-    mediaMoved: set[str] = set()
-    mediaMoved_lock = threading.Lock()
-
-    operations: list[dict[str, Any]] = []  # Track planned operations for dry-run mode
     path = browserPath  # source path
-    fixedMediaPath = os.path.join(path, "MatchedMedia")  # destination path
-    nonEditedMediaPath = os.path.join(path, "EditedRaw")
+    if archives and not os.path.isdir(browserPath):
+        # Output goes next to the archive
+        path = os.path.dirname(os.path.abspath(browserPath))
+    outputRoot = output_dir or path
+    fixedMediaPath = os.path.join(outputRoot, "MatchedMedia")  # destination path
+    nonEditedMediaPath = os.path.join(outputRoot, "EditedRaw")
     editedWord = editedW or "editado"
 
     logger.debug(f"Using edited word: {editedWord}")
-    logger.debug(f"Using {max_workers} worker(s)")
+    logger.debug(f"Using {max_workers} {executor} worker(s), {video_workers} for videos")
 
     if dry_run:
         logger.info("Running in dry-run mode - no files will be modified")
 
-    try:
-        obj = list(os.scandir(path))
-        obj.sort(key=lambda s: len(s.name))  # Sort by length to avoid name(1).jpg be processed before name.jpg
-        if not dry_run:
-            createFolders(fixedMediaPath, nonEditedMediaPath)
-    except Exception as e:
-        window['-PROGRESS_LABEL-'].update("Choose a valid directory", visible=True, text_color='red')
-        return {"success_count": 0, "error_count": 0, "dry_run": dry_run, "error": str(e)}
-
-    # Filter to only JSON files
-    json_files = [e for e in obj if e.is_file() and e.name.endswith(".json")]
-    total_files = len(json_files)
-
-    if total_files == 0:
-        window['-PROGRESS_LABEL-'].update("No JSON files found", visible=True, text_color='yellow')
-        return {"success_count": 0, "error_count": 0, "dry_run": dry_run}
-
-    results: list[ProcessResult] = []
-
-    if max_workers == 1:
-        # Sequential processing (original behavior)
-        for idx, entry in enumerate(json_files):
-            result = process_single_file(
-                entry, path, fixedMediaPath, nonEditedMediaPath,
-                editedWord, piexifCodecs, videoCodecs, heicCodecs, rawCodecs,
-                mediaMoved, mediaMoved_lock, dry_run,
-                ffmpeg_available, heic_available
-            )
-            results.append(result)
-
-            # Update progress
-            progress = round((idx + 1) / total_files * 100, 2)
-            window['-PROGRESS_LABEL-'].update(str(progress) + "%", visible=True)
-            window['-PROGRESS_BAR-'].update(progress, visible=True)
+    use_processes = executor == "process" and max_workers > 1
+
+    # Options left unset (None) take their defaults, or on resume the
+    # values the interrupted run used
+    requested = {"output_mode": output_mode, "metadata_mode": metadata_mode, "reencode_jpeg": reencode_jpeg,
+                 "layout": layout}
+    requested = {name: value for name, value in requested.items() if value is not None}
+    options = {**RUN_OPTIONS, **requested}
+    stateFolder = _state_folder(path, outputRoot, options["output_mode"])
+    journalPath = os.path.join(stateFolder, JOURNAL_NAME)
+
+    plan_errors: tuple[PlanError, ...] = ()
+    archive: Optional[TakeoutArchive] = None
+    if resume:
+        # RESUME: rebuild the unfinished jobs of the interrupted run, from
+        # the journal in the output folder of a copy or link run, else in
+        # the Takeout folder
+        candidates = [os.path.join(folder, JOURNAL_NAME) for folder in (outputRoot, path)]
+        journalPath = next((candidate for candidate in candidates if os.path.exists(candidate)), candidates[-1])
+        try:
+            state = JournalState.load(journalPath)
+        except FileNotFoundError:
+            window['-PROGRESS_LABEL-'].update("No interrupted run to resume", visible=True, text_color='red')
+            return {"success_count": 0, "error_count": 0, "dry_run": False, "error": "No interrupted run to resume"}
+        except (OSError, JournalError) as e:
+            window['-PROGRESS_LABEL-'].update("Cannot resume the interrupted run", visible=True, text_color='red')
+            return {"success_count": 0, "error_count": 0, "dry_run": False, "error": str(e)}
+        conflicts = sorted(name for name, value in requested.items()
+                           if name in state.options and state.options[name] != value)
+        if conflicts:
+            error = ("The interrupted run used different " + ", ".join(
+                f"{name} ({state.options[name]!r})" for name in conflicts) + "; resume without changing them")
+            window['-PROGRESS_LABEL-'].update("Cannot resume the interrupted run", visible=True, text_color='red')
+            return {"success_count": 0, "error_count": 0, "dry_run": False, "error": error}
+        options = {**RUN_OPTIONS, **state.options, **requested}
+        jobs = [
+            Job(point.op, point.filepath, point.title, id=point.id, stage=point.stage, resumed=True)
+            for point in state.pending()
+        ]
+        logger.info(f"Resuming interrupted run: {len(state.done)} of {len(state.points)} operation(s) already done")
+        if output_dir is None:
+            # Continue writing where the interrupted run did
+            outputRoot = state.output
+            fixedMediaPath = os.path.join(outputRoot, "MatchedMedia")
+            nonEditedMediaPath = os.path.join(outputRoot, "EditedRaw")
     else:
-        # Parallel processing
-        completed = 0
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = {
-                executor.submit(
-                    process_single_file,
-                    entry, path, fixedMediaPath, nonEditedMediaPath,
-                    editedWord, piexifCodecs, videoCodecs, heicCodecs, rawCodecs,
-                    mediaMoved, mediaMoved_lock, dry_run,
-                    ffmpeg_available, heic_available
-                ): entry
-                for entry in json_files
-            }
-
-            for future in as_completed(futures):
-                result = future.result()
-                results.append(result)
-                completed += 1
-
-                # Update progress
-                progress = round(completed / total_files * 100, 2)
-                window['-PROGRESS_LABEL-'].update(str(progress) + "%", visible=True)
-                window['-PROGRESS_BAR-'].update(progress, visible=True)
-
-    # Count results
-    successCounter = sum(1 for r in results if r.success)
-    errorCounter = sum(1 for r in results if not r.success)
-
-    # Collect operations for dry-run mode
-    if dry_run:
-        operations = [r.operation for r in results if r.success and r.operation]
-
-    # Log errors
-    for result in results:
-        if not result.success and result.error:
-            logger.error(f"{result.filename}: {result.error}")
+        if not dry_run and os.path.exists(journalPath):
+            error = "An interrupted run was found; use --resume to finish it"
+            window['-PROGRESS_LABEL-'].update(error, visible=True, text_color='red')
+            return {"success_count": 0, "error_count": 0, "dry_run": False, "error": error}
+
+        try:
+            if archives:
+                archive = TakeoutArchive.open(browserPath)
+                tree = archive.tree()
+            else:
+                tree = TreeIndex.scan(
+                    path,
+                    recursive=recursive,
+                    max_workers=max_workers,
+                    skip_dirs=(os.path.basename(fixedMediaPath), os.path.basename(nonEditedMediaPath))
+                )
+        except Exception as e:
+            window['-PROGRESS_LABEL-'].update("Choose a valid directory", visible=True, text_color='red')
+            return {"success_count": 0, "error_count": 0, "dry_run": dry_run, "error": str(e)}
+
+        if recursive:
+            logger.debug(f"Found {tree.sidecar_count} JSON file(s) in {len(tree)} folder(s)")
+
+        if tree.sidecar_count == 0:
+            window['-PROGRESS_LABEL-'].update("No JSON files found", visible=True, text_color='yellow')
+            return {"success_count": 0, "error_count": 0, "dry_run": dry_run}
+
+        # PLAN: resolve every match up front, without touching any file
+        catalog: Optional[SidecarCatalog] = None
+        if use_catalog and archive is None:
+            if not dry_run:
+                # The output root of a copy or link run may not exist yet
+                with suppress(OSError):
+                    os.makedirs(stateFolder, exist_ok=True)
+            catalog = SidecarCatalog.open(path, readonly=dry_run, folder=stateFolder)
+        try:
+            plan = build_tree_plan(tree, editedWord, max_workers, processes=use_processes, catalog=catalog,
+                                   reader=archive.read_sidecars if archive is not None else None,
+                                   layout=options["layout"])
+        finally:
+            if catalog is not None:
+                catalog.close()
+        logger.debug(f"Planned {len(plan.operations)} operation(s), {len(plan.errors)} unmatched")
+        jobs = [Job(op, id=i) for i, op in enumerate(plan.operations)]
+        plan_errors = plan.errors
+
+    total_files = len(jobs) + len(plan_errors)
+
+    cross_device = False
+    if not dry_run:
+        try:
+            os.makedirs(outputRoot, exist_ok=True)
+            createFolders(fixedMediaPath, nonEditedMediaPath)
+            cross_device = not same_device(path, fixedMediaPath)
+        except Exception as e:
+            window['-PROGRESS_LABEL-'].update("Choose a valid directory", visible=True, text_color='red')
+            return {"success_count": 0, "error_count": 0, "dry_run": dry_run, "error": str(e)}
+        # Every output folder is created here, in one batch, so workers
+        # never create folders
+        subdirs = sorted({job.op.output_subdir for job in jobs} - {""})
+        folders = [os.path.join(root, subdir) for subdir in subdirs for root in (fixedMediaPath, nonEditedMediaPath)]
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            list(pool.map(partial(os.makedirs, exist_ok=True), folders))
+        if cross_device:
+            logger.info("Output is on another filesystem - media will be copied and verified before removal")
+
+    settings = ExecutionSettings(
+        fixed_media_path=fixedMediaPath,
+        non_edited_media_path=nonEditedMediaPath,
+        dry_run=dry_run,
+        ffmpeg_available=ffmpeg_available,
+        heic_available=heic_available,
+        reencode_jpeg=options["reencode_jpeg"],
+        journal_path=None if dry_run or archive is not None else journalPath,
+        output_mode=options["output_mode"],
+        cross_device=cross_device,
+        metadata_mode=options["metadata_mode"],
+    )
+
+    tally = ResultTally(keep_operations=dry_run)
+    for err in plan_errors:
+        tally.add(ProcessResult(err.json_name, success=False, title=err.title, error=err.error))
+
+    if not resume and settings.output_mode != "move" and jobs:
+        # The sources are still in place after a copy or link run, so a
+        # second run matches them again; their outputs are kept as they are
+        # instead of being written once more under numbered names
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            placed = list(pool.map(partial(already_placed, settings=settings), (job.op for job in jobs)))
+        for job, done in zip(jobs, placed):
+            if done:
+                tally.add(ProcessResult(job.op.json_name, success=True, title=job.title, placed=True))
+        jobs = [job for job, done in zip(jobs, placed) if not done]
+        if tally.placed_count:
+            logger.info(f"{tally.placed_count} file(s) already placed by an earlier run")
+
+    if not resume:
+        # Reserve every destination name now, from one listing of each output
+        # folder, so nothing is overwritten and no file is stat'ed per move.
+        # Resumed jobs keep the names they were planned with.
+        subdirs = sorted({job.op.output_subdir for job in jobs})
+        registry = DestinationRegistry.scan(
+            os.path.join(root, subdir) for subdir in subdirs for root in (fixedMediaPath, nonEditedMediaPath))
+        for job in jobs:
+            job.op = registry.reserve(job.op, planned_name(job.op, settings), fixedMediaPath, nonEditedMediaPath)
+
+    if archive is not None and not dry_run:
+        jobs = _extract_jobs(archive, jobs, fixedMediaPath, nonEditedMediaPath, max_workers, tally)
+
+    def report_progress() -> None:
+        progress = round(tally.total / total_files * 100, 2) if total_files else 100
+        window['-PROGRESS_LABEL-'].update(str(progress) + "%", visible=True)
+        window['-PROGRESS_BAR-'].update(progress, visible=True)
+
+    # The journal records every planned operation before anything moves
+    if settings.journal_path is not None and not resume:
+        try:
+            journal_writer(journalPath).start(path, jobs, outputRoot, options)
+        except OSError as e:
+            logger.warning(f"Cannot write the journal, this run will not be resumable: {e}")
+            close_journal(journalPath)
+            with suppress(OSError):
+                os.remove(journalPath)
+            settings = replace(settings, journal_path=None)
+
+    decode_budget = MemoryBudget(max_decode_memory) if max_decode_memory and not dry_run else None
+    if decode_budget is not None:
+        logger.debug(f"Image decodes limited to {max_decode_memory / 2**20:.0f} MiB at once")
+    set_decode_budget(decode_budget)
+
+    # EXECUTE: operations own disjoint files, so they run without locks
+    try:
+        if max_workers == 1:
+            # Sequential processing (original behavior)
+            for job in jobs:
+                tally.add(execute_job(job, settings))
+                report_progress()
+        elif use_processes:
+            # Batches of planned operations go to worker processes, so per-file
+            # work is not serialized by the GIL; formats whose handler has
+            # ffmpeg copy whole files mostly wait on it, so they stay on a
+            # thread lane in this process
+            copy_bound = partial(_is_copy_bound, settings)
+            other_jobs = (job for job in jobs if not copy_bound(job))
+            video_jobs = (job for job in jobs if copy_bound(job))
+            batch_size = _batch_size(len(jobs), max_workers)
+            with ProcessPoolExecutor(
+                max_workers=max_workers,
+                initializer=init_worker,
+                initargs=(heic_available, logger.getEffectiveLevel(), decode_budget)
+            ) as pool, ThreadPoolExecutor(max_workers=video_workers, thread_name_prefix="video") as video_pool:
+                lanes = [
+                    Lane(pool, batched(other_jobs, batch_size), max_workers * 2),
+                    Lane(video_pool, batched(video_jobs, 1), video_workers * IN_FLIGHT_PER_WORKER),
+                ]
+                for batch_results in run_bounded(partial(execute_batch, settings=settings), lanes):
+                    for result in batch_results:
+                        tally.add(result)
+                    report_progress()
+        else:
+            # Parallel processing: each execution stage has its own workers and
+            # a bounded queue; videos get their own stage
+            workers = {name: max_workers for name in STAGES}
+            workers["video"] = video_workers
+            workers.update(stage_workers or {})
+            pipeline: Pipeline[Job] = Pipeline([
+                Stage(name, partial(run_stage, name, settings=settings), workers[name],
+                      workers[name] * IN_FLIGHT_PER_WORKER)
+                for name in STAGES
+            ])
+            for job in pipeline.run(jobs, entry=lambda job: job.stage):
+                tally.add(job.result)
+                report_progress()
+                if tally.total % PIPELINE_REPORT_INTERVAL == 0:
+                    logger.debug(f"Stage queue depths: {pipeline.depths()}")
+            for stage in pipeline.stages.values():
+                logger.debug(f"Stage {stage.name}: {stage.processed} processed by {stage.workers} "
+                             f"worker(s), peak queue depth {stage.peak_depth}")
+    finally:
+        set_decode_budget(None)
+        close_journal(journalPath)
+    if settings.journal_path is not None:
+        # Every operation finished; nothing is left to resume
+        os.remove(journalPath)
+
+    successCounter = tally.success_count
+    errorCounter = tally.error_count
+    skippedCounter = tally.skipped_count
+    placedCounter = tally.placed_count
+    operations = tally.operations
 
     successMessage = " successes"
     errorMessage = " errors"
@@ -427,7 +553,15 @@ def mainProcess(
         print("\nPlanned operations:")
         for op in operations:
             format_type = op.get('format_type', 'unknown')
-            print(f"  - Move: {os.path.basename(op['source'])} -> MatchedMedia/ [{format_type}]")
+            destination = os.path.relpath(os.path.dirname(op['destination']), outputRoot)
+            print(f"  - {op['action'].capitalize()}: {os.path.basename(op['source'])} -> {destination}/ [{format_type}]")
+            if 'edited_raw' in op:
+                raw_destination = os.path.relpath(os.path.dirname(op['edited_raw']['destination']), outputRoot)
+                print(f"    Original: {os.path.basename(op['edited_raw']['source'])} -> {raw_destination}/")
+            if 'xmp_sidecar' in op:
+                print(f"    XMP sidecar: {os.path.basename(op['xmp_sidecar'])}")
+            if op.get('transform') == "convert-to-jpeg":
+                print("    Convert to JPEG")
             if 'exif_changes' in op:
                 print(f"    EXIF DateTime: {op['exif_changes']['DateTime']}")
                 if 'gps' in op:
@@ -453,9 +587,19 @@ def mainProcess(
             "dry_run": True
         }
 
+    notes = []
+    if skippedCounter:
+        notes.append(f"{skippedCounter} already had their metadata")
+    if placedCounter:
+        notes.append(f"{placedCounter} already in the output")
+    if notes:
+        successMessage += f" ({', '.join(notes)})"
+
     window['-PROGRESS_LABEL-'].update("Matching process finished with " + str(successCounter) + successMessage + " and " + str(errorCounter) + errorMessage + ".", visible=True, text_color='#c0ffb3')
     return {
         "success_count": successCounter,
         "error_count": errorCounter,
+        "skipped_count": skippedCounter,
+        "placed_count": placedCounter,
         "dry_run": False
     }
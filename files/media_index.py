@@ -0,0 +1,219 @@
+"""In-memory directory snapshot used to match JSON sidecars with media files."""
+from __future__ import annotations
+
+import bisect
+import logging
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Iterable, Iterator, Optional
+
+from names import NameAllocator
+
+logger = logging.getLogger("GooglePhotosMatcher")
+
+__all__ = ["MediaIndex", "TreeIndex"]
+
+
+class MediaIndex:
+    """Snapshot of the names in a single directory.
+
+    Built once from an ``os.scandir`` pass, it answers "does this name exist"
+    and "has it been claimed" with set lookups instead of filesystem calls.
+    Callers keep it current by calling ``discard`` when a file leaves the
+    directory and ``claim`` when a file is matched to a JSON. Names sharing
+    a prefix are found by bisecting a sorted copy of the names, made on
+    first use.
+
+    Attributes:
+        path: Directory the snapshot was taken from
+        claimed: Names already matched to a JSON (shared with the caller)
+    """
+
+    __slots__ = ("path", "claimed", "_names", "_variants", "_sorted")
+
+    def __init__(
+        self,
+        path: str,
+        names: Iterable[str] = (),
+        claimed: Optional[set[str]] = None
+    ) -> None:
+        self.path = path
+        self.claimed: set[str] = claimed if claimed is not None else set()
+        self._names: set[str] = set(names)
+        self._variants = NameAllocator(self.claimed)
+        self._sorted: Optional[list[str]] = None
+
+    @classmethod
+    def from_entries(
+        cls,
+        path: str,
+        entries: Iterable[os.DirEntry],
+        claimed: Optional[set[str]] = None
+    ) -> MediaIndex:
+        """Build an index from an existing ``os.scandir`` result."""
+        return cls(path, (entry.name for entry in entries), claimed)
+
+    @classmethod
+    def scan(cls, path: str, claimed: Optional[set[str]] = None) -> MediaIndex:
+        """Build an index by listing ``path`` once."""
+        with os.scandir(path) as entries:
+            return cls.from_entries(path, entries, claimed)
+
+    def exists(self, name: str) -> bool:
+        """Return True if ``name`` is present in the directory."""
+        return name in self._names
+
+    def is_claimed(self, name: str) -> bool:
+        """Return True if ``name`` was already matched to a JSON."""
+        return name in self.claimed
+
+    def is_available(self, name: str) -> bool:
+        """Return True if ``name`` exists and has not been claimed yet."""
+        return name in self._names and name not in self.claimed
+
+    def unclaimed_variant(self, name: str) -> str:
+        """Return ``name`` or its first numbered variant not claimed yet.
+
+        Amortized O(1): repeated calls for one name continue from the
+        variant found last time instead of probing (1), (2), ... again.
+        """
+        return self._variants.first_free(name)
+
+    def with_prefix(self, prefix: str) -> list[str]:
+        """Return the names starting with ``prefix``, in sorted order.
+
+        O(log n) plus the number of names returned. Names discarded since
+        the sorted copy was made are skipped.
+        """
+        if self._sorted is None:
+            self._sorted = sorted(self._names)
+        names = self._sorted
+        matches = []
+        for i in range(bisect.bisect_left(names, prefix), len(names)):
+            name = names[i]
+            if not name.startswith(prefix):
+                break
+            if name in self._names:
+                matches.append(name)
+        return matches
+
+    def claim(self, name: str) -> None:
+        """Mark ``name`` as matched so no other JSON can use it."""
+        self.claimed.add(name)
+
+    def add(self, name: str) -> None:
+        """Record a file that appeared in the directory."""
+        self._names.add(name)
+        self._sorted = None
+
+    def discard(self, name: str) -> None:
+        """Record that ``name`` left the directory (moved or deleted)."""
+        self._names.discard(name)
+
+    def path_of(self, name: str) -> str:
+        """Return the full path of ``name`` inside the indexed directory."""
+        return os.path.join(self.path, name)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._names
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._names)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+
+class TreeIndex:
+    """MediaIndex snapshots for every folder of a Takeout tree.
+
+    Folders are listed in parallel, each exactly once. Matching stays
+    per-folder (Takeout keeps a sidecar next to its media), but the whole
+    tree is planned and executed as one run.
+
+    Attributes:
+        root: Top folder of the scan
+        folders: MediaIndex per folder path, in sorted path order
+        sidecars: Names of the JSON sidecars per folder path
+    """
+
+    __slots__ = ("root", "folders", "sidecars")
+
+    def __init__(self, root: str) -> None:
+        self.root = root
+        self.folders: dict[str, MediaIndex] = {}
+        self.sidecars: dict[str, list[str]] = {}
+
+    @classmethod
+    def scan(
+        cls,
+        root: str,
+        recursive: bool = False,
+        max_workers: int = 1,
+        skip_dirs: Iterable[str] = ()
+    ) -> TreeIndex:
+        """List ``root`` (and, if recursive, every subfolder) once.
+
+        Args:
+            root: Folder to scan; errors listing it are raised
+            recursive: Whether to descend into subfolders
+            max_workers: Number of folders listed concurrently
+            skip_dirs: Folder names never descended into (e.g. output folders)
+
+        Returns:
+            TreeIndex covering every folder that could be listed
+        """
+        skip = set(skip_dirs)
+        tree = cls(root)
+        listed: dict[str, tuple[list[os.DirEntry], list[str]]] = {}
+
+        def list_folder(path: str) -> tuple[list[os.DirEntry], list[str]]:
+            with os.scandir(path) as it:
+                entries = list(it)
+            subdirs = [
+                e.path for e in entries
+                if recursive and e.name not in skip and e.is_dir(follow_symlinks=False)
+            ]
+            return entries, subdirs
+
+        # The root must be listable; subfolder errors are only logged
+        listed[root] = list_folder(root)
+        pending_dirs = list(listed[root][1])
+
+        if pending_dirs:
+            with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+                pending = {pool.submit(list_folder, d): d for d in pending_dirs}
+                while pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        folder = pending.pop(future)
+                        try:
+                            listed[folder] = future.result()
+                        except OSError as e:
+                            logger.warning(f"Could not list {folder}: {e}")
+                            continue
+                        for subdir in listed[folder][1]:
+                            pending[pool.submit(list_folder, subdir)] = subdir
+
+        for folder in sorted(listed):
+            entries = listed[folder][0]
+            tree.folders[folder] = MediaIndex.from_entries(folder, entries)
+            tree.sidecars[folder] = [e.name for e in entries if e.is_file() and e.name.endswith(".json")]
+
+        return tree
+
+    def relative_path(self, folder: str) -> str:
+        """Path of ``folder`` relative to the root ('' for the root itself)."""
+        rel = os.path.relpath(folder, self.root)
+        return "" if rel == os.curdir else rel
+
+    @property
+    def sidecar_count(self) -> int:
+        """Total number of JSON sidecars in the tree."""
+        return sum(len(names) for names in self.sidecars.values())
+
+    def __iter__(self) -> Iterator[MediaIndex]:
+        return iter(self.folders.values())
+
+    def __len__(self) -> int:
+        return len(self.folders)
@@ -0,0 +1,348 @@
+"""Native MP4/MOV/M4V metadata writer.
+
+Patches creation times and the QuickTime location atom directly inside the
+``moov`` box instead of remuxing the whole file with ffmpeg. Only the
+``moov`` box is read and written, unless it has to grow and cannot do so in
+place; then the file is rewritten once with its chunk offsets fixed up.
+"""
+from __future__ import annotations
+
+import os
+import shutil
+import struct
+import tempfile
+from typing import BinaryIO, Iterator, NamedTuple, Optional
+
+__all__ = [
+    "AtomError",
+    "MP4_EXTENSIONS",
+    "MAC_EPOCH_OFFSET",
+    "iso6709",
+    "read_mp4_metadata",
+    "set_mp4_metadata",
+]
+
+# Extensions of ISO base media / QuickTime files handled natively
+MP4_EXTENSIONS = ("mp4", "mov", "m4v")
+
+# Seconds between the QuickTime epoch (1904-01-01) and the Unix epoch
+MAC_EPOCH_OFFSET = 2082844800
+
+# QuickTime user-data location atom ("\xa9xyz")
+XYZ_ATOM = b"\xa9xyz"
+
+# Language code ffmpeg and Apple devices use for the location string
+XYZ_LANGUAGE = 0x15C7
+
+# Boxes holding the chunk offset tables, in nesting order under moov
+_STBL_PATH = (b"trak", b"mdia", b"minf", b"stbl")
+
+_FREE_BOXES = (b"free", b"skip")
+
+
+class AtomError(ValueError):
+    """The file is not a structure the native writer can patch safely."""
+
+
+class Box(NamedTuple):
+    """Location of a box inside a buffer or file.
+
+    Attributes:
+        type: Four-character box type
+        start: Offset of the box header
+        header: Header length (8, or 16 for 64-bit sizes)
+        end: Offset just past the box
+    """
+    type: bytes
+    start: int
+    header: int
+    end: int
+
+    @property
+    def payload(self) -> int:
+        """Offset of the first byte after the header."""
+        return self.start + self.header
+
+    @property
+    def size(self) -> int:
+        return self.end - self.start
+
+
+def iso6709(lat: float, lng: float) -> str:
+    """Format coordinates as an ISO 6709 string (e.g. '+40.712800-74.006000/')."""
+    return f"{lat:+.6f}{lng:+.6f}/"
+
+
+def _parse_header(head: bytes, start: int, available: int) -> Box:
+    """Parse a box header at ``start`` with ``available`` bytes left in its parent."""
+    if len(head) < 8 or available < 8:
+        raise AtomError(f"Truncated box header at offset {start}")
+    size, box_type = struct.unpack(">I4s", head[:8])
+    header = 8
+    if size == 1:
+        if len(head) < 16:
+            raise AtomError(f"Truncated 64-bit box header at offset {start}")
+        size = struct.unpack(">Q", head[8:16])[0]
+        header = 16
+    elif size == 0:
+        size = available
+    if size < header or size > available:
+        raise AtomError(f"Invalid size {size} for box {box_type!r} at offset {start}")
+    return Box(box_type, start, header, start + size)
+
+
+def _children(buf: bytes | bytearray, start: int, end: int) -> Iterator[Box]:
+    """Iterate the boxes stored in ``buf[start:end]``."""
+    pos = start
+    while end - pos >= 8:
+        box = _parse_header(bytes(buf[pos:pos + 16]), pos, end - pos)
+        yield box
+        pos = box.end
+
+
+def _top_level_boxes(f: BinaryIO, file_size: int) -> list[Box]:
+    """List the top-level boxes of a file, reading only their headers."""
+    boxes = []
+    pos = 0
+    while file_size - pos >= 8:
+        f.seek(pos)
+        box = _parse_header(f.read(16), pos, file_size - pos)
+        boxes.append(box)
+        pos = box.end
+    if not boxes or boxes[0].type not in (b"ftyp", b"moov", b"mdat", b"free", b"skip", b"wide", b"pnot"):
+        raise AtomError("Not an ISO base media / QuickTime file")
+    return boxes
+
+
+def _make_box(box_type: bytes, payload: bytes | bytearray) -> bytearray:
+    return bytearray(struct.pack(">I4s", 8 + len(payload), box_type)) + payload
+
+
+def _xyz_box(location: str) -> bytearray:
+    text = location.encode("utf-8")
+    return _make_box(XYZ_ATOM, struct.pack(">HH", len(text), XYZ_LANGUAGE) + text)
+
+
+def _patch_times(buf: bytearray, start: int, end: int, mac_time: int) -> int:
+    """Set creation/modification times of mvhd, tkhd and mdhd boxes in place.
+
+    Returns:
+        Number of boxes patched
+    """
+    patched = 0
+    for box in _children(buf, start, end):
+        if box.type in (b"mvhd", b"tkhd", b"mdhd"):
+            version = buf[box.payload]
+            if version == 1:
+                struct.pack_into(">QQ", buf, box.payload + 4, mac_time, mac_time)
+            else:
+                if mac_time > 0xFFFFFFFF:
+                    raise AtomError("Timestamp does not fit a version 0 header")
+                struct.pack_into(">II", buf, box.payload + 4, mac_time, mac_time)
+            patched += 1
+        elif box.type in (b"trak", b"mdia"):
+            patched += _patch_times(buf, box.payload, box.end, mac_time)
+    return patched
+
+
+def _with_location(moov: bytearray, location: str) -> bytearray:
+    """Return ``moov`` with its udta/\\xa9xyz atom set to ``location``.
+
+    An existing atom of the same size is overwritten in place; otherwise a
+    new moov box is built.
+    """
+    xyz = _xyz_box(location)
+    moov_box = _parse_header(bytes(moov[:16]), 0, len(moov))
+    udta = next((b for b in _children(moov, moov_box.payload, len(moov)) if b.type == b"udta"), None)
+
+    if udta is None:
+        payload = moov[moov_box.payload:] + _make_box(b"udta", xyz)
+        return _make_box(b"moov", payload)
+
+    udta_children = list(_children(moov, udta.payload, udta.end))
+    for child in udta_children:
+        if child.type == XYZ_ATOM and child.size == len(xyz) and child.header == 8:
+            moov[child.start:child.end] = xyz
+            return moov
+
+    kept = b"".join(bytes(moov[c.start:c.end]) for c in udta_children if c.type != XYZ_ATOM)
+    # QuickTime may terminate udta with 4 zero bytes; keep whatever trails the children
+    trailing = moov[udta_children[-1].end if udta_children else udta.payload:udta.end]
+    new_udta = _make_box(b"udta", xyz + kept + trailing)
+    payload = moov[moov_box.payload:udta.start] + new_udta + moov[udta.end:]
+    return _make_box(b"moov", payload)
+
+
+def _shift_chunk_offsets(buf: bytearray, start: int, end: int, threshold: int, delta: int, depth: int = 0) -> None:
+    """Add ``delta`` to every stco/co64 entry pointing at or past ``threshold``."""
+    for box in _children(buf, start, end):
+        if depth < len(_STBL_PATH) and box.type == _STBL_PATH[depth]:
+            _shift_chunk_offsets(buf, box.payload, box.end, threshold, delta, depth + 1)
+        elif depth == len(_STBL_PATH) and box.type in (b"stco", b"co64"):
+            wide = box.type == b"co64"
+            fmt, width, limit = (">Q", 8, 0xFFFFFFFFFFFFFFFF) if wide else (">I", 4, 0xFFFFFFFF)
+            count = struct.unpack_from(">I", buf, box.payload + 4)[0]
+            pos = box.payload + 8
+            if pos + count * width > box.end:
+                raise AtomError(f"Truncated {box.type!r} table")
+            for _ in range(count):
+                offset = struct.unpack_from(fmt, buf, pos)[0]
+                if offset >= threshold:
+                    offset += delta
+                    if not 0 <= offset <= limit:
+                        raise AtomError("Chunk offset overflows stco; co64 would be required")
+                    struct.pack_into(fmt, buf, pos, offset)
+                pos += width
+
+
+def _rewrite(filepath: str, moov: Box, new_moov: bytearray, top: list[Box]) -> None:
+    """Rewrite the file with a resized moov box and shifted chunk offsets."""
+    if any(b.type == b"moof" for b in top):
+        raise AtomError("Fragmented MP4 cannot be rewritten natively")
+
+    delta = len(new_moov) - moov.size
+    new_header = _parse_header(bytes(new_moov[:16]), 0, len(new_moov))
+    _shift_chunk_offsets(new_moov, new_header.payload, len(new_moov), moov.end, delta)
+
+    directory = os.path.dirname(filepath) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".gpm-", suffix=".tmp")
+    try:
+        with open(filepath, "rb") as src, os.fdopen(fd, "wb") as dst:
+            remaining = moov.start
+            while remaining > 0:
+                chunk = src.read(min(remaining, 1 << 20))
+                if not chunk:
+                    raise AtomError("File shrank while rewriting")
+                dst.write(chunk)
+                remaining -= len(chunk)
+            dst.write(new_moov)
+            src.seek(moov.end)
+            shutil.copyfileobj(src, dst, 1 << 20)
+        shutil.copymode(filepath, tmp_path)
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def read_mp4_metadata(filepath: str) -> tuple[int, Optional[str]]:
+    """Read the creation time and location of an MP4/MOV/M4V file.
+
+    Only box headers, the start of mvhd and the udta box are read, so this
+    costs a few KB whatever the size of moov.
+
+    Returns:
+        The mvhd creation time as a Unix timestamp, and the udta/\\xa9xyz
+        location string if there is one
+
+    Raises:
+        AtomError: If the file has no moov box with an mvhd box
+    """
+    creation_time = None
+    location = None
+    with open(filepath, "rb") as f:
+        top = _top_level_boxes(f, os.fstat(f.fileno()).st_size)
+        moov = next((b for b in top if b.type == b"moov"), None)
+        if moov is None:
+            raise AtomError("No moov box")
+
+        pos = moov.payload
+        while moov.end - pos >= 8:
+            f.seek(pos)
+            box = _parse_header(f.read(16), pos, moov.end - pos)
+            if box.type == b"mvhd":
+                f.seek(box.payload)
+                head = f.read(12)
+                if head[:1] == b"\x01":
+                    creation_time = struct.unpack(">Q", head[4:12])[0]
+                else:
+                    creation_time = struct.unpack(">I", head[4:8])[0]
+            elif box.type == b"udta":
+                f.seek(box.payload)
+                udta = f.read(box.end - box.payload)
+                for child in _children(udta, 0, len(udta)):
+                    if child.type == XYZ_ATOM:
+                        length = struct.unpack_from(">H", udta, child.payload)[0]
+                        text = udta[child.payload + 4:min(child.payload + 4 + length, child.end)]
+                        location = text.decode("utf-8", "replace")
+            pos = box.end
+
+    if creation_time is None:
+        raise AtomError("No mvhd box in moov")
+    return creation_time - MAC_EPOCH_OFFSET, location
+
+
+def set_mp4_metadata(
+    filepath: str,
+    timestamp: int,
+    lat: Optional[float] = None,
+    lng: Optional[float] = None
+) -> None:
+    """Set creation time and location of an MP4/MOV/M4V file natively.
+
+    The mvhd, tkhd and mdhd creation/modification times are patched, and
+    the udta/\\xa9xyz location atom is added or replaced when coordinates are
+    given. When moov keeps its size, or is the last box, or is followed by
+    a free box with enough room, only moov is written. Otherwise the file
+    is rewritten once and its stco/co64 offsets are adjusted.
+
+    Args:
+        filepath: Path to the video file
+        timestamp: Unix timestamp for creation time
+        lat: Optional latitude
+        lng: Optional longitude
+
+    Raises:
+        AtomError: If the file cannot be patched natively (caller may fall
+                   back to ffmpeg); the file is left unmodified
+    """
+    mac_time = timestamp + MAC_EPOCH_OFFSET
+    if mac_time < 0:
+        raise AtomError("Timestamp before 1904 cannot be stored")
+
+    with open(filepath, "r+b") as f:
+        file_size = os.fstat(f.fileno()).st_size
+        top = _top_level_boxes(f, file_size)
+        position = next((i for i, b in enumerate(top) if b.type == b"moov"), None)
+        if position is None:
+            raise AtomError("No moov box")
+        moov = top[position]
+
+        f.seek(moov.start)
+        buf = bytearray(f.read(moov.size))
+        if len(buf) != moov.size:
+            raise AtomError("Truncated moov box")
+
+        if _patch_times(buf, moov.header, len(buf), mac_time) == 0:
+            raise AtomError("No mvhd box in moov")
+
+        new_moov = buf
+        if lat is not None and lng is not None:
+            new_moov = _with_location(buf, iso6709(lat, lng))
+
+        new_end = moov.start + len(new_moov)
+        following = top[position + 1] if position + 1 < len(top) else None
+
+        if len(new_moov) == moov.size or following is None:
+            # Same size, or moov is the last box: nothing after it moves
+            f.seek(moov.start)
+            f.write(new_moov)
+            if following is None:
+                f.truncate(new_end)
+            return
+
+        # Let moov grow into (or shrink towards) a following free box, or
+        # leave the freed space behind as a new free box
+        gap_end = following.end if following.type in _FREE_BOXES else moov.end
+        gap = gap_end - new_end
+        if gap == 0 or gap >= 8:
+            f.seek(moov.start)
+            f.write(new_moov)
+            if gap:
+                f.write(struct.pack(">I4s", gap, b"free"))
+            return
+
+    _rewrite(filepath, moov, new_moov, top)
@@ -0,0 +1,62 @@
+"""Numbered name variants: name.jpg, name(1).jpg, name(2).jpg, ...
+
+Google Photos numbers clashing names this way, and so do the output
+folders. Finding the first free variant by probing (1), (2), ... from the
+start every time is quadratic for libraries with thousands of clashing
+burst or screenshot names (IMG_0001.jpg). Names only ever become taken,
+never free again, so NameAllocator remembers where the last search for a
+name stopped and continues from there.
+"""
+from __future__ import annotations
+
+from typing import Optional
+
+__all__ = ["split_name", "NameAllocator"]
+
+
+def split_name(name: str) -> tuple[str, str]:
+    """Split ``name`` into base and extension (with its dot, or '')."""
+    base, ext = name.rsplit('.', 1) if '.' in name else (name, '')
+    return base, '.' + ext if ext else ''
+
+
+class NameAllocator:
+    """First free numbered variants of names in a set of taken names.
+
+    The set is used as-is and may be shared with other code, as long as
+    names are only ever added to it.
+
+    Attributes:
+        taken: Names in use; folded when ``casefold`` is set
+        casefold: Whether names differing only in case clash
+    """
+
+    __slots__ = ("taken", "casefold", "_next")
+
+    def __init__(self, taken: Optional[set[str]] = None, casefold: bool = False) -> None:
+        self.taken: set[str] = taken if taken is not None else set()
+        self.casefold = casefold
+        # Lowest variant number that may still be free, per name
+        self._next: dict[str, int] = {}
+
+    def _key(self, name: str) -> str:
+        return name.casefold() if self.casefold else name
+
+    def first_free(self, name: str) -> str:
+        """Return ``name`` or its first numbered variant that is not taken."""
+        key = self._key(name)
+        if key not in self.taken:
+            return name
+
+        base, ext = split_name(name)
+        i = self._next.get(key, 1)
+        while self._key(f"{base}({i}){ext}") in self.taken:
+            i += 1
+        self._next[key] = i
+        return f"{base}({i}){ext}"
+
+    def allocate(self, name: str) -> str:
+        """Take and return ``name`` or its first free numbered variant."""
+        candidate = self.first_free(name)
+        self.taken.add(self._key(candidate))
+        return candidate
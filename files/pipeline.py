@@ -0,0 +1,180 @@
+"""Threaded pipeline of stages connected by bounded queues.
+
+Each stage owns a queue and a pool of worker threads. A stage function
+handles one item and returns the name of the stage that should see it
+next, or None when the item is done. Queues are bounded, so a slow stage
+applies back-pressure to the ones feeding it, and each stage can be sized
+for its own workload (CPU-bound decoding vs. I/O-bound moves).
+"""
+from __future__ import annotations
+
+import queue
+import threading
+from typing import Callable, Generic, Iterable, Iterator, Optional, Sequence, TypeVar
+
+__all__ = ["Stage", "Pipeline"]
+
+T = TypeVar("T")
+
+# How often blocked workers re-check for shutdown (seconds)
+_POLL_INTERVAL = 0.05
+
+
+class _Fed:
+    """Marker sent once every input item has been queued."""
+
+    def __init__(self, count: int) -> None:
+        self.count = count
+
+
+class _Failure:
+    """An exception raised by a stage function or the input iterator."""
+
+    def __init__(self, error: BaseException) -> None:
+        self.error = error
+
+
+class Stage(Generic[T]):
+    """One step of the pipeline.
+
+    Attributes:
+        name: Stage name, used for routing and thread names
+        fn: Handles one item; returns the next stage name or None when done
+        workers: Number of worker threads
+        capacity: Maximum number of items waiting in the stage's queue
+        processed: Number of items handled so far
+        peak_depth: Largest queue depth observed
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fn: Callable[[T], Optional[str]],
+        workers: int = 1,
+        capacity: int = 0
+    ) -> None:
+        if workers < 1:
+            raise ValueError(f"Stage {name!r} needs at least one worker")
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.capacity = capacity or workers * 4
+        self.processed = 0
+        self.peak_depth = 0
+        self.queue: queue.Queue = queue.Queue(maxsize=self.capacity)
+        self._lock = threading.Lock()
+
+    @property
+    def depth(self) -> int:
+        """Number of items currently waiting in the queue."""
+        return self.queue.qsize()
+
+    def _record(self) -> None:
+        with self._lock:
+            self.processed += 1
+
+    def _observe_depth(self) -> None:
+        depth = self.queue.qsize()
+        with self._lock:
+            if depth > self.peak_depth:
+                self.peak_depth = depth
+
+
+class Pipeline(Generic[T]):
+    """Stages run concurrently; items enter at the first stage, unless
+    ``run`` is given an ``entry`` function naming their start stage.
+
+    Example:
+        pipeline = Pipeline([Stage("parse", parse, 2), Stage("save", save, 4)])
+        for item in pipeline.run(items):
+            ...
+    """
+
+    def __init__(self, stages: Sequence[Stage[T]]) -> None:
+        if not stages:
+            raise ValueError("Pipeline needs at least one stage")
+        self.stages = {stage.name: stage for stage in stages}
+        self._first = stages[0]
+        self._stop = threading.Event()
+
+    def depths(self) -> dict[str, int]:
+        """Current queue depth of every stage."""
+        return {name: stage.depth for name, stage in self.stages.items()}
+
+    def _put(self, target: queue.Queue, item: object) -> bool:
+        """Put ``item`` on ``target``, giving up if the pipeline is stopping."""
+        while not self._stop.is_set():
+            try:
+                target.put(item, timeout=_POLL_INTERVAL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _feed(self, items: Iterable[T], output: queue.Queue, entry: Optional[Callable[[T], str]]) -> None:
+        count = 0
+        try:
+            for item in items:
+                stage = self._first if entry is None else self.stages[entry(item)]
+                if not self._put(stage.queue, item):
+                    return
+                stage._observe_depth()
+                count += 1
+        except BaseException as e:
+            self._put(output, _Failure(e))
+            return
+        self._put(output, _Fed(count))
+
+    def _work(self, stage: Stage[T], output: queue.Queue) -> None:
+        while not self._stop.is_set():
+            try:
+                item = stage.queue.get(timeout=_POLL_INTERVAL)
+            except queue.Empty:
+                continue
+            try:
+                next_stage = stage.fn(item)
+                target = output if next_stage is None else self.stages[next_stage].queue
+            except BaseException as e:
+                self._put(output, _Failure(e))
+                return
+            stage._record()
+            if not self._put(target, item):
+                return
+            if next_stage is not None:
+                self.stages[next_stage]._observe_depth()
+
+    def run(self, items: Iterable[T], entry: Optional[Callable[[T], str]] = None) -> Iterator[T]:
+        """Push ``items`` through the stages, yielding each one as it finishes.
+
+        Items are yielded in completion order. ``entry`` may return the
+        name of the stage each item starts at, e.g. to resume work. An
+        exception raised by a stage function or by ``items`` stops the
+        pipeline and is re-raised here.
+        """
+        self._stop.clear()
+        output: queue.Queue = queue.Queue(maxsize=sum(s.capacity for s in self.stages.values()))
+        threads = [threading.Thread(target=self._feed, args=(items, output, entry), name="pipeline-feed", daemon=True)]
+        for stage in self.stages.values():
+            threads += [
+                threading.Thread(target=self._work, args=(stage, output), name=f"{stage.name}-{i}", daemon=True)
+                for i in range(stage.workers)
+            ]
+        for thread in threads:
+            thread.start()
+
+        total: Optional[int] = None
+        done = 0
+        try:
+            while total is None or done < total:
+                message = output.get()
+                if isinstance(message, _Fed):
+                    total = message.count
+                elif isinstance(message, _Failure):
+                    raise message.error
+                else:
+                    done += 1
+                    yield message
+        finally:
+            self._stop.set()
+            for thread in threads:
+                thread.join()
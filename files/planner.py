@@ -0,0 +1,353 @@
+"""Planning stage: resolve every JSON sidecar to its media before any I/O.
+
+The planner reads all sidecars, then matches them against a MediaIndex in a
+fixed order. The result is an immutable MatchPlan that the executor can apply
+in parallel without shared state or locks. Planning never modifies files.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import zlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Iterable, Optional
+
+from auxFunctions import MediaMatch, resolveMedia
+from catalog import SidecarCatalog
+from media_index import MediaIndex, TreeIndex
+from sidecar import SidecarRecord, read_sidecar
+
+logger = logging.getLogger("GooglePhotosMatcher")
+
+__all__ = ["LAYOUTS", "PlannedOperation", "PlanError", "MatchPlan", "layout_subdir", "build_plan", "build_tree_plan"]
+
+# Output layouts, below the output folder of each Takeout folder:
+# flat: no subfolders; year: YYYY/; month: YYYY/MM/ (from photoTakenTime);
+# hash: one of 256 buckets (00/ to ff/) picked by the media name
+LAYOUTS = ("flat", "year", "month", "hash")
+
+
+@dataclass(frozen=True)
+class PlannedOperation:
+    """A resolved JSON -> media match and the metadata to apply.
+
+    Attributes:
+        json_name: Name of the JSON sidecar
+        directory: Folder containing both the sidecar and the media
+        title: Filename of the matched media
+        timestamp: photoTakenTime as a Unix timestamp
+        latitude: geoData latitude, if present
+        longitude: geoData longitude, if present
+        altitude: geoData altitude, if present
+        raw_original: Unedited original to move to EditedRaw, if any
+        output_subdir: Folder under MatchedMedia/EditedRaw to write to
+        output_name: Name reserved in MatchedMedia, if not the title
+        unconverted_name: Name reserved in MatchedMedia for media planned
+                          to be converted, in case it keeps its format, if
+                          not the title
+        raw_output_name: Name reserved in EditedRaw, if not raw_original
+    """
+    json_name: str
+    directory: str
+    title: str
+    timestamp: int
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    altitude: Optional[float] = None
+    raw_original: Optional[str] = None
+    output_subdir: str = ""
+    output_name: str = ""
+    unconverted_name: str = ""
+    raw_output_name: str = ""
+
+    @property
+    def source(self) -> str:
+        """Full path of the matched media."""
+        return os.path.join(self.directory, self.title)
+
+    @property
+    def json_path(self) -> str:
+        """Full path of the JSON sidecar."""
+        return os.path.join(self.directory, self.json_name)
+
+    @property
+    def has_location(self) -> bool:
+        """Whether the sidecar had latitude and longitude."""
+        return self.latitude is not None and self.longitude is not None
+
+
+@dataclass(frozen=True)
+class PlanError:
+    """A sidecar that could not be planned.
+
+    Attributes:
+        json_name: Name of the JSON sidecar
+        error: Reason the sidecar was skipped
+        title: Media title from the sidecar, if it could be read
+    """
+    json_name: str
+    error: str
+    title: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class MatchPlan:
+    """Immutable result of the planning stage.
+
+    Attributes:
+        operations: Matches to apply, in planning order
+        errors: Sidecars that could not be matched
+    """
+    operations: tuple[PlannedOperation, ...]
+    errors: tuple[PlanError, ...]
+
+    def __len__(self) -> int:
+        return len(self.operations) + len(self.errors)
+
+    @property
+    def output_subdirs(self) -> set[str]:
+        """Distinct output folders the operations write to."""
+        return {op.output_subdir for op in self.operations}
+
+
+def layout_subdir(layout: str, title: str, timestamp: int) -> str:
+    """Folder of ``title`` below its output folder in ``layout``.
+
+    Dates are local time, like the EXIF dates written from the same
+    timestamp.
+    """
+    if layout == "flat":
+        return ""
+    if layout == "hash":
+        return f"{zlib.crc32(title.encode('utf-8')) & 0xff:02x}"
+    try:
+        date = datetime.fromtimestamp(timestamp)
+    except (OverflowError, OSError, ValueError):
+        return "unknown-date"
+    if layout == "year":
+        return f"{date.year:04d}"
+    return os.path.join(f"{date.year:04d}", f"{date.month:02d}")
+
+
+def _read_sidecar(path: str) -> tuple[Optional[SidecarRecord], Optional[str]]:
+    """Read a JSON sidecar, returning (record, error)."""
+    try:
+        return read_sidecar(path), None
+    except Exception as e:
+        return None, str(e)
+
+
+def _stat(path: str) -> Optional[os.stat_result]:
+    try:
+        return os.stat(path)
+    except OSError:
+        return None
+
+
+def _sort_sidecars(json_names: Iterable[str]) -> list[str]:
+    """Shortest name first (name.jpg before name(1).jpg), ties broken by name."""
+    return sorted(json_names, key=lambda n: (len(n), n))
+
+
+def _read_sidecars(
+    paths: list[str],
+    max_workers: int,
+    processes: bool = False
+) -> list[tuple[Optional[SidecarRecord], Optional[str]]]:
+    """Read sidecars concurrently, preserving order.
+
+    With ``processes`` the JSON is decoded in worker processes, in chunks,
+    so decoding is not limited by the GIL.
+    """
+    if max_workers > 1 and len(paths) > 1:
+        if processes:
+            chunksize = max(1, min(256, len(paths) // (max_workers * 4)))
+            with ProcessPoolExecutor(max_workers=max_workers) as pool:
+                return list(pool.map(_read_sidecar, paths, chunksize=chunksize))
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            return list(pool.map(_read_sidecar, paths))
+    return [_read_sidecar(p) for p in paths]
+
+
+def _match_sidecars(
+    index: MediaIndex,
+    names: list[str],
+    sidecars: list[tuple[Optional[SidecarRecord], Optional[str]]],
+    editedWord: str,
+    output_subdir: str,
+    operations: list[PlannedOperation],
+    errors: list[PlanError],
+    hints: Optional[list[Optional[MediaMatch]]] = None,
+    layout: str = "flat"
+) -> list[Optional[MediaMatch]]:
+    """Resolve sorted sidecars of one folder against its index.
+
+    A hint (the match from a previous run) is used instead of resolving
+    again as long as its media is still available.
+
+    Returns:
+        The match of every sidecar, None where it could not be planned
+    """
+    matches: list[Optional[MediaMatch]] = [None] * len(names)
+    for position, (name, (record, read_error)) in enumerate(zip(names, sidecars)):
+        if record is None:
+            logger.error(f"Could not read JSON {name}: {read_error}")
+            errors.append(PlanError(name, str(read_error)))
+            continue
+
+        titleOriginal = record.title
+        if titleOriginal is None:
+            logger.warning(f"Missing 'title' in JSON: {name}")
+            errors.append(PlanError(name, "Missing 'title' in JSON"))
+            continue
+
+        timeStamp = record.timestamp
+        if timeStamp is None:
+            logger.warning(f"Missing timestamp in JSON: {name}")
+            errors.append(PlanError(name, "Missing timestamp in JSON", titleOriginal))
+            continue
+
+        hint = hints[position] if hints else None
+        try:
+            if hint is not None and index.is_available(hint.name) and (
+                    hint.raw_original is None or index.is_available(hint.raw_original)):
+                match = hint
+            else:
+                match = resolveMedia(titleOriginal, index, editedWord)
+        except Exception as e:
+            logger.error(f"Error on resolveMedia() with file {titleOriginal}: {e}")
+            errors.append(PlanError(name, f"Match error: {e}", titleOriginal))
+            continue
+
+        if match is None:
+            logger.warning(f"{titleOriginal} not found")
+            errors.append(PlanError(name, f"{titleOriginal} not found", titleOriginal))
+            continue
+
+        shard = layout_subdir(layout, match.name, timeStamp)
+        index.claim(match.name)
+        if match.raw_original is not None:
+            index.discard(match.raw_original)
+
+        operations.append(PlannedOperation(
+            json_name=name,
+            directory=index.path,
+            title=match.name,
+            timestamp=timeStamp,
+            latitude=record.latitude,
+            longitude=record.longitude,
+            altitude=record.altitude,
+            raw_original=match.raw_original,
+            output_subdir=os.path.join(output_subdir, shard) if shard else output_subdir,
+        ))
+        matches[position] = match
+    return matches
+
+
+def build_plan(
+    index: MediaIndex,
+    json_names: Iterable[str],
+    editedWord: str,
+    max_workers: int = 1,
+    layout: str = "flat"
+) -> MatchPlan:
+    """Read every sidecar in ``index.path`` and resolve its media.
+
+    Sidecars are matched shortest name first (so name.jpg is claimed
+    before name(1).jpg), with ties broken by name, so the plan does not
+    depend on listing or scheduling order. ``index`` is updated as names
+    are claimed and originals are planned to move to EditedRaw.
+
+    Args:
+        index: Snapshot of the folder containing sidecars and media
+        json_names: Names of the JSON sidecars to plan
+        editedWord: Suffix indicating edited versions
+        max_workers: Number of threads used to read sidecars
+        layout: One of LAYOUTS, for the output folders
+
+    Returns:
+        MatchPlan with the resolved operations and per-sidecar errors
+    """
+    names = _sort_sidecars(json_names)
+    sidecars = _read_sidecars([index.path_of(name) for name in names], max_workers)
+
+    operations: list[PlannedOperation] = []
+    errors: list[PlanError] = []
+    _match_sidecars(index, names, sidecars, editedWord, "", operations, errors, layout=layout)
+    return MatchPlan(tuple(operations), tuple(errors))
+
+
+def build_tree_plan(
+    tree: TreeIndex,
+    editedWord: str,
+    max_workers: int = 1,
+    processes: bool = False,
+    catalog: Optional[SidecarCatalog] = None,
+    reader: Optional[Callable[[list[str]], list[tuple[Optional[SidecarRecord], Optional[str]]]]] = None,
+    layout: str = "flat"
+) -> MatchPlan:
+    """Plan every folder of ``tree`` as a single run.
+
+    All sidecars of the tree are read in one concurrent pass; each folder
+    is then matched against its own index, in sorted folder order. Output
+    of a folder goes to the same relative folder under MatchedMedia and
+    EditedRaw, so equal names in different folders never collide.
+
+    Args:
+        tree: Scanned Takeout tree
+        editedWord: Suffix indicating edited versions
+        max_workers: Number of threads (or processes) used to read sidecars
+        processes: Decode sidecars in worker processes instead of threads
+        catalog: Catalog of sidecars parsed by earlier runs; only new or
+                 changed sidecars are read, and the catalog is updated
+        reader: Reads sidecars by path instead of the filesystem (e.g. from
+                archives), returning (record, error) pairs in order
+        layout: One of LAYOUTS; files of a folder are spread over
+                subfolders of its output folder
+
+    Returns:
+        MatchPlan covering every folder of the tree
+    """
+    folders = [(index, _sort_sidecars(tree.sidecars.get(index.path, ()))) for index in tree]
+    paths = [index.path_of(name) for index, names in folders for name in names]
+
+    hints: list[Optional[MediaMatch]] = [None] * len(paths)
+    stats: list[Optional[os.stat_result]] = []
+    if reader is not None:
+        sidecars = reader(paths)
+    elif catalog is None:
+        sidecars = _read_sidecars(paths, max_workers, processes)
+    else:
+        stats = [_stat(path) for path in paths]
+        sidecars = [(None, None)] * len(paths)
+        misses = []
+        for position, (path, stat) in enumerate(zip(paths, stats)):
+            entry = catalog.lookup(path, stat)
+            if entry is None:
+                misses.append(position)
+            else:
+                sidecars[position] = (entry.record, None)
+                hints[position] = entry.match
+        logger.debug(f"Sidecar catalog: {len(paths) - len(misses)} cached, {len(misses)} to read")
+        for position, sidecar in zip(misses, _read_sidecars([paths[i] for i in misses], max_workers, processes)):
+            sidecars[position] = sidecar
+
+    operations: list[PlannedOperation] = []
+    errors: list[PlanError] = []
+    offset = 0
+    for index, names in folders:
+        end = offset + len(names)
+        matches = _match_sidecars(index, names, sidecars[offset:end], editedWord,
+                                  tree.relative_path(index.path), operations, errors, hints[offset:end], layout)
+        if catalog is not None:
+            for position, match in zip(range(offset, end), matches):
+                record, stat = sidecars[position][0], stats[position]
+                if record is not None and stat is not None:
+                    catalog.record(paths[position], stat, record, match)
+        offset = end
+
+    if catalog is not None:
+        catalog.flush(index.path for index in tree)
+    return MatchPlan(tuple(operations), tuple(errors))
@@ -0,0 +1,135 @@
+"""Bounded task submission for the parallel execution path.
+
+Instead of submitting one future per operation up front, each lane keeps
+at most a fixed number of tasks in flight and pulls the next item from its
+iterator only when a slot frees up. Memory use therefore depends on the
+number of workers, not on the size of the library.
+
+Memory-hungry tasks (full image decodes) also reserve their estimated
+footprint from a MemoryBudget, so the workers never hold more than the
+budget at once.
+"""
+from __future__ import annotations
+
+import multiprocessing
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, wait
+from contextlib import contextmanager
+from itertools import islice
+from typing import Callable, Generic, Iterable, Iterator, TypeVar
+
+__all__ = ["Lane", "MemoryBudget", "IN_FLIGHT_PER_WORKER", "batched", "run_bounded"]
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# Tasks queued per worker so workers never wait for the scheduler
+IN_FLIGHT_PER_WORKER = 4
+
+
+def batched(items: Iterable[T], size: int) -> Iterator[tuple[T, ...]]:
+    """Group ``items`` into tuples of at most ``size`` elements."""
+    if size < 1:
+        raise ValueError("size must be at least 1")
+    iterator = iter(items)
+    while batch := tuple(islice(iterator, size)):
+        yield batch
+
+
+class Lane(Generic[T]):
+    """A stream of work items feeding one executor.
+
+    Attributes:
+        executor: Pool running this lane's tasks
+        limit: Maximum number of tasks submitted but not yet collected
+    """
+
+    def __init__(self, executor: Executor, items: Iterable[T], limit: int) -> None:
+        if limit < 1:
+            raise ValueError("limit must be at least 1")
+        self.executor = executor
+        self.limit = limit
+        self._items = iter(items)
+        self._exhausted = False
+
+    def next_item(self) -> tuple[bool, T | None]:
+        """Return (True, item), or (False, None) once the lane is drained."""
+        if not self._exhausted:
+            for item in self._items:
+                return True, item
+            self._exhausted = True
+        return False, None
+
+
+def run_bounded(fn: Callable[[T], R], lanes: Iterable[Lane[T]]) -> Iterator[R]:
+    """Run ``fn`` over every lane's items, yielding results as they complete.
+
+    Each lane has at most ``lane.limit`` tasks in flight; a new item is
+    submitted to a lane as soon as the result of one of its tasks has
+    been consumed.
+
+    Args:
+        fn: Function applied to each item
+        lanes: Lanes to drain, each with its own executor and limit
+
+    Yields:
+        Results in completion order
+    """
+    owner: dict[Future[R], Lane[T]] = {}
+
+    def fill(lane: Lane[T], free: int) -> None:
+        for _ in range(free):
+            has_item, item = lane.next_item()
+            if not has_item:
+                return
+            owner[lane.executor.submit(fn, item)] = lane
+
+    for lane in lanes:
+        fill(lane, lane.limit)
+
+    while owner:
+        done, _ = wait(owner, return_when=FIRST_COMPLETED)
+        for future in done:
+            lane = owner.pop(future)
+            yield future.result()
+            fill(lane, 1)
+
+
+class MemoryBudget:
+    """Bytes of memory shared by the tasks that reserve from it.
+
+    A reservation waits until it fits next to the ones being held, so
+    large reservations wait for headroom while small ones keep going. One
+    larger than the whole budget is admitted once nothing else is held.
+    The counter lives in shared memory, so a budget handed to worker
+    processes when they start is shared with them.
+
+    Attributes:
+        limit: Budget in bytes
+    """
+
+    def __init__(self, limit: int) -> None:
+        if limit < 1:
+            raise ValueError("limit must be at least 1")
+        self.limit = limit
+        self._condition = multiprocessing.Condition()
+        self._used = multiprocessing.RawValue("q", 0)
+
+    @property
+    def used(self) -> int:
+        """Bytes currently reserved."""
+        return self._used.value
+
+    @contextmanager
+    def reserve(self, amount: int) -> Iterator[None]:
+        """Hold ``amount`` bytes of the budget for the duration of the block."""
+        amount = min(amount, self.limit)
+        with self._condition:
+            while self._used.value and self._used.value + amount > self.limit:
+                self._condition.wait()
+            self._used.value += amount
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._used.value -= amount
+                self._condition.notify_all()
@@ -0,0 +1,188 @@
+"""Decoding of Google Takeout JSON sidecars.
+
+Sidecars carry much more than the matcher needs (people, imageViews,
+googlePhotosOrigin, URLs, ...). Only title, photoTakenTime.timestamp and
+geoData are extracted, into a compact SidecarRecord. msgspec (typed,
+skips unknown fields without building them) or orjson are used when
+installed; the standard library json module is the fallback.
+"""
+from __future__ import annotations
+
+import json
+from typing import Any, Callable, Optional, Union
+
+__all__ = ["SidecarError", "SidecarRecord", "BACKENDS", "decode_sidecar", "read_sidecar"]
+
+
+class SidecarError(ValueError):
+    """The sidecar is not valid JSON."""
+
+
+class SidecarRecord:
+    """The fields of a sidecar used for matching.
+
+    Attributes:
+        title: Original media filename, None if missing or not a string
+        timestamp: photoTakenTime as a Unix timestamp, None if missing or invalid
+        latitude: geoData latitude, if present
+        longitude: geoData longitude, if present
+        altitude: geoData altitude, if present
+    """
+    __slots__ = ("title", "timestamp", "latitude", "longitude", "altitude")
+
+    def __init__(
+        self,
+        title: Optional[str] = None,
+        timestamp: Optional[int] = None,
+        latitude: Optional[float] = None,
+        longitude: Optional[float] = None,
+        altitude: Optional[float] = None
+    ) -> None:
+        self.title = title
+        self.timestamp = timestamp
+        self.latitude = latitude
+        self.longitude = longitude
+        self.altitude = altitude
+
+    def _fields(self) -> tuple:
+        return (self.title, self.timestamp, self.latitude, self.longitude, self.altitude)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, SidecarRecord):
+            return NotImplemented
+        return self._fields() == other._fields()
+
+    def __repr__(self) -> str:
+        return (f"SidecarRecord(title={self.title!r}, timestamp={self.timestamp!r}, "
+                f"latitude={self.latitude!r}, longitude={self.longitude!r}, altitude={self.altitude!r})")
+
+    def __getstate__(self) -> tuple:
+        return self._fields()
+
+    def __setstate__(self, state: tuple) -> None:
+        self.title, self.timestamp, self.latitude, self.longitude, self.altitude = state
+
+
+def _timestamp(value: Any) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _float(value: Any) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _from_object(data: Any) -> SidecarRecord:
+    """Extract a record from a fully decoded sidecar."""
+    if not isinstance(data, dict):
+        return SidecarRecord()
+    title = data.get('title')
+    taken = data.get('photoTakenTime')
+    geo = data.get('geoData')
+    if not isinstance(geo, dict):
+        geo = {}
+    return SidecarRecord(
+        title=title if isinstance(title, str) else None,
+        timestamp=_timestamp(taken.get('timestamp')) if isinstance(taken, dict) else None,
+        latitude=_float(geo.get('latitude')),
+        longitude=_float(geo.get('longitude')),
+        altitude=_float(geo.get('altitude')),
+    )
+
+
+def _decode_json(raw: bytes) -> SidecarRecord:
+    try:
+        return _from_object(json.loads(raw))
+    except (ValueError, RecursionError) as e:
+        raise SidecarError(str(e)) from e
+
+
+_DECODERS: dict[str, Callable[[bytes], SidecarRecord]] = {"json": _decode_json}
+
+try:
+    import orjson
+except ImportError:
+    pass
+else:
+    def _decode_orjson(raw: bytes) -> SidecarRecord:
+        try:
+            return _from_object(orjson.loads(raw))
+        except orjson.JSONDecodeError as e:
+            raise SidecarError(str(e)) from e
+
+    _DECODERS = {"orjson": _decode_orjson, **_DECODERS}
+
+try:
+    import msgspec
+except ImportError:
+    pass
+else:
+    class _Taken(msgspec.Struct):
+        timestamp: Union[str, int, None] = None
+
+    class _Geo(msgspec.Struct):
+        latitude: Optional[float] = None
+        longitude: Optional[float] = None
+        altitude: Optional[float] = None
+
+    class _Sidecar(msgspec.Struct):
+        title: Optional[str] = None
+        photoTakenTime: Optional[_Taken] = None
+        geoData: Optional[_Geo] = None
+
+    _typed_decoder = msgspec.json.Decoder(_Sidecar)
+
+    def _decode_msgspec(raw: bytes) -> SidecarRecord:
+        try:
+            sidecar = _typed_decoder.decode(raw)
+        except msgspec.ValidationError:
+            # Unusual types (e.g. coordinates as strings): decode untyped
+            # and extract the same way as the other backends
+            try:
+                return _from_object(msgspec.json.decode(raw))
+            except msgspec.DecodeError as e:
+                raise SidecarError(str(e)) from e
+        except msgspec.DecodeError as e:
+            raise SidecarError(str(e)) from e
+        geo = sidecar.geoData
+        return SidecarRecord(
+            title=sidecar.title,
+            timestamp=_timestamp(sidecar.photoTakenTime.timestamp) if sidecar.photoTakenTime else None,
+            latitude=geo.latitude if geo else None,
+            longitude=geo.longitude if geo else None,
+            altitude=geo.altitude if geo else None,
+        )
+
+    _DECODERS = {"msgspec": _decode_msgspec, **_DECODERS}
+
+# Installed backends, fastest first
+BACKENDS: tuple[str, ...] = tuple(_DECODERS)
+
+
+def decode_sidecar(raw: bytes, backend: Optional[str] = None) -> SidecarRecord:
+    """Decode sidecar bytes into a SidecarRecord.
+
+    Args:
+        raw: Contents of the JSON file
+        backend: One of BACKENDS; defaults to the fastest installed
+
+    Raises:
+        SidecarError: If ``raw`` is not valid JSON
+    """
+    return _DECODERS[backend or BACKENDS[0]](raw)
+
+
+def read_sidecar(path: str, backend: Optional[str] = None) -> SidecarRecord:
+    """Read and decode the sidecar at ``path``.
+
+    Raises:
+        OSError: If the file cannot be read
+        SidecarError: If it is not valid JSON
+    """
+    with open(path, "rb") as f:
+        return decode_sidecar(f.read(), backend)
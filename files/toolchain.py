@@ -0,0 +1,103 @@
+"""External tool discovery (ffmpeg/ffprobe), probed once per process."""
+from __future__ import annotations
+
+import logging
+import shutil
+import subprocess
+import threading
+from dataclasses import dataclass, field
+from typing import Optional
+
+__all__ = ["ToolInfo", "Toolchain", "get_toolchain", "ffmpeg_timeout"]
+
+logger = logging.getLogger("GooglePhotosMatcher")
+
+# Minimum time any ffmpeg remux is allowed to take
+FFMPEG_BASE_TIMEOUT = 60.0
+
+# Slowest stream-copy throughput we tolerate before giving up (bytes/s)
+FFMPEG_MIN_THROUGHPUT = 8 * 1024 * 1024
+
+
+@dataclass(frozen=True)
+class ToolInfo:
+    """Result of probing one external executable.
+
+    Attributes:
+        name: Executable name (e.g. 'ffmpeg')
+        path: Resolved path, or None if not installed
+        version: Version string reported by '-version'
+        features: Build features from the '--enable-*' configure flags
+    """
+    name: str
+    path: Optional[str] = None
+    version: Optional[str] = None
+    features: frozenset[str] = field(default_factory=frozenset)
+
+    @property
+    def available(self) -> bool:
+        return self.path is not None
+
+
+@dataclass(frozen=True)
+class Toolchain:
+    """The external tools used for video metadata."""
+    ffmpeg: ToolInfo
+    ffprobe: ToolInfo
+
+
+def _parse_version_output(output: str) -> tuple[Optional[str], frozenset[str]]:
+    """Extract the version and enabled features from '<tool> -version' output."""
+    version = None
+    features: set[str] = set()
+    for line in output.splitlines():
+        words = line.split()
+        if version is None and len(words) >= 3 and words[1] == "version":
+            version = words[2]
+        elif line.startswith("configuration:"):
+            features.update(w[len("--enable-"):] for w in words if w.startswith("--enable-"))
+    return version, frozenset(features)
+
+
+def probe_tool(name: str) -> ToolInfo:
+    """Locate ``name`` on PATH and query its version and features."""
+    path = shutil.which(name)
+    if path is None:
+        return ToolInfo(name)
+    try:
+        result = subprocess.run([path, "-version"], capture_output=True, timeout=5)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        logger.debug(f"{name} probe failed: {e}")
+        return ToolInfo(name)
+    if result.returncode != 0:
+        return ToolInfo(name)
+    version, features = _parse_version_output(result.stdout.decode(errors="replace"))
+    return ToolInfo(name, path, version, features)
+
+
+_toolchain: Optional[Toolchain] = None
+_toolchain_lock = threading.Lock()
+
+
+def get_toolchain(refresh: bool = False) -> Toolchain:
+    """Return the process-wide toolchain, probing the tools on first use.
+
+    Args:
+        refresh: Probe again even if a cached result exists
+
+    Returns:
+        Cached Toolchain
+    """
+    global _toolchain
+    with _toolchain_lock:
+        if _toolchain is None or refresh:
+            _toolchain = Toolchain(probe_tool("ffmpeg"), probe_tool("ffprobe"))
+            for tool in (_toolchain.ffmpeg, _toolchain.ffprobe):
+                if tool.available:
+                    logger.debug(f"Found {tool.name} {tool.version} at {tool.path}")
+        return _toolchain
+
+
+def ffmpeg_timeout(size: int) -> float:
+    """Timeout in seconds for remuxing a file of ``size`` bytes with ffmpeg."""
+    return FFMPEG_BASE_TIMEOUT + max(size, 0) / FFMPEG_MIN_THROUGHPUT
@@ -1,54 +1,98 @@
-"""Video metadata handling using ffmpeg."""
+"""Video metadata handling (native MP4/MOV writer with ffmpeg fallback)."""
 from __future__ import annotations
 
 import subprocess
 import os
+import struct
 from datetime import datetime
 from typing import Optional
 import logging
 
+from mp4_atoms import MP4_EXTENSIONS, AtomError, iso6709, read_mp4_metadata, set_mp4_metadata
+from toolchain import ffmpeg_timeout, get_toolchain
+
 logger = logging.getLogger("GooglePhotosMatcher")
 
 
 def is_ffmpeg_available() -> bool:
-    """Check if ffmpeg is installed and accessible."""
+    """Check if ffmpeg is installed and accessible (probed once per process)."""
+    return get_toolchain().ffmpeg.available
+
+
+def supports_native_metadata(filepath: str) -> bool:
+    """Whether the native MP4/MOV writer handles this file type."""
+    return filepath.rsplit('.', 1)[-1].casefold() in MP4_EXTENSIONS
+
+
+def video_metadata_matches(
+    filepath: str,
+    timestamp: int,
+    lat: Optional[float] = None,
+    lng: Optional[float] = None
+) -> bool:
+    """Whether an MP4/MOV/M4V file already has this creation time and location.
+
+    Only the moov headers are read. Files the native reader cannot parse
+    never match.
+    """
     try:
-        result = subprocess.run(
-            ["ffmpeg", "-version"],
-            capture_output=True,
-            timeout=5
-        )
-        return result.returncode == 0
-    except (FileNotFoundError, subprocess.TimeoutExpired):
+        creation_time, location = read_mp4_metadata(filepath)
+    except (AtomError, struct.error) as e:
+        logger.debug(f"Cannot read metadata of {filepath}: {e}")
+        return False
+    if creation_time != timestamp:
         return False
+    return lat is None or lng is None or location == iso6709(lat, lng)
 
 
 def set_video_metadata(
     filepath: str,
     timestamp: int,
     lat: Optional[float] = None,
-    lng: Optional[float] = None
+    lng: Optional[float] = None,
+    allow_ffmpeg: bool = True,
+    native: Optional[bool] = None
 ) -> bool:
-    """Set video metadata using ffmpeg.
+    """Set video creation time and location.
+
+    MP4/MOV/M4V files are patched in place by the native atom writer,
+    which touches only a few KB for most files. Other containers, or
+    files the native writer cannot handle, are remuxed with ffmpeg.
 
     Args:
         filepath: Path to video file
         timestamp: Unix timestamp for creation time
         lat: Optional latitude
         lng: Optional longitude
+        allow_ffmpeg: Whether ffmpeg may be used as a fallback
+        native: Whether the file is MP4/MOV, if known from its content;
+                by default this is decided by the extension
 
     Returns:
         True if successful, False otherwise
     """
+    if native is None:
+        native = supports_native_metadata(filepath)
+    if native:
+        try:
+            set_mp4_metadata(filepath, timestamp, lat, lng)
+            return True
+        except (AtomError, struct.error) as e:
+            logger.debug(f"Native MP4 writer cannot handle {filepath}, falling back to ffmpeg: {e}")
+
+    if not allow_ffmpeg:
+        return False
+
     if not is_ffmpeg_available():
         logger.warning("ffmpeg not available, skipping video metadata")
         return False
 
     date_str = datetime.fromtimestamp(timestamp).strftime("%Y-%m-%dT%H:%M:%S")
+    timeout = ffmpeg_timeout(os.path.getsize(filepath))
 
     # Build ffmpeg command
     cmd = [
-        "ffmpeg", "-i", filepath,
+        get_toolchain().ffmpeg.path or "ffmpeg", "-i", filepath,
         "-metadata", f"creation_time={date_str}",
         "-codec", "copy",  # No re-encoding
         "-y",  # Overwrite output
@@ -57,12 +101,12 @@ def set_video_metadata(
 
     # Add location if provided
     if lat is not None and lng is not None:
-        location = f"{lat:+.6f}{lng:+.6f}/"
+        location = iso6709(lat, lng)
         cmd.insert(-2, "-metadata")
         cmd.insert(-2, f"location={location}")
 
     try:
-        result = subprocess.run(cmd, capture_output=True, timeout=300)
+        result = subprocess.run(cmd, capture_output=True, timeout=timeout)
         if result.returncode == 0:
             os.replace(filepath + ".tmp", filepath)
             return True
@@ -73,7 +117,7 @@ def set_video_metadata(
                 os.remove(filepath + ".tmp")
             return False
     except subprocess.TimeoutExpired:
-        logger.error("ffmpeg timeout")
+        logger.error(f"ffmpeg timeout after {timeout:.0f}s")
         if os.path.exists(filepath + ".tmp"):
             os.remove(filepath + ".tmp")
         return False
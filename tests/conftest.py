@@ -2,18 +2,27 @@
 
 from __future__ import annotations
 
+import json
 import os
+import random
 import sys
 import tempfile
 import shutil
 from pathlib import Path
-from typing import Generator
+from typing import Generator, Optional
 
 import pytest
+from PIL import Image
 
 # Add the files directory to the path so we can import auxFunctions
 sys.path.insert(0, str(Path(__file__).parent.parent / "files"))
 
+from executor import ExecutionSettings  # noqa: E402
+from planner import PlannedOperation  # noqa: E402
+
+# photoTakenTime of the sidecars and operations made by the fixtures
+TIMESTAMP = 1609459200
+
 
 @pytest.fixture
 def temp_dir() -> Generator[str, None, None]:
@@ -107,3 +116,58 @@ def create_jpeg_file(temp_media_dir: str, sample_jpeg_bytes: bytes):
             f.write(sample_jpeg_bytes)
         return filepath
     return _create_jpeg
+
+
+@pytest.fixture
+def noisy_image() -> Image.Image:
+    """Return a 32x32 image of random pixels, which JPEG cannot compress away."""
+    rng = random.Random(0)
+    im = Image.new("RGB", (32, 32))
+    im.putdata([(rng.randrange(256), rng.randrange(256), rng.randrange(256)) for _ in range(32 * 32)])
+    return im
+
+
+@pytest.fixture
+def jpeg_path(temp_media_dir: str, noisy_image: Image.Image) -> str:
+    """Save the noisy image as photo.jpg in the temp media directory."""
+    path = os.path.join(temp_media_dir, "photo.jpg")
+    noisy_image.save(path, "JPEG")
+    return path
+
+
+@pytest.fixture
+def write_sidecar(temp_media_dir: str):
+    """Factory fixture to write a Google Takeout JSON sidecar in the temp media directory."""
+    def _write(json_name: str, title: str, timestamp: int = TIMESTAMP, geo: bool = False) -> str:
+        data: dict = {"title": title, "photoTakenTime": {"timestamp": str(timestamp)}}
+        if geo:
+            data["geoData"] = {"latitude": 40.7128, "longitude": -74.006, "altitude": 10.0}
+        filepath = os.path.join(temp_media_dir, json_name)
+        with open(filepath, "w", encoding="utf8") as f:
+            json.dump(data, f)
+        return filepath
+    return _write
+
+
+@pytest.fixture
+def settings(temp_dir: str) -> ExecutionSettings:
+    """Execution settings writing to new MatchedMedia and EditedRaw folders in temp_dir."""
+    fixed, raw = os.path.join(temp_dir, "MatchedMedia"), os.path.join(temp_dir, "EditedRaw")
+    os.makedirs(fixed)
+    os.makedirs(raw)
+    return ExecutionSettings(fixed, raw)
+
+
+@pytest.fixture
+def make_operation(temp_media_dir: str):
+    """Factory fixture to plan an operation on media in the temp media directory.
+
+    The sidecar is written empty, since execution only deletes it; the
+    operation carries a date and a location.
+    """
+    def _make(title: str, raw_original: Optional[str] = None) -> PlannedOperation:
+        with open(os.path.join(temp_media_dir, title + ".json"), "w") as f:
+            f.write("{}")
+        return PlannedOperation(title + ".json", temp_media_dir, title, TIMESTAMP, 40.7128, -74.006, 10.0,
+                                raw_original=raw_original)
+    return _make
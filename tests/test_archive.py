@@ -0,0 +1,175 @@
+"""Tests for reading Takeout exports from archives.
+
+Tests include:
+- Indexing zip and tgz parts into one tree
+- Sidecars matched with media in a different archive part
+- Only matched media written, straight to MatchedMedia
+- Archives left untouched
+- Members escaping the export ignored, destinations kept in the output folders
+"""
+
+from __future__ import annotations
+
+import io
+import json
+import os
+import tarfile
+import zipfile
+
+import pytest
+
+from archive import TakeoutArchive, find_archives
+from cli import CLIWindow
+from executor import Job, ResultTally
+from main import _extract_jobs, mainProcess
+from planner import PlannedOperation
+
+ALBUM = "Takeout/Google Photos/Trip"
+
+
+def sidecar(title: str, timestamp: int = 1609459200) -> bytes:
+    return json.dumps({"title": title, "photoTakenTime": {"timestamp": str(timestamp)}}).encode()
+
+
+def write_zip(path: str, files: dict[str, bytes]) -> None:
+    with zipfile.ZipFile(path, "w") as zf:
+        for name, data in files.items():
+            zf.writestr(name, data)
+
+
+def write_tgz(path: str, files: dict[str, bytes]) -> None:
+    with tarfile.open(path, "w:gz") as tf:
+        for name, data in files.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tf.addfile(info, io.BytesIO(data))
+
+
+@pytest.fixture
+def split_export(temp_dir):
+    """An export in two parts; one sidecar sits in another part than its media."""
+    write_zip(os.path.join(temp_dir, "takeout-001.zip"), {
+        f"{ALBUM}/a.dng": b"raw a",
+        f"{ALBUM}/a.dng.json": sidecar("a.dng"),
+        f"{ALBUM}/b.dng.json": sidecar("b.dng"),
+        f"{ALBUM}/unmatched.dng": b"never written",
+    })
+    write_tgz(os.path.join(temp_dir, "takeout-002.tgz"), {
+        f"{ALBUM}/b.dng": b"raw b",
+        "Takeout/Google Photos/Other/c.dng": b"raw c",
+        "Takeout/Google Photos/Other/c.dng.json": sidecar("c.dng"),
+    })
+    return temp_dir
+
+
+class TestTakeoutArchive:
+    """Test indexing and reading archive parts."""
+
+    def test_find_archives(self, split_export):
+        parts = find_archives(split_export)
+        assert [os.path.basename(p) for p in parts] == ["takeout-001.zip", "takeout-002.tgz"]
+
+    def test_no_archives(self, temp_dir):
+        with pytest.raises(FileNotFoundError):
+            find_archives(temp_dir)
+
+    def test_tree_spans_parts(self, split_export):
+        tree = TakeoutArchive.open(split_export).tree()
+
+        assert tree.root == "Takeout/Google Photos"
+        assert tree.sidecar_count == 3
+        assert sorted(tree.folders[ALBUM]) == ["a.dng", "a.dng.json", "b.dng", "b.dng.json", "unmatched.dng"]
+        assert tree.relative_path(ALBUM) == "Trip"
+
+    def test_read_sidecars(self, split_export):
+        archive = TakeoutArchive.open(split_export)
+        records = archive.read_sidecars([f"{ALBUM}/a.dng.json", "Takeout/Google Photos/Other/c.dng.json"])
+
+        assert [record.title for record, error in records] == ["a.dng", "c.dng"]
+
+    def test_extract(self, split_export, temp_dir):
+        archive = TakeoutArchive.open(split_export)
+        targets = {
+            (ALBUM, "b.dng"): os.path.join(temp_dir, "b.out"),
+            (ALBUM, "missing.dng"): os.path.join(temp_dir, "missing.out"),
+        }
+
+        errors = archive.extract(targets)
+
+        assert list(errors) == [(ALBUM, "missing.dng")]
+        with open(os.path.join(temp_dir, "b.out"), "rb") as f:
+            assert f.read() == b"raw b"
+
+
+    @pytest.mark.parametrize("name", [
+        "Takeout/Google Photos/../../escape/x.jpg",
+        "../x.jpg",
+        "/etc/x.jpg",
+        "C:/x.jpg",
+        "Takeout\\..\\..\\x.jpg",
+    ])
+    def test_unsafe_members_ignored(self, temp_dir, name):
+        write_zip(os.path.join(temp_dir, "takeout.zip"), {name: b"x", name + ".json": sidecar("x.jpg")})
+
+        assert len(TakeoutArchive.open(temp_dir)) == 0
+
+
+class TestArchiveRun:
+    """Test mainProcess on archives."""
+
+    def test_matches_across_parts(self, split_export):
+        before = {name: os.path.getsize(os.path.join(split_export, name)) for name in os.listdir(split_export)}
+
+        result = mainProcess(split_export, CLIWindow(quiet=True), "editado", max_workers=1, archives=True)
+
+        assert (result["success_count"], result["error_count"]) == (3, 0)
+        matched = os.path.join(split_export, "MatchedMedia")
+        assert sorted(os.listdir(os.path.join(matched, "Trip"))) == ["a.dng", "b.dng"]
+        with open(os.path.join(matched, "Other", "c.dng"), "rb") as f:
+            assert f.read() == b"raw c"
+        assert os.path.getmtime(os.path.join(matched, "Trip", "b.dng")) == 1609459200
+        # Archives are only read
+        assert {name: os.path.getsize(os.path.join(split_export, name))
+                for name in before} == before
+
+    def test_single_archive_file(self, split_export):
+        part = os.path.join(split_export, "takeout-002.tgz")
+
+        result = mainProcess(part, CLIWindow(quiet=True), "editado", max_workers=2, archives=True)
+
+        # b.dng.json is in the other part
+        assert (result["success_count"], result["error_count"]) == (1, 0)
+        assert os.listdir(os.path.join(split_export, "MatchedMedia")) == ["Other"]
+
+    def test_dry_run_writes_nothing(self, split_export):
+        before = sorted(os.listdir(split_export))
+
+        result = mainProcess(split_export, CLIWindow(quiet=True), "editado", dry_run=True, archives=True)
+
+        assert result["success_count"] == 3
+        assert sorted(os.listdir(split_export)) == before
+
+    def test_escaping_member_not_written(self, temp_dir):
+        write_zip(os.path.join(temp_dir, "takeout.zip"), {
+            f"{ALBUM}/a.dng": b"raw a",
+            f"{ALBUM}/a.dng.json": sidecar("a.dng"),
+            "Takeout/Google Photos/../../../../escape/x.jpg": b"x",
+            "Takeout/Google Photos/../../../../escape/x.jpg.json": sidecar("x.jpg"),
+        })
+
+        result = mainProcess(temp_dir, CLIWindow(quiet=True), "editado", max_workers=1, archives=True)
+
+        assert (result["success_count"], result["error_count"]) == (1, 0)
+        assert sorted(os.listdir(temp_dir)) == ["EditedRaw", "MatchedMedia", "takeout.zip"]
+        assert os.listdir(os.path.join(temp_dir, "MatchedMedia")) == ["Trip"]
+
+    def test_destination_outside_output_refused(self, split_export, temp_dir):
+        archive = TakeoutArchive.open(split_export)
+        op = PlannedOperation("b.dng.json", ALBUM, "b.dng", 1609459200, output_subdir="../..")
+        tally = ResultTally()
+        fixed = os.path.join(temp_dir, "out", "MatchedMedia")
+
+        jobs = _extract_jobs(archive, [Job(op, id=0)], fixed, os.path.join(temp_dir, "out", "EditedRaw"), 1, tally)
+
+        assert jobs == [] and tally.error_count == 1
+        assert not os.path.exists(os.path.join(temp_dir, "b.dng"))
@@ -0,0 +1,151 @@
+"""Tests for the persistent sidecar catalog.
+
+Tests include:
+- Unchanged sidecars served from the catalog without reading the JSON
+- Changed sidecars read again
+- Cached matches reused only while the media is available
+- Rows of deleted sidecars pruned
+- Read-only catalogs for dry-run
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from unittest.mock import patch
+
+import pytest
+
+from catalog import CATALOG_NAME, SCHEMA_VERSION, SidecarCatalog
+from media_index import TreeIndex
+from planner import build_tree_plan
+
+
+def write_json(folder: str, name: str, data: dict) -> str:
+    path = os.path.join(folder, name)
+    with open(path, "w", encoding="utf8") as f:
+        json.dump(data, f)
+    return path
+
+
+def sidecar(title: str, timestamp: int = 1609459200) -> dict:
+    return {
+        "title": title,
+        "description": "ignored",
+        "photoTakenTime": {"timestamp": str(timestamp), "formatted": "ignored"},
+        "geoData": {"latitude": 40.7128, "longitude": -74.006, "altitude": 10.0, "latitudeSpan": 0.0},
+    }
+
+
+def plan(root: str, catalog):
+    return build_tree_plan(TreeIndex.scan(root), "editado", catalog=catalog)
+
+
+@pytest.fixture
+def takeout(temp_media_dir, create_test_file):
+    create_test_file("photo.jpg")
+    create_test_file("photo-editado.jpg")
+    create_test_file("other.jpg")
+    write_json(temp_media_dir, "photo.jpg.json", sidecar("photo.jpg"))
+    write_json(temp_media_dir, "other.jpg.json", sidecar("other.jpg", 1))
+    return temp_media_dir
+
+
+class TestCatalogPlanning:
+    """Test planning with a catalog."""
+
+    def test_second_run_reads_no_json(self, takeout):
+        """Unchanged sidecars should come from the catalog."""
+        with SidecarCatalog.open(takeout) as catalog:
+            first = plan(takeout, catalog)
+
+        with SidecarCatalog.open(takeout) as catalog, \
+                patch("planner._read_sidecar", side_effect=AssertionError("read JSON")):
+            second = plan(takeout, catalog)
+
+        assert second == first
+        raw = {op.json_name: op.raw_original for op in first.operations}
+        assert raw["photo.jpg.json"] == "photo.jpg"
+
+    def test_changed_sidecar_is_read_again(self, takeout):
+        with SidecarCatalog.open(takeout) as catalog:
+            plan(takeout, catalog)
+
+        write_json(takeout, "other.jpg.json", sidecar("other.jpg", 1234567890))
+
+        with SidecarCatalog.open(takeout) as catalog:
+            result = plan(takeout, catalog)
+
+        timestamps = {op.json_name: op.timestamp for op in result.operations}
+        assert timestamps["other.jpg.json"] == 1234567890
+
+    def test_stale_match_is_resolved_again(self, takeout):
+        """A cached match whose media is gone should not be used."""
+        with SidecarCatalog.open(takeout) as catalog:
+            plan(takeout, catalog)
+
+        os.remove(os.path.join(takeout, "photo-editado.jpg"))
+
+        with SidecarCatalog.open(takeout) as catalog:
+            result = plan(takeout, catalog)
+
+        matches = {op.json_name: (op.title, op.raw_original) for op in result.operations}
+        assert matches["photo.jpg.json"] == ("photo.jpg", None)
+
+    def test_deleted_sidecars_are_pruned(self, takeout):
+        with SidecarCatalog.open(takeout) as catalog:
+            plan(takeout, catalog)
+
+        os.remove(os.path.join(takeout, "other.jpg.json"))
+
+        with SidecarCatalog.open(takeout) as catalog:
+            plan(takeout, catalog)
+            rows = catalog._load()
+
+        assert set(rows) == {"photo.jpg.json"}
+
+    def test_unreadable_sidecar_not_cached(self, takeout, create_test_file):
+        create_test_file("broken.jpg.json", b"{not json")
+
+        with SidecarCatalog.open(takeout) as catalog:
+            plan(takeout, catalog)
+            rows = catalog._load()
+
+        assert "broken.jpg.json" not in rows
+
+
+class TestSchema:
+    """Test catalogs written by older versions."""
+
+    def test_old_schema_is_rebuilt(self, takeout):
+        import sqlite3
+
+        conn = sqlite3.connect(os.path.join(takeout, CATALOG_NAME))
+        conn.execute("CREATE TABLE sidecars (path TEXT PRIMARY KEY, timestamp TEXT)")
+        conn.execute("INSERT INTO sidecars VALUES ('photo.jpg.json', 'x')")
+        conn.commit()
+        conn.close()
+
+        with SidecarCatalog.open(takeout) as catalog:
+            assert catalog._load() == {}
+            plan(takeout, catalog)
+            assert catalog._conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+
+
+class TestReadOnly:
+    """Test read-only catalogs used by dry-run."""
+
+    def test_missing_catalog_not_created(self, temp_media_dir):
+        assert SidecarCatalog.open(temp_media_dir, readonly=True) is None
+        assert not os.path.exists(os.path.join(temp_media_dir, CATALOG_NAME))
+
+    def test_readonly_catalog_is_used_but_not_written(self, takeout):
+        with SidecarCatalog.open(takeout) as catalog:
+            plan(takeout, catalog)
+        write_json(takeout, "new.jpg.json", sidecar("other.jpg"))
+
+        with SidecarCatalog.open(takeout, readonly=True) as catalog:
+            plan(takeout, catalog)
+
+        with SidecarCatalog.open(takeout) as catalog:
+            assert "new.jpg.json" not in catalog._load()
@@ -81,6 +81,107 @@ class TestCreateParser:
         assert args.dry_run is True
 
 
+    def test_recursive_flag(self) -> None:
+        """Parser should accept recursive flag."""
+        parser = create_parser()
+        assert parser.parse_args(["/path"]).recursive is False
+        assert parser.parse_args(["/path", "-r"]).recursive is True
+        assert parser.parse_args(["/path", "--recursive"]).recursive is True
+
+    def test_reencode_jpeg_flag(self) -> None:
+        """Parser should accept the reencode-jpeg flag."""
+        parser = create_parser()
+        assert parser.parse_args(["/path"]).reencode_jpeg is None  # unset: default, or the journal's on resume
+        assert parser.parse_args(["/path", "--reencode-jpeg"]).reencode_jpeg is True
+
+    def test_video_workers_flag(self) -> None:
+        """Parser should accept the video-workers option."""
+        parser = create_parser()
+        assert parser.parse_args(["/path"]).video_workers == 0
+        assert parser.parse_args(["/path", "--video-workers", "3"]).video_workers == 3
+
+    def test_no_catalog_flag(self) -> None:
+        """Parser should accept the no-catalog flag."""
+        parser = create_parser()
+        assert parser.parse_args(["/path"]).no_catalog is False
+        assert parser.parse_args(["/path", "--no-catalog"]).no_catalog is True
+
+    def test_resume_flag(self) -> None:
+        """Parser should accept the resume flag."""
+        parser = create_parser()
+        assert parser.parse_args(["/path"]).resume is False
+        assert parser.parse_args(["/path", "--resume"]).resume is True
+
+    def test_archives_flag(self) -> None:
+        """Parser should accept the archives flag."""
+        parser = create_parser()
+        assert parser.parse_args(["/path"]).archives is False
+        assert parser.parse_args(["/path.zip", "--archives"]).archives is True
+
+    def test_output_mode_option(self) -> None:
+        """Parser should accept move, copy and link output modes only."""
+        parser = create_parser()
+        assert parser.parse_args(["/path"]).output_mode is None
+        assert parser.parse_args(["/path", "--output-mode", "link"]).output_mode == "link"
+        with pytest.raises(SystemExit):
+            parser.parse_args(["/path", "--output-mode", "symlink"])
+
+    def test_output_option(self) -> None:
+        """Parser should accept an output folder."""
+        parser = create_parser()
+        assert parser.parse_args(["/path"]).output is None
+        assert parser.parse_args(["/path", "-o", "/out"]).output == "/out"
+
+    def test_layout_option(self) -> None:
+        """Parser should accept the output layouts only."""
+        parser = create_parser()
+        assert parser.parse_args(["/path"]).layout is None
+        assert parser.parse_args(["/path", "--layout", "month"]).layout == "month"
+        with pytest.raises(SystemExit):
+            parser.parse_args(["/path", "--layout", "day"])
+
+    def test_executor_option(self) -> None:
+        """Parser should accept thread and process executors only."""
+        parser = create_parser()
+        assert parser.parse_args(["/path"]).executor == "thread"
+        assert parser.parse_args(["/path", "--executor", "process"]).executor == "process"
+        with pytest.raises(SystemExit):
+            parser.parse_args(["/path", "--executor", "fiber"])
+
+    def test_stage_workers_option(self) -> None:
+        """Parser should parse per-stage worker counts."""
+        parser = create_parser()
+        assert parser.parse_args(["/path"]).stage_workers is None
+        args = parser.parse_args(["/path", "--stage-workers", "transform=8,finalize=2"])
+        assert args.stage_workers == {"transform": 8, "finalize": 2}
+
+    def test_metadata_mode_option(self) -> None:
+        """Parser should accept the embed and xmp metadata modes only."""
+        parser = create_parser()
+        assert parser.parse_args(["/path"]).metadata_mode is None
+        assert parser.parse_args(["/path", "--metadata-mode", "xmp"]).metadata_mode == "xmp"
+        with pytest.raises(SystemExit):
+            parser.parse_args(["/path", "--metadata-mode", "iptc"])
+
+    def test_max_decode_memory_option(self) -> None:
+        """Parser should parse memory sizes in powers of 1024."""
+        parser = create_parser()
+        assert parser.parse_args(["/path"]).max_decode_memory == 0
+        assert parser.parse_args(["/path", "--max-decode-memory", "4G"]).max_decode_memory == 4 * 2**30
+        assert parser.parse_args(["/path", "--max-decode-memory", "1.5GiB"]).max_decode_memory == 3 * 2**29
+        assert parser.parse_args(["/path", "--max-decode-memory", "512m"]).max_decode_memory == 512 * 2**20
+        for value in ["0", "G", "-1G", "4X"]:
+            with pytest.raises(SystemExit):
+                parser.parse_args(["/path", "--max-decode-memory", value])
+
+    def test_stage_workers_rejects_bad_values(self) -> None:
+        """Malformed stage worker counts should be rejected."""
+        parser = create_parser()
+        for value in ["transform", "transform=0", "=2", "transform=x"]:
+            with pytest.raises(SystemExit):
+                parser.parse_args(["/path", "--stage-workers", value])
+
+
 class TestCLIWindow:
     """Tests for CLIWindow mock window."""
 
@@ -0,0 +1,180 @@
+"""Tests for destination name reservation.
+
+Tests include:
+- Numbered names for taken destinations, per output folder
+- Names already in the output folders being kept
+- A TIFF and a JPEG both written as photo.jpg
+- Running again into a non-empty MatchedMedia
+- Media that keeps its format written under a reserved name too
+- Copy and link runs repeated without numbered duplicates
+"""
+
+from __future__ import annotations
+
+import os
+
+import pytest
+
+from PIL import Image
+
+from cli import CLIWindow
+from destinations import DestinationRegistry
+from executor import final_name
+from main import mainProcess
+from planner import PlannedOperation
+
+
+class TestDestinationRegistry:
+    """Test allocating names."""
+
+    def test_free_name_kept(self):
+        assert DestinationRegistry().allocate("out", "photo.jpg") == "photo.jpg"
+
+    def test_taken_names_numbered(self):
+        registry = DestinationRegistry()
+        names = [registry.allocate("out", "photo.jpg") for _ in range(4)]
+        assert names == ["photo.jpg", "photo(1).jpg", "photo(2).jpg", "photo(3).jpg"]
+
+    def test_folders_are_separate(self):
+        registry = DestinationRegistry()
+        assert registry.allocate("a", "photo.jpg") == registry.allocate("b", "photo.jpg") == "photo.jpg"
+
+    def test_case_insensitive(self):
+        registry = DestinationRegistry()
+        registry.allocate("out", "IMG.JPG")
+        assert registry.allocate("out", "img.jpg") == "img(1).jpg"
+
+    def test_no_extension(self):
+        registry = DestinationRegistry()
+        registry.allocate("out", "README")
+        assert registry.allocate("out", "README") == "README(1)"
+
+    def test_seeded_from_folders(self, temp_dir):
+        for name in ("photo.jpg", "photo(1).jpg"):
+            open(os.path.join(temp_dir, name), "w").close()
+
+        registry = DestinationRegistry.scan([temp_dir, os.path.join(temp_dir, "missing")])
+
+        assert registry.allocate(temp_dir, "photo.jpg") == "photo(2).jpg"
+
+    def test_reserve(self):
+        registry = DestinationRegistry()
+        op = PlannedOperation("a.jpg.json", "src", "a-editado.jpg", 0, raw_original="a.jpg", output_subdir="Trip")
+        first = registry.reserve(op, op.title, "MatchedMedia", "EditedRaw")
+        second = registry.reserve(op, op.title, "MatchedMedia", "EditedRaw")
+
+        assert (first.output_name, first.raw_output_name) == ("", "")
+        assert (second.output_name, second.raw_output_name) == ("a-editado(1).jpg", "a(1).jpg")
+
+    def test_reserve_unconverted_name(self):
+        registry = DestinationRegistry()
+        registry.allocate(os.path.join("MatchedMedia", "Trip"), "photo.heic")
+        op = PlannedOperation("photo.heic.json", "src", "photo.heic", 0, output_subdir="Trip")
+        op = registry.reserve(op, "photo.jpg", "MatchedMedia", "EditedRaw")
+
+        assert (op.output_name, op.unconverted_name) == ("photo.jpg", "photo(1).heic")
+        assert final_name(op, "photo.jpg") == "photo.jpg"
+        assert final_name(op, "photo.heic") == "photo(1).heic"
+
+
+class TestNoOverwrite:
+    """Test that runs never overwrite output files."""
+
+    def test_converted_tiff_and_jpeg(self, temp_media_dir, write_sidecar):
+        Image.new("RGB", (8, 8), "red").save(os.path.join(temp_media_dir, "photo.tif"), "TIFF")
+        Image.new("RGB", (8, 8), "blue").save(os.path.join(temp_media_dir, "photo.jpg"), "JPEG")
+        write_sidecar("photo.tif.json", "photo.tif")
+        write_sidecar("photo.jpg.json", "photo.jpg")
+
+        result = mainProcess(temp_media_dir, CLIWindow(quiet=True), "editado", max_workers=1)
+
+        assert (result["success_count"], result["error_count"]) == (2, 0)
+        matched = os.path.join(temp_media_dir, "MatchedMedia")
+        assert sorted(os.listdir(matched)) == ["photo(1).jpg", "photo.jpg"]
+        colors = {Image.open(os.path.join(matched, name)).convert("RGB").getpixel((4, 4))[0] > 128
+                  for name in os.listdir(matched)}
+        assert colors == {True, False}
+
+    def test_existing_output_kept(self, temp_media_dir, write_sidecar, create_test_file):
+        create_test_file("clip.mkv", b"new clip")
+        write_sidecar("clip.mkv.json", "clip.mkv")
+        matched = os.path.join(temp_media_dir, "MatchedMedia")
+        os.makedirs(matched)
+        with open(os.path.join(matched, "CLIP.mkv"), "wb") as f:
+            f.write(b"earlier run")
+
+        result = mainProcess(temp_media_dir, CLIWindow(quiet=True), "editado", max_workers=2)
+
+        assert result["success_count"] == 1
+        with open(os.path.join(matched, "CLIP.mkv"), "rb") as f:
+            assert f.read() == b"earlier run"
+        with open(os.path.join(matched, "clip(1).mkv"), "rb") as f:
+            assert f.read() == b"new clip"
+
+    def test_unconverted_media_not_overwriting(self, temp_media_dir, write_sidecar):
+        """JPEG data named .tif keeps its name, which must be reserved too."""
+        Image.new("RGB", (8, 8), "red").save(os.path.join(temp_media_dir, "scan.tif"), "JPEG")
+        write_sidecar("scan.tif.json", "scan.tif")
+        matched = os.path.join(temp_media_dir, "MatchedMedia")
+        os.makedirs(matched)
+        with open(os.path.join(matched, "scan.tif"), "wb") as f:
+            f.write(b"earlier run")
+
+        result = mainProcess(temp_media_dir, CLIWindow(quiet=True), "editado", max_workers=1)
+
+        assert result["success_count"] == 1
+        assert sorted(os.listdir(matched)) == ["scan(1).tif", "scan.tif"]
+        with open(os.path.join(matched, "scan.tif"), "rb") as f:
+            assert f.read() == b"earlier run"
+
+    def test_dry_run_shows_reserved_name(self, temp_media_dir, write_sidecar, create_test_file):
+        create_test_file("scan.tif", b"not opened")
+        write_sidecar("scan.tif.json", "scan.tif")
+        os.makedirs(os.path.join(temp_media_dir, "MatchedMedia"))
+        open(os.path.join(temp_media_dir, "MatchedMedia", "scan.jpg"), "w").close()
+
+        result = mainProcess(temp_media_dir, CLIWindow(quiet=True), "editado", dry_run=True)
+
+        [operation] = result["operations"]
+        assert os.path.basename(operation["destination"]) == "scan(1).jpg"
+
+    @pytest.mark.parametrize("output_mode", ["copy", "link"])
+    def test_repeated_run_keeps_outputs(self, temp_media_dir, write_sidecar, output_mode):
+        for name, color in (("a.jpg", "red"), ("b.jpg", "green"), ("b-editado.jpg", "blue"), ("c.tif", "white")):
+            Image.new("RGB", (8, 8), color).save(os.path.join(temp_media_dir, name))
+        for title in ("a.jpg", "b.jpg", "c.tif"):
+            write_sidecar(title + ".json", title)
+        matched = os.path.join(temp_media_dir, "MatchedMedia")
+
+        first = mainProcess(temp_media_dir, CLIWindow(quiet=True), "editado", max_workers=2, output_mode=output_mode)
+        second = mainProcess(temp_media_dir, CLIWindow(quiet=True), "editado", max_workers=2, output_mode=output_mode)
+
+        assert (first["success_count"], first["placed_count"]) == (3, 0)
+        assert (second["success_count"], second["placed_count"], second["skipped_count"]) == (3, 3, 0)
+        assert sorted(os.listdir(matched)) == ["a.jpg", "b-editado.jpg", "c.jpg"]
+        assert os.listdir(os.path.join(temp_media_dir, "EditedRaw")) == ["b.jpg"]
+
+    def test_coarse_file_times_recognised(self, temp_media_dir, write_sidecar):
+        """Outputs on filesystems with 2 s mtimes (FAT) still count as placed."""
+        Image.new("RGB", (8, 8), "red").save(os.path.join(temp_media_dir, "a.jpg"))
+        write_sidecar("a.jpg.json", "a.jpg")
+        output = os.path.join(temp_media_dir, "MatchedMedia", "a.jpg")
+
+        mainProcess(temp_media_dir, CLIWindow(quiet=True), "editado", max_workers=1, output_mode="copy")
+        os.utime(output, (1609459201, 1609459201))
+        result = mainProcess(temp_media_dir, CLIWindow(quiet=True), "editado", max_workers=1, output_mode="copy")
+
+        assert result["placed_count"] == 1
+        assert os.listdir(os.path.dirname(output)) == ["a.jpg"]
+
+    def test_other_file_under_same_name_kept(self, temp_media_dir, write_sidecar):
+        Image.new("RGB", (8, 8), "red").save(os.path.join(temp_media_dir, "a.jpg"))
+        write_sidecar("a.jpg.json", "a.jpg")
+        matched = os.path.join(temp_media_dir, "MatchedMedia")
+        os.makedirs(matched)
+        Image.new("RGB", (8, 8), "blue").save(os.path.join(matched, "a.jpg"))
+
+        result = mainProcess(temp_media_dir, CLIWindow(quiet=True), "editado", max_workers=1, output_mode="copy")
+
+        assert (result["success_count"], result["placed_count"]) == (1, 0)
+        assert sorted(os.listdir(matched)) == ["a(1).jpg", "a.jpg"]
@@ -4,6 +4,7 @@ Tests include:
 - set_EXIF() with mocked piexif operations
 - to_deg() coordinate conversion
 - change_to_rational() number conversion
+- build_EXIF() and the single-read/single-write set_EXIF()
 
 Uses mocking to avoid actual file operations.
 """
@@ -16,7 +17,7 @@ from unittest.mock import patch, MagicMock, call
 
 import pytest
 
-from auxFunctions import set_EXIF, to_deg, change_to_rational
+from auxFunctions import atomic_write, build_EXIF, set_EXIF, to_deg, change_to_rational
 
 
 class TestToDeg:
@@ -151,23 +152,23 @@ class TestSetEXIF:
 
             yield mock
 
-    def test_sets_datetime_fields(self, mock_piexif, temp_media_dir, create_test_file):
+    def test_sets_datetime_fields(self, mock_piexif, temp_media_dir, create_jpeg_file, sample_jpeg_bytes):
         """Should set DateTime, DateTimeOriginal, and DateTimeDigitized."""
-        filepath = create_test_file("photo.jpg")
+        filepath = create_jpeg_file("photo.jpg")
         timestamp = 1609459200  # 2021-01-01 00:00:00 UTC
 
         set_EXIF(filepath, 40.7128, -74.006, 10.0, timestamp)
 
-        # Verify load was called with the filepath
-        mock_piexif.load.assert_called_once_with(filepath)
+        # Verify load was called with the file contents read once
+        mock_piexif.load.assert_called_once_with(sample_jpeg_bytes)
 
         # Verify dump and insert were called
         mock_piexif.dump.assert_called_once()
         mock_piexif.insert.assert_called_once()
 
-    def test_sets_gps_coordinates(self, mock_piexif, temp_media_dir, create_test_file):
+    def test_sets_gps_coordinates(self, mock_piexif, temp_media_dir, create_jpeg_file):
         """Should set GPS coordinates in EXIF."""
-        filepath = create_test_file("photo.jpg")
+        filepath = create_jpeg_file("photo.jpg")
         timestamp = 1609459200
 
         set_EXIF(filepath, 40.7128, -74.006, 100.5, timestamp)
@@ -178,9 +179,9 @@ class TestSetEXIF:
         exif_dict = mock_piexif.load.return_value
         assert 'GPS' in exif_dict
 
-    def test_handles_zero_coordinates(self, mock_piexif, temp_media_dir, create_test_file):
+    def test_handles_zero_coordinates(self, mock_piexif, temp_media_dir, create_jpeg_file):
         """Should handle zero coordinates."""
-        filepath = create_test_file("photo.jpg")
+        filepath = create_jpeg_file("photo.jpg")
         timestamp = 1609459200
 
         # Should not raise an error
@@ -188,9 +189,9 @@ class TestSetEXIF:
 
         mock_piexif.dump.assert_called_once()
 
-    def test_handles_negative_coordinates(self, mock_piexif, temp_media_dir, create_test_file):
+    def test_handles_negative_coordinates(self, mock_piexif, temp_media_dir, create_jpeg_file):
         """Should handle negative coordinates (South/West)."""
-        filepath = create_test_file("photo.jpg")
+        filepath = create_jpeg_file("photo.jpg")
         timestamp = 1609459200
 
         # Sydney, Australia (South/East)
@@ -198,9 +199,9 @@ class TestSetEXIF:
 
         mock_piexif.dump.assert_called_once()
 
-    def test_handles_coordinate_exception(self, mock_piexif, temp_media_dir, create_test_file, capsys):
+    def test_handles_coordinate_exception(self, mock_piexif, temp_media_dir, create_jpeg_file, capsys):
         """Should handle exceptions when setting coordinates gracefully."""
-        filepath = create_test_file("photo.jpg")
+        filepath = create_jpeg_file("photo.jpg")
         timestamp = 1609459200
 
         # Make to_deg raise an exception by mocking it
@@ -211,9 +212,9 @@ class TestSetEXIF:
         # Verify it still completed (dump was called for datetime at least)
         mock_piexif.dump.assert_called_once()
 
-    def test_timestamp_conversion(self, mock_piexif, temp_media_dir, create_test_file):
+    def test_timestamp_conversion(self, mock_piexif, temp_media_dir, create_jpeg_file):
         """Should convert timestamp to correct datetime format."""
-        filepath = create_test_file("photo.jpg")
+        filepath = create_jpeg_file("photo.jpg")
         # Specific timestamp: 2023-06-15 12:30:45
         timestamp = 1686832245
 
@@ -225,6 +226,78 @@ class TestSetEXIF:
         mock_piexif.dump.assert_called_once()
 
 
+class TestSetEXIFSingleIO:
+    """Test that set_EXIF() reads and writes each file exactly once."""
+
+    @pytest.fixture
+    def pil_jpeg(self, temp_media_dir):
+        from PIL import Image
+
+        filepath = os.path.join(temp_media_dir, "photo.jpg")
+        Image.new("RGB", (8, 8), (10, 200, 30)).save(filepath, "JPEG")
+        return filepath
+
+    def test_one_read_one_write(self, pil_jpeg):
+        """The file should be opened once for reading and once (temp file) for writing."""
+        import builtins
+
+        real_open = builtins.open
+        modes = []
+
+        def counting_open(file, mode="r", *args, **kwargs):
+            modes.append(mode)
+            return real_open(file, mode, *args, **kwargs)
+
+        with patch("builtins.open", side_effect=counting_open):
+            set_EXIF(pil_jpeg, 40.7128, -74.006, 10.0, 1609459200)
+
+        assert modes == ["rb"]
+        assert len(os.listdir(os.path.dirname(pil_jpeg))) == 1
+
+    def test_written_exif_is_readable(self, pil_jpeg):
+        """The rewritten file should carry the new EXIF."""
+        import piexif
+
+        set_EXIF(pil_jpeg, -33.8688, 151.2093, 58.0, 1609459200)
+
+        exif_dict = piexif.load(pil_jpeg)
+        assert piexif.ExifIFD.DateTimeOriginal in exif_dict["Exif"]
+        assert exif_dict["GPS"][piexif.GPSIFD.GPSLatitudeRef] == b"S"
+
+    def test_rejects_non_jpeg(self, create_test_file):
+        """Data that is neither JPEG nor WebP should raise before any write."""
+        filepath = create_test_file("photo.jpg", b"not an image")
+
+        with pytest.raises(ValueError):
+            set_EXIF(filepath, 0.0, 0.0, 0.0, 1609459200)
+
+        with open(filepath, "rb") as f:
+            assert f.read() == b"not an image"
+
+    def test_build_exif_keeps_existing_tags(self):
+        """Tags from existing EXIF should survive."""
+        import piexif
+
+        existing = piexif.dump({"0th": {piexif.ImageIFD.Make: b"Camera"}})
+
+        exif_dict = piexif.load(build_EXIF(None, None, None, 1609459200, existing))
+
+        assert exif_dict["0th"][piexif.ImageIFD.Make] == b"Camera"
+        assert piexif.ExifIFD.DateTimeOriginal in exif_dict["Exif"]
+        assert exif_dict["GPS"] == {}
+
+    def test_atomic_write_keeps_mode(self, create_test_file):
+        """atomic_write() should replace the content and keep permissions."""
+        filepath = create_test_file("photo.jpg")
+        os.chmod(filepath, 0o644)
+
+        atomic_write(filepath, b"new content")
+
+        with open(filepath, "rb") as f:
+            assert f.read() == b"new content"
+        assert os.stat(filepath).st_mode & 0o777 == 0o644
+
+
 class TestSetEXIFIntegration:
     """Integration tests for set_EXIF with actual piexif library (skipped if not available)."""
 
@@ -0,0 +1,216 @@
+"""Tests for the non-destructive output modes.
+
+Tests include:
+- copy_range() and copy_file() copying exact bytes
+- place_file() moving, copying and hardlinking
+- copy_EXIF() writing the same JPEG as set_EXIF() without touching the source
+- execute_operation() leaving the source tree untouched in copy/link modes
+- Streamed, verified moves to another filesystem and a separate output folder
+"""
+
+from __future__ import annotations
+
+import errno
+import os
+import shutil
+from dataclasses import replace
+from unittest.mock import patch
+
+import piexif
+import pytest
+from PIL import Image
+
+from auxFunctions import copy_EXIF, set_EXIF
+from cli import CLIWindow
+from executor import execute_operation
+from fileops import copy_file, copy_range, move_file, place_file, verify_copy
+from main import mainProcess
+
+
+def read(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+class TestCopy:
+    """Test the copy helpers."""
+
+    def test_copy_range(self, temp_dir):
+        src, dst = os.path.join(temp_dir, "src"), os.path.join(temp_dir, "dst")
+        with open(src, "wb") as f:
+            f.write(bytes(range(256)) * 100)
+
+        with open(src, "rb") as source, open(dst, "wb") as target:
+            target.write(b"head")
+            target.flush()
+            copy_range(source.fileno(), target.fileno(), 1000, 5000)
+
+        assert read(dst) == b"head" + (bytes(range(256)) * 100)[1000:6000]
+
+    def test_copy_range_past_end(self, temp_dir):
+        src = os.path.join(temp_dir, "src")
+        with open(src, "wb") as f:
+            f.write(b"short")
+
+        with open(src, "rb") as source, open(os.path.join(temp_dir, "dst"), "wb") as target:
+            with pytest.raises(OSError):
+                copy_range(source.fileno(), target.fileno(), 0, 100)
+
+    def test_copy_file(self, temp_dir, jpeg_path):
+        dst = os.path.join(temp_dir, "copy.jpg")
+        copy_file(jpeg_path, dst)
+        assert read(dst) == read(jpeg_path)
+        assert os.stat(dst).st_ino != os.stat(jpeg_path).st_ino
+
+
+class TestPlaceFile:
+    """Test placing files per output mode."""
+
+    def test_move(self, temp_dir, jpeg_path):
+        place_file(jpeg_path, os.path.join(temp_dir, "out.jpg"), "move")
+        assert not os.path.exists(jpeg_path)
+
+    def test_copy(self, temp_dir, jpeg_path):
+        dst = os.path.join(temp_dir, "out.jpg")
+        place_file(jpeg_path, dst, "copy")
+        assert read(dst) == read(jpeg_path)
+        assert not os.path.samefile(dst, jpeg_path)
+
+    def test_link_replaces_existing(self, temp_dir, jpeg_path):
+        dst = os.path.join(temp_dir, "out.jpg")
+        with open(dst, "wb") as f:
+            f.write(b"old")
+
+        place_file(jpeg_path, dst, "link")
+
+        assert os.path.samefile(dst, jpeg_path)
+
+
+class TestCopyExif:
+    """Test writing EXIF into a new copy."""
+
+    @pytest.mark.parametrize("exif", [None, piexif.dump({"0th": {piexif.ImageIFD.Make: b"Camera"}})])
+    def test_same_bytes_as_in_place(self, temp_dir, jpeg_path, exif):
+        if exif is not None:
+            Image.open(jpeg_path).save(jpeg_path, "JPEG", exif=exif)
+        in_place = os.path.join(temp_dir, "in_place.jpg")
+        shutil.copyfile(jpeg_path, in_place)
+        original = read(jpeg_path)
+
+        set_EXIF(in_place, 40.7128, -74.006, 10.0, 1609459200)
+        size = copy_EXIF(jpeg_path, os.path.join(temp_dir, "copy.jpg"), 40.7128, -74.006, 10.0, 1609459200)
+
+        assert read(os.path.join(temp_dir, "copy.jpg")) == read(in_place)
+        assert size == os.path.getsize(in_place)
+        assert read(jpeg_path) == original
+
+    def test_rejects_other_formats(self, temp_dir, create_test_file):
+        path = create_test_file("fake.jpg", b"not an image")
+        with pytest.raises(ValueError):
+            copy_EXIF(path, os.path.join(temp_dir, "out.jpg"), None, None, None, 1609459200)
+
+
+class TestNonDestructiveExecution:
+    """Test execute_operation() in copy and link modes."""
+
+    @pytest.fixture
+    def settings(self, settings):
+        return replace(settings, output_mode="copy")
+
+    @pytest.mark.parametrize("mode", ["copy", "link"])
+    def test_source_tree_untouched(self, temp_media_dir, jpeg_path, create_test_file, settings, make_operation, mode):
+        create_test_file("photo-editado.jpg", read(jpeg_path))
+        before = {name: read(os.path.join(temp_media_dir, name)) for name in os.listdir(temp_media_dir)}
+        op = make_operation("photo-editado.jpg", raw_original="photo.jpg")
+        before[op.json_name] = read(op.json_path)
+
+        result = execute_operation(op, replace(settings, output_mode=mode))
+
+        assert result.success
+        assert {name: read(os.path.join(temp_media_dir, name)) for name in os.listdir(temp_media_dir)} == before
+        matched = os.path.join(settings.fixed_media_path, "photo-editado.jpg")
+        assert read(matched) != before["photo-editado.jpg"]
+        assert os.path.getmtime(matched) == 1609459200
+        assert read(os.path.join(settings.non_edited_media_path, "photo.jpg")) == before["photo.jpg"]
+
+    def test_link_mode_hardlinks_unchanged_files(self, create_test_file, settings, make_operation):
+        source = create_test_file("photo.dng", b"raw data")
+
+        execute_operation(make_operation("photo.dng"), replace(settings, output_mode="link"))
+
+        assert os.path.samefile(source, os.path.join(settings.fixed_media_path, "photo.dng"))
+
+
+class TestCrossDevice:
+    """Test moves to another filesystem."""
+
+    def test_streamed_move(self, temp_dir, jpeg_path):
+        data = read(jpeg_path)
+        dst = os.path.join(temp_dir, "out.jpg")
+
+        place_file(jpeg_path, dst, "move", cross_device=True)
+
+        assert read(dst) == data
+        assert not os.path.exists(jpeg_path)
+
+    def test_rename_across_devices_falls_back(self, temp_dir, jpeg_path):
+        data = read(jpeg_path)
+        dst = os.path.join(temp_dir, "out.jpg")
+
+        with patch("fileops.os.replace", side_effect=OSError(errno.EXDEV, "Invalid cross-device link")):
+            place_file(jpeg_path, dst, "move")
+
+        assert read(dst) == data
+        assert not os.path.exists(jpeg_path)
+
+    def test_incomplete_copy_keeps_source(self, temp_dir, jpeg_path):
+        dst = os.path.join(temp_dir, "out.jpg")
+
+        with patch("fileops.copy_range"), pytest.raises(OSError):
+            move_file(jpeg_path, dst)
+
+        assert os.path.exists(jpeg_path)
+        assert not os.path.exists(dst)
+
+    def test_jpeg_written_once_to_output(self, jpeg_path, settings, make_operation):
+        op = make_operation("photo.jpg")
+        settings = replace(settings, cross_device=True)
+
+        with patch("executor.set_EXIF", side_effect=AssertionError("rewritten in place")):
+            result = execute_operation(op, settings)
+
+        assert result.success
+        assert not os.path.exists(jpeg_path)
+        assert not os.path.exists(op.json_path)
+        assert piexif.load(os.path.join(settings.fixed_media_path, "photo.jpg"))["GPS"]
+
+    def test_short_jpeg_copy_keeps_source(self, jpeg_path, settings, make_operation):
+        """A patched copy that lost data must not replace the source."""
+        original = read(jpeg_path)
+        op = make_operation("photo.jpg")
+        settings = replace(settings, cross_device=True)
+        fixed = settings.fixed_media_path
+
+        def short_copy(src, dst, *args):
+            shutil.copyfile(src, dst)
+            return len(original) + 100
+
+        with patch("executor.copy_EXIF", side_effect=short_copy), \
+                patch("executor.verify_copy", wraps=verify_copy) as verify:
+            result = execute_operation(op, settings)
+
+        verify.assert_called_once_with(jpeg_path, os.path.join(fixed, "photo.jpg"), len(original) + 100)
+        # The EXIF copy was discarded and the media moved as it was
+        assert result.success
+        assert read(os.path.join(fixed, "photo.jpg")) == original
+        assert not os.path.exists(jpeg_path)
+
+    def test_output_folder(self, temp_media_dir, jpeg_path, temp_dir, write_sidecar):
+        write_sidecar("photo.jpg.json", "photo.jpg")
+        output = os.path.join(temp_dir, "elsewhere", "out")
+
+        result = mainProcess(temp_media_dir, CLIWindow(quiet=True), "editado", max_workers=1, output_dir=output)
+
+        assert result["success_count"] == 1
+        assert os.listdir(os.path.join(output, "MatchedMedia")) == ["photo.jpg"]
+        assert not os.path.exists(os.path.join(temp_media_dir, "MatchedMedia"))
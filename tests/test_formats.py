@@ -0,0 +1,101 @@
+"""Tests for content-based format detection.
+
+Tests include:
+- sniff() recognising magic bytes of images, videos and RAW files
+- Mislabelled files routed to the right handler by execute_operation()
+"""
+
+from __future__ import annotations
+
+import os
+import struct
+from unittest.mock import patch
+
+import pytest
+from PIL import Image
+
+from executor import execute_operation
+from formats import sniff
+
+from .test_mp4_atoms import build_file
+
+TIMESTAMP = 1609459200
+
+
+def ftyp(brand: bytes) -> bytes:
+    return struct.pack(">I4s4s", 24, b"ftyp", brand) + bytes(12)
+
+
+@pytest.mark.parametrize("head, expected", [
+    (b"\xff\xd8\xff\xe0\x00\x10JFIF", "jpeg"),
+    (b"\x89PNG\r\n\x1a\n\x00\x00", "png"),
+    (b"GIF89a", "gif"),
+    (b"RIFF\x00\x00\x00\x00WEBPVP8 ", "webp"),
+    (b"RIFF\x00\x00\x00\x00AVI LIST", "avi"),
+    (b"\x1a\x45\xdf\xa3\x01\x00", "mkv"),
+    (b"II*\x00\x08\x00\x00\x00", "tiff"),
+    (b"MM\x00*\x00\x00\x00\x08", "tiff"),
+    (b"II*\x00\x10\x00\x00\x00CR\x02\x00", "raw"),
+    (b"FUJIFILMCCD-RAW 0201", "raw"),
+    (b"IIRO\x08\x00\x00\x00", "raw"),
+    (ftyp(b"heic"), "heic"),
+    (ftyp(b"mif1"), "heic"),
+    (ftyp(b"avif"), "avif"),
+    (ftyp(b"crx "), "raw"),
+    (ftyp(b"qt  "), "mov"),
+    (ftyp(b"isom"), "mp4"),
+    (struct.pack(">I4s", 8, b"wide") + b"\x00\x00\x00\x00mdat", "mov"),
+    (b"not a known format", None),
+    (b"", None),
+])
+def test_sniff(head, expected):
+    assert sniff(head) == expected
+
+
+class TestMislabelledFiles:
+    """Test execute_operation() on files whose extension lies."""
+
+    def test_heic_named_jpg(self, create_test_file, settings, make_operation):
+        create_test_file("photo.jpg", ftyp(b"heic") + b"HEIC image data")
+
+        with patch("executor.set_EXIF", side_effect=AssertionError("treated as JPEG")):
+            result = execute_operation(make_operation("photo.jpg"), settings)
+
+        # Without pillow-heif, HEIC files only get their file times
+        assert result.success
+        assert os.path.getmtime(os.path.join(settings.fixed_media_path, "photo.jpg")) == TIMESTAMP
+
+    def test_png_named_jpg_converted(self, temp_media_dir, settings, make_operation):
+        Image.new("RGB", (8, 8), "red").save(os.path.join(temp_media_dir, "photo.jpg"), "PNG")
+
+        result = execute_operation(make_operation("photo.jpg"), settings)
+
+        assert result.success
+        with Image.open(os.path.join(settings.fixed_media_path, "photo.jpg")) as im:
+            assert im.format == "JPEG"
+
+    def test_video_named_jpg(self, temp_media_dir, settings, make_operation):
+        build_file(os.path.join(temp_media_dir, "clip.jpg"), "moov-last")
+
+        with patch("executor.set_video_metadata", return_value=True) as set_video:
+            result = execute_operation(make_operation("clip.jpg"), settings)
+
+        assert result.success
+        assert set_video.call_args.kwargs["native"] is True
+
+    def test_mkv_named_mp4_skips_native_writer(self, create_test_file, settings, make_operation):
+        create_test_file("clip.mp4", b"\x1a\x45\xdf\xa3" + bytes(60))
+
+        with patch("video_metadata.set_mp4_metadata", side_effect=AssertionError("native writer")), \
+                patch("video_metadata.is_ffmpeg_available", return_value=False):
+            result = execute_operation(make_operation("clip.mp4"), settings)
+
+        assert result.success
+
+    def test_dng_stays_raw(self, create_test_file, settings, make_operation):
+        create_test_file("photo.dng", b"II*\x00\x08\x00\x00\x00" + bytes(32))
+
+        result = execute_operation(make_operation("photo.dng"), settings)
+
+        assert result.success
+        assert os.path.exists(os.path.join(settings.fixed_media_path, "photo.dng"))
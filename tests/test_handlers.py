@@ -0,0 +1,100 @@
+"""Tests for the format handler registry.
+
+Tests include:
+- Handlers found by extension, and by content over the extension
+- Registered handlers taking precedence for their extensions
+- Routing and cost classes of registered handlers
+"""
+
+from __future__ import annotations
+
+import os
+
+import pytest
+
+import handlers
+from executor import ExecutionSettings, Job, run_stage
+from handlers import FormatHandler, handler_for_name, registered_handlers, resolve_handler
+from main import _is_copy_bound
+from planner import PlannedOperation
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("photo.jpg", "JPEG"),
+    ("PHOTO.JPEG", "JPEG"),
+    ("scan.tiff", "TIFF"),
+    ("clip.MOV", "MP4"),
+    ("clip.mkv", "MKV/AVI"),
+    ("photo.dng", "RAW"),
+    ("photo.png", "PNG"),
+    ("notes.txt", "unknown"),
+    ("README", "unknown"),
+])
+def test_handler_for_name(name, expected):
+    assert handler_for_name(registered_handlers(), name).name == expected
+
+
+@pytest.mark.parametrize("name, content, expected", [
+    ("photo.jpg", "heic", "HEIC"),
+    ("photo.heic", "jpeg", "JPEG"),
+    ("clip.mov", "mov", "MP4"),
+    ("clip.jpg", "mp4", "MP4"),
+    ("clip.mp4", "mkv", "MKV/AVI"),
+    ("photo.dng", "tiff", "RAW"),
+    ("scan.jpg", "tiff", "TIFF"),
+    ("photo.jpg", "png", "JPEG"),
+    ("photo.txt", "png", "unknown"),
+    ("clip.mp4", None, "MP4"),
+])
+def test_resolve_handler(name, content, expected):
+    assert resolve_handler(registered_handlers(), name, content).name == expected
+
+
+def test_unknown_cost_class_rejected():
+    with pytest.raises(ValueError):
+        FormatHandler("JXL", "image", ("jxl",), cost="gpu")
+
+
+class TestRegisteredHandler:
+    """Test adding a handler to the registry."""
+
+    @pytest.fixture(autouse=True)
+    def registry(self, monkeypatch):
+        monkeypatch.setattr(handlers, "HANDLERS", list(handlers.HANDLERS))
+
+    @pytest.fixture
+    def settings(self, temp_dir):
+        handlers.register_handler(FormatHandler("WebM", "video", ("webm", "mkv"), ("mkv",), "video", cost="copy"))
+        return ExecutionSettings(os.path.join(temp_dir, "MatchedMedia"), os.path.join(temp_dir, "EditedRaw"))
+
+    def test_takes_precedence(self, settings):
+        assert settings.handler("clip.mkv").name == "WebM"
+        assert settings.handler("clip.avi").name == "MKV/AVI"
+
+    def test_earlier_settings_unchanged(self, temp_dir):
+        earlier = ExecutionSettings(temp_dir, temp_dir)
+        handlers.register_handler(FormatHandler("WebM", "video", ("webm",), stage="video"))
+
+        assert earlier.format_type("clip.webm") == "unknown"
+        assert ExecutionSettings(temp_dir, temp_dir).format_type("clip.webm") == "video"
+
+    @pytest.mark.parametrize("stage", ["prepare", "encode"])
+    def test_unknown_stage_rejected(self, stage):
+        with pytest.raises(ValueError):
+            handlers.register_handler(FormatHandler("WebM", "video", ("webm",), stage=stage))
+
+        assert handlers.HANDLERS[-1].name != "WebM"
+
+    def test_routed_by_stage(self, temp_media_dir, create_test_file, settings):
+        create_test_file("clip.webm", b"\x1a\x45\xdf\xa3" + bytes(28))
+        job = Job(PlannedOperation("clip.webm.json", temp_media_dir, "clip.webm", 1609459200))
+
+        assert run_stage("prepare", job, settings) == "video"
+
+    def test_copy_bound(self, temp_media_dir, settings):
+        def job(title):
+            return Job(PlannedOperation(title + ".json", temp_media_dir, title, 1609459200))
+
+        assert _is_copy_bound(settings, job("clip.webm"))
+        assert not _is_copy_bound(settings, job("clip.mp4"))
+        assert not _is_copy_bound(settings, job("photo.jpg"))
@@ -0,0 +1,280 @@
+"""Tests for the run journal and --resume.
+
+Tests include:
+- Rebuilding progress from a journal, including a torn last line
+- Resuming skips finished operations
+- Resuming continues after a completed conversion without redoing it
+- Resuming after a conversion or move that was not journaled
+- Refusing a new run while an interrupted one exists
+- Resuming with the interrupted run's output mode and other options
+- Copy runs keeping the journal and catalog out of the Takeout folder
+- Running without a journal when it cannot be written
+- Removing the journal after a complete run
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from unittest.mock import patch
+
+import pytest
+from PIL import Image
+
+from catalog import CATALOG_NAME
+from cli import CLIWindow
+from executor import STAGES, Job
+from journal import JOURNAL_NAME, JournalError, JournalState, close_journal, journal_writer
+from main import mainProcess
+from planner import PlannedOperation
+
+
+def run(path: str, **kwargs):
+    return mainProcess(path, CLIWindow(quiet=True), "editado", max_workers=1, **kwargs)
+
+
+def crash_on_finalize(after: int):
+    """A finalize stage that lets ``after`` jobs through, then interrupts the run."""
+    finalize = STAGES["finalize"]
+    calls = []
+
+    def _finalize(job, settings):
+        if len(calls) == after:
+            raise KeyboardInterrupt
+        calls.append(job.title)
+        return finalize(job, settings)
+    return patch.dict(STAGES, finalize=_finalize)
+
+
+def crash_after(stage: str):
+    """A stage that does its work, then interrupts the run before it is journaled."""
+    work = STAGES[stage]
+
+    def _stage(job, settings):
+        work(job, settings)
+        raise KeyboardInterrupt
+    return patch.dict(STAGES, {stage: _stage})
+
+
+class TestJournalState:
+    """Test reading journals back."""
+
+    def write_journal(self, path: str) -> None:
+        ops = [PlannedOperation(f"{name}.json", "/takeout", name, 1) for name in ("a.dng", "b.tif", "c.dng")]
+        writer = journal_writer(path)
+        writer.start("/takeout", [Job(op, id=i) for i, op in enumerate(ops)])
+        b = Job(ops[1], id=1)
+        b.filepath, b.title = "/takeout/MatchedMedia/b.jpg", "b.jpg"
+        writer.record(b, "transform", "finalize")
+        a = Job(ops[0], id=0)
+        a.fail("boom")
+        writer.record(a, "finalize", None)
+        close_journal(path)
+
+    def test_pending_operations(self, temp_dir):
+        path = os.path.join(temp_dir, JOURNAL_NAME)
+        self.write_journal(path)
+        with open(path, "a", encoding="utf8") as f:
+            f.write(json.dumps({"event": "done", "id": 2}) + "\n")
+
+        state = JournalState.load(path)
+
+        assert [point.id for point in state.pending()] == [0, 1]
+        resumed = state.pending()[1]
+        assert (resumed.stage, resumed.filepath, resumed.title) == \
+            ("finalize", "/takeout/MatchedMedia/b.jpg", "b.jpg")
+
+    def test_torn_last_line_is_ignored(self, temp_dir):
+        path = os.path.join(temp_dir, JOURNAL_NAME)
+        self.write_journal(path)
+        with open(path, "a", encoding="utf8") as f:
+            f.write('{"event": "done", "id"')
+
+        assert len(JournalState.load(path).pending()) == 3
+
+    def test_not_a_journal(self, temp_dir):
+        path = os.path.join(temp_dir, JOURNAL_NAME)
+        with open(path, "w", encoding="utf8") as f:
+            f.write('{"event": "plan"}\n')
+
+        with pytest.raises(JournalError):
+            JournalState.load(path)
+
+
+class TestResume:
+    """Test interrupted and resumed runs."""
+
+    def test_resume_skips_finished_work(self, temp_media_dir, create_test_file, write_sidecar):
+        for i in range(3):
+            create_test_file(f"photo{i}.dng")
+            write_sidecar(f"photo{i}.dng.json", f"photo{i}.dng")
+
+        with crash_on_finalize(after=1), pytest.raises(KeyboardInterrupt):
+            run(temp_media_dir)
+        assert os.path.exists(os.path.join(temp_media_dir, JOURNAL_NAME))
+
+        result = run(temp_media_dir, resume=True)
+
+        assert (result["success_count"], result["error_count"]) == (2, 0)
+        matched = os.path.join(temp_media_dir, "MatchedMedia")
+        assert sorted(os.listdir(matched)) == [f"photo{i}.dng" for i in range(3)]
+        assert not os.path.exists(os.path.join(temp_media_dir, JOURNAL_NAME))
+
+    def test_resume_does_not_convert_again(self, temp_media_dir, write_sidecar):
+        Image.new("RGB", (8, 8), "red").save(os.path.join(temp_media_dir, "scan.tif"))
+        write_sidecar("scan.tif.json", "scan.tif")
+
+        with crash_on_finalize(after=0), pytest.raises(KeyboardInterrupt):
+            run(temp_media_dir)
+
+        with patch("executor._convert_to_jpeg", side_effect=AssertionError("converted again")):
+            result = run(temp_media_dir, resume=True)
+
+        assert result["success_count"] == 1
+        assert os.path.exists(os.path.join(temp_media_dir, "MatchedMedia", "scan.jpg"))
+        assert not os.path.exists(os.path.join(temp_media_dir, "scan.tif.json"))
+
+    def test_resume_after_unrecorded_conversion(self, temp_media_dir, write_sidecar):
+        Image.new("RGB", (8, 8), "red").save(os.path.join(temp_media_dir, "scan.tif"))
+        write_sidecar("scan.tif.json", "scan.tif")
+
+        with crash_after("transform"), pytest.raises(KeyboardInterrupt):
+            run(temp_media_dir)
+        assert not os.path.exists(os.path.join(temp_media_dir, "scan.tif"))
+
+        result = run(temp_media_dir, resume=True)
+
+        assert (result["success_count"], result["error_count"]) == (1, 0)
+        assert os.listdir(os.path.join(temp_media_dir, "MatchedMedia")) == ["scan.jpg"]
+        assert not os.path.exists(os.path.join(temp_media_dir, "scan.tif.json"))
+
+    def test_resume_after_unrecorded_video_move(self, temp_media_dir, create_test_file, write_sidecar):
+        """A video moved to another filesystem still gets its metadata."""
+        create_test_file("clip.mp4", b"\x00\x00\x00\x18ftypisom" + bytes(32))
+        write_sidecar("clip.mp4.json", "clip.mp4")
+        destination = os.path.join(temp_media_dir, "MatchedMedia", "clip.mp4")
+
+        with patch("main.same_device", return_value=False):
+            with patch("executor.set_video_metadata", side_effect=KeyboardInterrupt), \
+                    pytest.raises(KeyboardInterrupt):
+                run(temp_media_dir)
+            assert os.path.exists(destination)
+            with patch("executor.set_video_metadata", return_value=True) as set_metadata:
+                result = run(temp_media_dir, resume=True)
+
+        assert (result["success_count"], result["error_count"]) == (1, 0)
+        assert set_metadata.call_args.args[0] == destination
+
+    def test_resume_with_pipeline(self, temp_media_dir, create_test_file, write_sidecar):
+        for i in range(6):
+            create_test_file(f"photo{i}.dng")
+            write_sidecar(f"photo{i}.dng.json", f"photo{i}.dng")
+
+        with crash_on_finalize(after=3), pytest.raises(KeyboardInterrupt):
+            run(temp_media_dir)
+
+        result = mainProcess(temp_media_dir, CLIWindow(quiet=True), "editado", max_workers=2, resume=True)
+
+        assert result["success_count"] == 3
+        assert len(os.listdir(os.path.join(temp_media_dir, "MatchedMedia"))) == 6
+
+    def test_resume_writes_to_the_same_output(self, temp_media_dir, temp_dir, create_test_file, write_sidecar):
+        for i in range(2):
+            create_test_file(f"photo{i}.dng")
+            write_sidecar(f"photo{i}.dng.json", f"photo{i}.dng")
+        output = os.path.join(temp_dir, "out")
+
+        with crash_on_finalize(after=1), pytest.raises(KeyboardInterrupt):
+            run(temp_media_dir, output_dir=output)
+        run(temp_media_dir, resume=True)
+
+        assert sorted(os.listdir(os.path.join(output, "MatchedMedia"))) == ["photo0.dng", "photo1.dng"]
+
+    def test_resume_keeps_output_mode(self, temp_media_dir, create_test_file, write_sidecar):
+        """A resumed copy run must not fall back to moving and deleting sidecars."""
+        for name in ("a.jpg", "b.jpg", "c.jpg"):
+            Image.new("RGB", (8, 8), "red").save(os.path.join(temp_media_dir, name))
+            write_sidecar(f"{name}.json", name)
+
+        with crash_on_finalize(after=1), pytest.raises(KeyboardInterrupt):
+            run(temp_media_dir, output_mode="copy", layout="year")
+        result = run(temp_media_dir, resume=True)
+
+        assert result["success_count"] == 2
+        for name in ("a.jpg", "b.jpg", "c.jpg"):
+            assert os.path.exists(os.path.join(temp_media_dir, name))
+            assert os.path.exists(os.path.join(temp_media_dir, name + ".json"))
+        assert sorted(os.listdir(os.path.join(temp_media_dir, "MatchedMedia", "2021"))) == ["a.jpg", "b.jpg", "c.jpg"]
+
+    def test_resume_with_other_options_refused(self, temp_media_dir, create_test_file, write_sidecar):
+        create_test_file("photo.dng")
+        write_sidecar("photo.dng.json", "photo.dng")
+        with crash_on_finalize(after=0), pytest.raises(KeyboardInterrupt):
+            run(temp_media_dir, output_mode="copy")
+
+        result = run(temp_media_dir, resume=True, output_mode="move", metadata_mode="embed")
+
+        assert "output_mode ('copy')" in result["error"]
+        assert "metadata_mode" not in result["error"]
+        assert os.path.exists(os.path.join(temp_media_dir, "photo.dng.json"))
+        assert run(temp_media_dir, resume=True, output_mode="copy")["success_count"] == 1
+
+    def test_copy_run_leaves_takeout_folder_untouched(self, temp_media_dir, temp_dir, create_test_file,
+                                                      write_sidecar):
+        for i in range(2):
+            create_test_file(f"photo{i}.dng")
+            write_sidecar(f"photo{i}.dng.json", f"photo{i}.dng")
+        before = sorted(os.listdir(temp_media_dir))
+        output = os.path.join(temp_dir, "out")
+
+        with crash_on_finalize(after=1), pytest.raises(KeyboardInterrupt):
+            run(temp_media_dir, output_mode="copy", output_dir=output)
+        assert os.path.exists(os.path.join(output, JOURNAL_NAME))
+        result = run(temp_media_dir, resume=True, output_dir=output)
+
+        assert result["success_count"] == 1
+        assert sorted(os.listdir(temp_media_dir)) == before
+        assert sorted(os.listdir(output)) == [CATALOG_NAME, "EditedRaw", "MatchedMedia"]
+
+    def test_unwritable_journal_not_fatal(self, temp_media_dir, create_test_file, write_sidecar):
+        create_test_file("photo.dng")
+        write_sidecar("photo.dng.json", "photo.dng")
+
+        with patch("journal.JournalWriter.start", side_effect=OSError("Read-only file system")):
+            result = run(temp_media_dir)
+
+        assert result["success_count"] == 1
+        assert not os.path.exists(os.path.join(temp_media_dir, JOURNAL_NAME))
+
+    def test_new_run_refused_while_interrupted(self, temp_media_dir, create_test_file, write_sidecar):
+        create_test_file("photo.dng")
+        write_sidecar("photo.dng.json", "photo.dng")
+        with crash_on_finalize(after=0), pytest.raises(KeyboardInterrupt):
+            run(temp_media_dir)
+
+        result = run(temp_media_dir)
+
+        assert "--resume" in result["error"]
+        assert os.path.exists(os.path.join(temp_media_dir, "photo.dng"))
+
+    def test_resume_without_journal(self, temp_media_dir):
+        assert run(temp_media_dir, resume=True)["error"] == "No interrupted run to resume"
+
+    def test_resume_and_dry_run(self, temp_media_dir):
+        with pytest.raises(ValueError):
+            run(temp_media_dir, resume=True, dry_run=True)
+
+    def test_complete_run_removes_journal(self, temp_media_dir, create_test_file, write_sidecar):
+        create_test_file("photo.dng")
+        write_sidecar("photo.dng.json", "photo.dng")
+
+        assert run(temp_media_dir)["success_count"] == 1
+        assert not os.path.exists(os.path.join(temp_media_dir, JOURNAL_NAME))
+
+    def test_dry_run_writes_no_journal(self, temp_media_dir, create_test_file, write_sidecar):
+        create_test_file("photo.dng")
+        write_sidecar("photo.dng.json", "photo.dng")
+
+        run(temp_media_dir, dry_run=True)
+
+        assert not os.path.exists(os.path.join(temp_media_dir, JOURNAL_NAME))
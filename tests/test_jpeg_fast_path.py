@@ -0,0 +1,164 @@
+"""Tests for the lossless JPEG path in execute_operation().
+
+Tests include:
+- JPEG header sniffing, baseline and progressive
+- JPEGs only get their EXIF replaced, pixel data is untouched
+- Existing EXIF tags are preserved
+- TIFFs are still converted to JPEG
+- --reencode-jpeg forcing the conversion path
+- Decodes reserving their estimated memory from the decode budget
+"""
+
+from __future__ import annotations
+
+import os
+from dataclasses import replace
+from typing import Optional
+from unittest.mock import patch
+
+import piexif
+import pytest
+from PIL import Image
+
+import formats
+from cli import CLIWindow
+from executor import decode_memory, execute_operation, set_decode_budget
+from main import mainProcess
+from scheduler import MemoryBudget
+
+
+def _scan_data(data: bytes) -> bytes:
+    """Return everything from the SOS marker on (the entropy-coded pixels)."""
+    return data[data.index(b"\xff\xda"):]
+
+
+def _sniff(path: str) -> Optional[str]:
+    return formats.sniff(formats.read_header(path))
+
+
+class TestSniffJpeg:
+    """Test that formats.sniff() recognises JPEGs by their header."""
+
+    def test_detects_jpeg(self, temp_media_dir, noisy_image):
+        path = os.path.join(temp_media_dir, "photo.jpg")
+        noisy_image.save(path, "JPEG")
+        assert _sniff(path) == "jpeg"
+
+    def test_detects_progressive_jpeg(self, temp_media_dir, noisy_image):
+        path = os.path.join(temp_media_dir, "photo.jpg")
+        noisy_image.save(path, "JPEG", progressive=True)
+        assert _sniff(path) == "jpeg"
+
+    def test_rejects_tiff(self, temp_media_dir, noisy_image):
+        path = os.path.join(temp_media_dir, "photo.jpg")
+        noisy_image.save(path, "TIFF")
+        assert _sniff(path) == "tiff"
+
+
+class TestLosslessJpeg:
+    """Test that JPEGs keep their pixel data."""
+
+    def test_pixels_untouched(self, temp_media_dir, noisy_image, settings, make_operation):
+        """The entropy-coded data should be byte-identical after processing."""
+        path = os.path.join(temp_media_dir, "photo.jpg")
+        noisy_image.save(path, "JPEG", quality=90)
+        with open(path, "rb") as f:
+            before = _scan_data(f.read())
+
+        result = execute_operation(make_operation("photo.jpg"), settings)
+
+        assert result.success
+        with open(os.path.join(settings.fixed_media_path, "photo.jpg"), "rb") as f:
+            assert _scan_data(f.read()) == before
+
+    def test_no_decode(self, temp_media_dir, noisy_image, settings, make_operation):
+        """PIL should not be used for JPEGs."""
+        noisy_image.save(os.path.join(temp_media_dir, "photo.jpeg"), "JPEG")
+
+        with patch("executor.Image.open", side_effect=AssertionError("decoded")):
+            result = execute_operation(make_operation("photo.jpeg"), settings)
+
+        assert result.success
+        assert result.title == "photo.jpeg"
+
+    def test_writes_and_preserves_exif(self, temp_media_dir, noisy_image, settings, make_operation):
+        """New dates and GPS should be added while existing tags survive."""
+        path = os.path.join(temp_media_dir, "photo.jpg")
+        exif = piexif.dump({"0th": {piexif.ImageIFD.Make: b"Camera"}})
+        noisy_image.save(path, "JPEG", exif=exif)
+
+        execute_operation(make_operation("photo.jpg"), settings)
+
+        exif_dict = piexif.load(os.path.join(settings.fixed_media_path, "photo.jpg"))
+        assert exif_dict["0th"][piexif.ImageIFD.Make] == b"Camera"
+        assert piexif.ExifIFD.DateTimeOriginal in exif_dict["Exif"]
+        assert exif_dict["GPS"][piexif.GPSIFD.GPSLatitudeRef] == b"N"
+
+
+class TestConversion:
+    """Test the formats that still need a decode and re-encode."""
+
+    def test_tiff_converted_and_renamed(self, temp_media_dir, noisy_image, settings, make_operation):
+        """TIFFs should become .jpg files in MatchedMedia."""
+        noisy_image.save(os.path.join(temp_media_dir, "scan.tif"), "TIFF")
+
+        result = execute_operation(make_operation("scan.tif"), settings)
+
+        assert result.success
+        assert result.title == "scan.jpg"
+        assert _sniff(os.path.join(settings.fixed_media_path, "scan.jpg")) == "jpeg"
+
+    def test_reencode_flag_forces_conversion(self, temp_media_dir, noisy_image, settings, make_operation):
+        """reencode_jpeg should send JPEGs through PIL."""
+        noisy_image.save(os.path.join(temp_media_dir, "photo.jpg"), "JPEG")
+        reencode = replace(settings, reencode_jpeg=True)
+
+        with patch("executor.Image.open", wraps=Image.open) as mock_open:
+            result = execute_operation(make_operation("photo.jpg"), reencode)
+
+        assert result.success
+        mock_open.assert_called_once()
+
+
+class TestDecodeBudget:
+    """Test limiting the memory of concurrent decodes."""
+
+    @pytest.mark.parametrize("mode, expected", [("RGB", 8), ("L", 5), ("I;16", 6)])
+    def test_decode_memory_from_header(self, temp_media_dir, mode, expected):
+        path = os.path.join(temp_media_dir, "scan.tif")
+        Image.new(mode, (30, 20)).save(path, "TIFF")
+
+        with patch("PIL.ImageFile.ImageFile.load", side_effect=AssertionError("decoded")):
+            assert decode_memory(path) == 30 * 20 * expected
+
+    def test_decode_memory_of_unreadable_file(self, temp_media_dir, create_test_file):
+        create_test_file("scan.tif", b"not an image")
+        assert decode_memory(os.path.join(temp_media_dir, "scan.tif")) == 0
+
+    def test_conversion_reserves_estimate(self, temp_media_dir, noisy_image, settings, make_operation):
+        noisy_image.save(os.path.join(temp_media_dir, "scan.tif"), "TIFF")
+        budget = MemoryBudget(2**20)
+        set_decode_budget(budget)
+        try:
+            with patch.object(budget, "reserve", wraps=budget.reserve) as reserve:
+                result = execute_operation(make_operation("scan.tif"), settings)
+        finally:
+            set_decode_budget(None)
+
+        assert result.success
+        reserve.assert_called_once_with(noisy_image.width * noisy_image.height * 8)
+        assert budget.used == 0
+
+    @pytest.mark.parametrize("executor", ["thread", "process"])
+    def test_run_with_small_budget(self, temp_media_dir, noisy_image, write_sidecar, executor):
+        """Images larger than the budget should still be converted, one at a time."""
+        for i in range(6):
+            noisy_image.save(os.path.join(temp_media_dir, f"scan{i}.tif"), "TIFF")
+            write_sidecar(f"scan{i}.tif.json", f"scan{i}.tif")
+
+        result = mainProcess(temp_media_dir, CLIWindow(quiet=True), "editado", max_workers=2, executor=executor,
+                             max_decode_memory=1024)
+
+        assert (result["success_count"], result["error_count"]) == (6, 0)
+        matched = os.path.join(temp_media_dir, "MatchedMedia")
+        assert sorted(os.listdir(matched)) == [f"scan{i}.jpg" for i in range(6)]
@@ -0,0 +1,202 @@
+"""Tests for MediaIndex and its use by searchMedia().
+
+Tests include:
+- Building the index from a directory listing
+- Existence and claimed lookups
+- Keeping the index current as files move
+- searchMedia() matching without filesystem probes
+"""
+
+from __future__ import annotations
+
+import os
+from unittest.mock import patch
+
+import pytest
+
+from auxFunctions import searchMedia
+from media_index import MediaIndex, TreeIndex
+
+
+class TestBuildIndex:
+    """Test MediaIndex construction."""
+
+    def test_scan_lists_directory(self, temp_media_dir, create_test_file):
+        """scan() should record every entry of the directory."""
+        create_test_file("photo.jpg")
+        create_test_file("photo.jpg.json")
+
+        index = MediaIndex.scan(temp_media_dir)
+
+        assert index.exists("photo.jpg")
+        assert index.exists("photo.jpg.json")
+        assert len(index) == 2
+
+    def test_from_entries_reuses_scandir(self, temp_media_dir, create_test_file):
+        """from_entries() should accept an existing scandir result."""
+        create_test_file("video.mp4")
+        entries = list(os.scandir(temp_media_dir))
+
+        index = MediaIndex.from_entries(temp_media_dir, entries)
+
+        assert "video.mp4" in index
+        assert index.path_of("video.mp4") == os.path.join(temp_media_dir, "video.mp4")
+
+    def test_scan_missing_directory_raises(self, temp_dir):
+        """scan() should propagate errors for invalid directories."""
+        with pytest.raises(OSError):
+            MediaIndex.scan(os.path.join(temp_dir, "missing"))
+
+
+class TestLookups:
+    """Test existence and claimed lookups."""
+
+    def test_unknown_name_does_not_exist(self):
+        """Names not in the snapshot should not exist."""
+        index = MediaIndex("/takeout", ["photo.jpg"])
+        assert not index.exists("other.jpg")
+
+    def test_claim_marks_unavailable(self):
+        """Claimed names should still exist but not be available."""
+        index = MediaIndex("/takeout", ["photo.jpg"])
+        index.claim("photo.jpg")
+
+        assert index.exists("photo.jpg")
+        assert index.is_claimed("photo.jpg")
+        assert not index.is_available("photo.jpg")
+
+    def test_claimed_set_is_shared(self):
+        """The claimed set passed in should be used as-is."""
+        media_moved: set[str] = set()
+        index = MediaIndex("/takeout", ["photo.jpg"], claimed=media_moved)
+
+        media_moved.add("photo.jpg")
+
+        assert index.is_claimed("photo.jpg")
+
+    def test_unclaimed_variant(self):
+        """Variants continue past claimed names, including ones claimed meanwhile."""
+        index = MediaIndex("/takeout", ["IMG.jpg", "IMG(1).jpg", "IMG(2).jpg"])
+        assert index.unclaimed_variant("IMG.jpg") == "IMG.jpg"
+
+        for expected in ["IMG.jpg", "IMG(1).jpg", "IMG(2).jpg"]:
+            variant = index.unclaimed_variant("IMG.jpg")
+            assert variant == expected
+            index.claim(variant)
+
+        index.claimed.add("IMG(4).jpg")
+        assert index.unclaimed_variant("IMG.jpg") == "IMG(3).jpg"
+
+    def test_with_prefix(self):
+        """Prefix lookups should follow discard() and add()."""
+        index = MediaIndex("/takeout", ["IMG_1.jpg", "IMG_2.jpg", "IMG.jpg", "other.jpg"])
+        assert index.with_prefix("IMG_") == ["IMG_1.jpg", "IMG_2.jpg"]
+
+        index.discard("IMG_1.jpg")
+        index.add("IMG_0.jpg")
+
+        assert index.with_prefix("IMG_") == ["IMG_0.jpg", "IMG_2.jpg"]
+        assert index.with_prefix("zzz") == []
+
+    def test_discard_and_add(self):
+        """discard() and add() should keep the snapshot current."""
+        index = MediaIndex("/takeout", ["photo.jpg"])
+
+        index.discard("photo.jpg")
+        index.add("photo(1).jpg")
+
+        assert not index.exists("photo.jpg")
+        assert index.exists("photo(1).jpg")
+
+    def test_discard_missing_name_is_noop(self):
+        """Discarding an unknown name should not raise."""
+        index = MediaIndex("/takeout")
+        index.discard("missing.jpg")
+        assert len(index) == 0
+
+
+class TestSearchMediaWithIndex:
+    """Test that searchMedia() answers from the index instead of the filesystem."""
+
+    def test_no_exists_calls(self, temp_media_dir, non_edited_dir, create_test_file, empty_media_moved):
+        """Matching should not probe the filesystem when an index is given."""
+        create_test_file("photo.jpg")
+        index = MediaIndex.scan(temp_media_dir, claimed=empty_media_moved)
+
+        with patch("auxFunctions.os.path.exists", side_effect=AssertionError("stat call")):
+            result = searchMedia(temp_media_dir, "photo.jpg", empty_media_moved, non_edited_dir, "editado", index)
+
+        assert result == "photo.jpg"
+
+    def test_uses_snapshot_not_disk(self, temp_media_dir, non_edited_dir, empty_media_moved):
+        """Names present only in the index should be matched."""
+        index = MediaIndex(temp_media_dir, ["photo.jpg"], claimed=empty_media_moved)
+
+        result = searchMedia(temp_media_dir, "photo.jpg", empty_media_moved, non_edited_dir, "editado", index)
+
+        assert result == "photo.jpg"
+
+    def test_moving_original_updates_index(self, temp_media_dir, non_edited_dir, create_test_file, empty_media_moved):
+        """Originals moved to nonEdited should leave the index."""
+        create_test_file("photo.jpg")
+        create_test_file("photo-editado.jpg")
+        index = MediaIndex.scan(temp_media_dir, claimed=empty_media_moved)
+
+        result = searchMedia(temp_media_dir, "photo.jpg", empty_media_moved, non_edited_dir, "editado", index)
+
+        assert result == "photo-editado.jpg"
+        assert not index.exists("photo.jpg")
+        assert os.path.exists(os.path.join(non_edited_dir, "photo.jpg"))
+
+    def test_duplicate_json_checked_in_index(self, temp_media_dir, non_edited_dir, empty_media_moved):
+        """The photo.jpg(1).json check should use the index."""
+        index = MediaIndex(
+            temp_media_dir,
+            ["photo.jpg", "photo(1).jpg", "photo.jpg(1).json"],
+            claimed=empty_media_moved,
+        )
+
+        result = searchMedia(temp_media_dir, "photo.jpg", empty_media_moved, non_edited_dir, "editado", index)
+
+        assert result == "photo.jpg"
+
+
+class TestTreeIndex:
+    """Test scanning a whole Takeout tree."""
+
+    @pytest.fixture
+    def takeout_tree(self, temp_dir):
+        for folder in ["Photos from 2020", "Photos from 2021", os.path.join("Album", "Nested"), "MatchedMedia"]:
+            os.makedirs(os.path.join(temp_dir, folder))
+        for folder in ["Photos from 2020", "Photos from 2021", os.path.join("Album", "Nested"), "MatchedMedia"]:
+            for name in ["photo.jpg", "photo.jpg.json"]:
+                with open(os.path.join(temp_dir, folder, name), "wb") as f:
+                    f.write(b"x")
+        return temp_dir
+
+    def test_non_recursive_lists_root_only(self, takeout_tree):
+        """Without recursion only the root folder should be indexed."""
+        tree = TreeIndex.scan(takeout_tree)
+
+        assert list(tree.folders) == [takeout_tree]
+        assert tree.sidecar_count == 0
+
+    def test_recursive_lists_every_folder(self, takeout_tree):
+        """Recursion should index nested folders, in sorted order."""
+        tree = TreeIndex.scan(takeout_tree, recursive=True, max_workers=4, skip_dirs=["MatchedMedia"])
+
+        relative = [tree.relative_path(folder) for folder in tree.folders]
+        assert relative == sorted(relative)
+        assert os.path.join("Album", "Nested") in relative
+        assert "MatchedMedia" not in relative
+        assert tree.sidecar_count == 3
+
+    def test_relative_path_of_root_is_empty(self, takeout_tree):
+        """The root folder should map to an empty relative path."""
+        tree = TreeIndex.scan(takeout_tree)
+        assert tree.relative_path(takeout_tree) == ""
+
+    def test_missing_root_raises(self, temp_dir):
+        """An invalid root should raise."""
+        with pytest.raises(OSError):
+            TreeIndex.scan(os.path.join(temp_dir, "missing"), recursive=True)
@@ -0,0 +1,293 @@
+"""Tests for the native MP4/MOV metadata writer.
+
+Tests include:
+- Patching mvhd/tkhd/mdhd creation times (version 0 and 1)
+- Adding and replacing the udta/\xa9xyz location atom
+- moov at the end of the file (written in place)
+- moov followed by a free box (grows into it)
+- moov before mdat (full rewrite with stco/co64 fix-up)
+- Files the writer refuses
+- set_video_metadata() using the native writer before ffmpeg
+- Reading creation time and location back from the headers
+"""
+
+from __future__ import annotations
+
+import os
+import struct
+from unittest.mock import patch
+
+import pytest
+
+from mp4_atoms import MAC_EPOCH_OFFSET, AtomError, iso6709, read_mp4_metadata, set_mp4_metadata
+from video_metadata import set_video_metadata, video_metadata_matches
+
+TIMESTAMP = 1609459200  # 2021-01-01 00:00:00 UTC
+MEDIA = b"MEDIA-PAYLOAD-" * 8
+
+
+def box(box_type: bytes, payload: bytes) -> bytes:
+    return struct.pack(">I4s", 8 + len(payload), box_type) + payload
+
+
+def full_box(box_type: bytes, version: int, payload: bytes) -> bytes:
+    return box(box_type, bytes([version, 0, 0, 0]) + payload)
+
+
+def time_box(box_type: bytes, version: int) -> bytes:
+    if version == 1:
+        return full_box(box_type, 1, struct.pack(">QQ", 1, 1) + bytes(20))
+    return full_box(box_type, 0, struct.pack(">II", 1, 1) + bytes(20))
+
+
+def moov_box(chunk_offset: int, version: int = 0, co64: bool = False, udta: bytes = b"") -> bytes:
+    if co64:
+        table = full_box(b"co64", 0, struct.pack(">IQ", 1, chunk_offset))
+    else:
+        table = full_box(b"stco", 0, struct.pack(">II", 1, chunk_offset))
+    stbl = box(b"stbl", table)
+    mdia = box(b"mdia", time_box(b"mdhd", version) + box(b"minf", stbl))
+    trak = box(b"trak", time_box(b"tkhd", version) + mdia)
+    return box(b"moov", time_box(b"mvhd", version) + trak + udta)
+
+
+def build_file(path: str, layout: str, **moov_kwargs) -> None:
+    """Write a minimal MP4 whose single chunk points at MEDIA inside mdat."""
+    ftyp = box(b"ftyp", b"isom\x00\x00\x02\x00isommp41")
+    mdat = box(b"mdat", MEDIA)
+    if layout == "moov-last":
+        data = ftyp + mdat + moov_box(len(ftyp) + 8, **moov_kwargs)
+    elif layout == "faststart":
+        moov_len = len(moov_box(0, **moov_kwargs))
+        data = ftyp + moov_box(len(ftyp) + moov_len + 8, **moov_kwargs) + mdat
+    elif layout == "free":
+        moov_len = len(moov_box(0, **moov_kwargs))
+        free = box(b"free", bytes(120))
+        data = ftyp + moov_box(len(ftyp) + moov_len + len(free) + 8, **moov_kwargs) + free + mdat
+    else:
+        raise ValueError(layout)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def find_boxes(data: bytes, start: int = 0, end: int | None = None, path: tuple = ()) -> dict:
+    """Map box paths (e.g. ('moov', 'mvhd')) to their payload offsets."""
+    end = len(data) if end is None else end
+    found = {}
+    pos = start
+    while end - pos >= 8:
+        size, box_type = struct.unpack(">I4s", data[pos:pos + 8])
+        name = box_type.decode("latin-1")
+        found[path + (name,)] = (pos + 8, pos + size)
+        if box_type in (b"moov", b"trak", b"mdia", b"minf", b"stbl", b"udta"):
+            found.update(find_boxes(data, pos + 8, pos + size, path + (name,)))
+        pos += size
+    return found
+
+
+def read_times(data: bytes, boxes: dict, key: tuple) -> tuple[int, int]:
+    payload, _ = boxes[key]
+    if data[payload] == 1:
+        return struct.unpack(">QQ", data[payload + 4:payload + 20])
+    return struct.unpack(">II", data[payload + 4:payload + 12])
+
+
+def chunk_offset(data: bytes, boxes: dict) -> int:
+    stbl = ("moov", "trak", "mdia", "minf", "stbl")
+    if stbl + ("co64",) in boxes:
+        payload, _ = boxes[stbl + ("co64",)]
+        return struct.unpack(">Q", data[payload + 8:payload + 16])[0]
+    payload, _ = boxes[stbl + ("stco",)]
+    return struct.unpack(">I", data[payload + 8:payload + 12])[0]
+
+
+def location(data: bytes, boxes: dict) -> str:
+    payload, _ = boxes[("moov", "udta", "\xa9xyz")]
+    length = struct.unpack(">H", data[payload:payload + 2])[0]
+    return data[payload + 4:payload + 4 + length].decode()
+
+
+@pytest.fixture
+def video_path(temp_media_dir) -> str:
+    return os.path.join(temp_media_dir, "clip.mp4")
+
+
+def read(path: str) -> tuple[bytes, dict]:
+    with open(path, "rb") as f:
+        data = f.read()
+    return data, find_boxes(data)
+
+
+class TestCreationTimes:
+    """Test patching of mvhd/tkhd/mdhd times."""
+
+    @pytest.mark.parametrize("version", [0, 1])
+    def test_patches_all_headers(self, video_path, version):
+        """All three headers should carry the QuickTime-epoch timestamp."""
+        build_file(video_path, "moov-last", version=version)
+
+        set_mp4_metadata(video_path, TIMESTAMP)
+
+        data, boxes = read(video_path)
+        expected = (TIMESTAMP + MAC_EPOCH_OFFSET,) * 2
+        assert read_times(data, boxes, ("moov", "mvhd")) == expected
+        assert read_times(data, boxes, ("moov", "trak", "tkhd")) == expected
+        assert read_times(data, boxes, ("moov", "trak", "mdia", "mdhd")) == expected
+
+    def test_times_only_keeps_size(self, video_path):
+        """Without coordinates the file size should not change."""
+        build_file(video_path, "faststart")
+        size = os.path.getsize(video_path)
+
+        set_mp4_metadata(video_path, TIMESTAMP)
+
+        assert os.path.getsize(video_path) == size
+
+
+class TestLocation:
+    """Test adding the location atom in every layout."""
+
+    @pytest.mark.parametrize("layout", ["moov-last", "faststart", "free"])
+    def test_media_still_reachable(self, video_path, layout):
+        """After adding location, the chunk offset must still point at the media."""
+        build_file(video_path, layout)
+
+        set_mp4_metadata(video_path, TIMESTAMP, 40.7128, -74.006)
+
+        data, boxes = read(video_path)
+        assert location(data, boxes) == iso6709(40.7128, -74.006)
+        offset = chunk_offset(data, boxes)
+        assert data[offset:offset + len(MEDIA)] == MEDIA
+
+    def test_free_box_absorbs_growth(self, video_path):
+        """A following free box should shrink instead of rewriting the file."""
+        build_file(video_path, "free")
+        size = os.path.getsize(video_path)
+
+        with patch("mp4_atoms._rewrite", side_effect=AssertionError("rewrite")):
+            set_mp4_metadata(video_path, TIMESTAMP, 40.7128, -74.006)
+
+        assert os.path.getsize(video_path) == size
+
+    def test_moov_last_written_in_place(self, video_path):
+        """moov at the end should be extended without a full rewrite."""
+        build_file(video_path, "moov-last")
+
+        with patch("mp4_atoms._rewrite", side_effect=AssertionError("rewrite")):
+            set_mp4_metadata(video_path, TIMESTAMP, -33.8688, 151.2093)
+
+        data, boxes = read(video_path)
+        assert location(data, boxes) == iso6709(-33.8688, 151.2093)
+
+    def test_faststart_shifts_co64(self, video_path):
+        """64-bit chunk offsets should be shifted too."""
+        build_file(video_path, "faststart", co64=True)
+
+        set_mp4_metadata(video_path, TIMESTAMP, 40.7128, -74.006)
+
+        data, boxes = read(video_path)
+        offset = chunk_offset(data, boxes)
+        assert data[offset:offset + len(MEDIA)] == MEDIA
+
+    def test_replaces_existing_location(self, video_path):
+        """An existing location atom should be replaced, not duplicated."""
+        text = iso6709(1.0, 2.0).encode()
+        old = box(b"udta", box(b"\xa9xyz", struct.pack(">HH", len(text), 0x15C7) + text))
+        build_file(video_path, "faststart", udta=old)
+        size = os.path.getsize(video_path)
+
+        with patch("mp4_atoms._rewrite", side_effect=AssertionError("rewrite")):
+            set_mp4_metadata(video_path, TIMESTAMP, 3.0, 4.0)
+
+        data, boxes = read(video_path)
+        assert location(data, boxes) == iso6709(3.0, 4.0)
+        assert os.path.getsize(video_path) == size
+        assert data.count(b"\xa9xyz") == 1
+
+
+class TestRefusals:
+    """Test files the native writer must not touch."""
+
+    def test_no_moov(self, video_path):
+        with open(video_path, "wb") as f:
+            f.write(box(b"ftyp", b"isom") + box(b"mdat", MEDIA))
+
+        with pytest.raises(AtomError):
+            set_mp4_metadata(video_path, TIMESTAMP)
+
+    def test_not_mp4(self, video_path):
+        with open(video_path, "wb") as f:
+            f.write(b"RIFF\x00\x00\x00\x00AVI LIST" + bytes(64))
+
+        with pytest.raises(AtomError):
+            set_mp4_metadata(video_path, TIMESTAMP)
+
+    def test_corrupt_size(self, video_path):
+        build_file(video_path, "moov-last")
+        with open(video_path, "r+b") as f:
+            f.seek(0)
+            f.write(struct.pack(">I", 10 ** 6))
+
+        with pytest.raises(AtomError):
+            set_mp4_metadata(video_path, TIMESTAMP)
+
+
+class TestSetVideoMetadata:
+    """Test that set_video_metadata() prefers the native writer."""
+
+    def test_native_without_ffmpeg(self, video_path):
+        """MP4 files should not need ffmpeg at all."""
+        build_file(video_path, "moov-last")
+
+        with patch("video_metadata.is_ffmpeg_available", side_effect=AssertionError("probed")):
+            assert set_video_metadata(video_path, TIMESTAMP, 40.7128, -74.006)
+
+    def test_falls_back_to_ffmpeg(self, video_path):
+        """Files the native writer refuses should go to ffmpeg."""
+        with open(video_path, "wb") as f:
+            f.write(b"not a video at all")
+
+        with patch("video_metadata.is_ffmpeg_available", return_value=False) as probe:
+            assert set_video_metadata(video_path, TIMESTAMP) is False
+            probe.assert_called_once()
+
+    def test_no_fallback_when_disallowed(self, video_path):
+        """allow_ffmpeg=False should not probe ffmpeg."""
+        with open(video_path, "wb") as f:
+            f.write(b"not a video at all")
+
+        with patch("video_metadata.is_ffmpeg_available", side_effect=AssertionError("probed")):
+            assert set_video_metadata(video_path, TIMESTAMP, allow_ffmpeg=False) is False
+
+
+class TestReadMetadata:
+    """Test reading creation time and location without loading moov."""
+
+    @pytest.mark.parametrize("layout, version", [("moov-last", 0), ("faststart", 1)])
+    def test_reads_what_was_written(self, video_path, layout, version):
+        build_file(video_path, layout, version=version)
+        assert read_mp4_metadata(video_path) == (1 - MAC_EPOCH_OFFSET, None)
+
+        set_mp4_metadata(video_path, TIMESTAMP, 40.7128, -74.006)
+
+        assert read_mp4_metadata(video_path) == (TIMESTAMP, iso6709(40.7128, -74.006))
+
+    def test_no_moov(self, video_path):
+        with open(video_path, "wb") as f:
+            f.write(box(b"ftyp", b"isom") + box(b"mdat", MEDIA))
+        with pytest.raises(AtomError):
+            read_mp4_metadata(video_path)
+
+    def test_matches(self, video_path):
+        build_file(video_path, "free")
+        set_mp4_metadata(video_path, TIMESTAMP, 40.7128, -74.006)
+
+        assert video_metadata_matches(video_path, TIMESTAMP, 40.7128, -74.006)
+        assert video_metadata_matches(video_path, TIMESTAMP)
+        assert not video_metadata_matches(video_path, TIMESTAMP + 1, 40.7128, -74.006)
+        assert not video_metadata_matches(video_path, TIMESTAMP, 51.5, -0.12)
+
+    def test_unreadable_never_matches(self, video_path):
+        with open(video_path, "wb") as f:
+            f.write(b"not a video at all")
+        assert not video_metadata_matches(video_path, TIMESTAMP)
@@ -0,0 +1,60 @@
+"""Tests for NameAllocator.
+
+Tests include:
+- Free names returned unchanged
+- First free variant, including gaps, like checkIfSameName()
+- Allocation continuing from the last variant found
+- Case-insensitive clashes
+"""
+
+from __future__ import annotations
+
+import pytest
+
+from auxFunctions import checkIfSameName
+from names import NameAllocator, split_name
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("photo.jpg", ("photo", ".jpg")),
+    ("archive.tar.gz", ("archive.tar", ".gz")),
+    ("README", ("README", "")),
+])
+def test_split_name(name, expected):
+    assert split_name(name) == expected
+
+
+class TestNameAllocator:
+    """Test finding and taking numbered variants."""
+
+    @pytest.mark.parametrize("taken", [
+        set(),
+        {"file.jpg"},
+        {"file.jpg", "file(1).jpg", "file(3).jpg"},
+        {"file.jpg", "file(2).jpg", "file(5).jpg"},
+        {"file.jpg"} | {f"file({i}).jpg" for i in range(100)},
+    ])
+    def test_same_as_check_if_same_name(self, taken):
+        assert NameAllocator(set(taken)).first_free("file.jpg") == checkIfSameName("file.jpg", taken)
+
+    def test_first_free_does_not_take(self):
+        names = NameAllocator({"a.jpg"})
+        assert names.first_free("a.jpg") == names.first_free("a.jpg") == "a(1).jpg"
+        assert names.taken == {"a.jpg"}
+
+    def test_allocate_sequence(self):
+        names = NameAllocator({"IMG_0001.jpg", "IMG_0001(2).jpg"})
+        allocated = [names.allocate("IMG_0001.jpg") for _ in range(3)]
+        assert allocated == ["IMG_0001(1).jpg", "IMG_0001(3).jpg", "IMG_0001(4).jpg"]
+
+    def test_no_attempt_limit(self):
+        names = NameAllocator()
+        for _ in range(2000):
+            last = names.allocate("burst.jpg")
+        assert last == "burst(1999).jpg"
+
+    def test_casefold(self):
+        names = NameAllocator(casefold=True)
+        assert names.allocate("IMG.JPG") == "IMG.JPG"
+        assert names.allocate("img.jpg") == "img(1).jpg"
+        assert names.taken == {"img.jpg", "img(1).jpg"}
@@ -0,0 +1,117 @@
+"""Tests for the staged execution pipeline.
+
+Tests include:
+- Pipeline routing items between stages
+- Per-stage worker threads and bounded queues
+- Errors raised by stages
+- Execution stage routing by format
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+
+import pytest
+
+from executor import Job, run_stage
+from pipeline import Pipeline, Stage
+from planner import PlannedOperation
+
+
+class TestPipeline:
+    """Test the generic Pipeline runner."""
+
+    def test_routes_through_stages(self):
+        """Each item should visit the stages its functions route it to."""
+        visited: dict[int, list[str]] = {i: [] for i in range(20)}
+
+        def step(name, next_stage):
+            def fn(item):
+                visited[item].append(name)
+                if name == "split":
+                    return "even" if item % 2 == 0 else "odd"
+                return next_stage
+            return fn
+
+        pipeline = Pipeline([
+            Stage("split", step("split", None), 2),
+            Stage("even", step("even", "done"), 1),
+            Stage("odd", step("odd", "done"), 1),
+            Stage("done", step("done", None), 2),
+        ])
+
+        assert sorted(pipeline.run(range(20))) == list(range(20))
+        assert visited[4] == ["split", "even", "done"]
+        assert visited[5] == ["split", "odd", "done"]
+        assert pipeline.stages["done"].processed == 20
+
+    def test_stage_threads(self):
+        """Each stage should run on its own named threads."""
+        names: dict[str, set[str]] = {"a": set(), "b": set()}
+
+        def record(stage, next_stage):
+            def fn(item):
+                names[stage].add(threading.current_thread().name)
+                return next_stage
+            return fn
+
+        pipeline = Pipeline([Stage("a", record("a", "b"), 3), Stage("b", record("b", None), 1)])
+        list(pipeline.run(range(30)))
+
+        assert all(name.startswith("a-") for name in names["a"])
+        assert names["b"] == {"b-0"}
+
+    def test_queues_are_bounded(self):
+        """A slow stage should not let its queue grow past capacity."""
+        def slow(item):
+            time.sleep(0.001)
+            return None
+
+        pipeline = Pipeline([Stage("fast", lambda item: "slow", 4), Stage("slow", slow, 1, capacity=2)])
+        assert len(list(pipeline.run(range(50)))) == 50
+        assert pipeline.stages["slow"].peak_depth <= 2
+
+    def test_empty_input(self):
+        pipeline = Pipeline([Stage("only", lambda item: None)])
+        assert list(pipeline.run([])) == []
+
+    def test_stage_error_is_raised(self):
+        def boom(item):
+            raise RuntimeError("boom")
+
+        pipeline = Pipeline([Stage("boom", boom, 2)])
+        with pytest.raises(RuntimeError, match="boom"):
+            list(pipeline.run(range(10)))
+
+    def test_depths(self):
+        pipeline = Pipeline([Stage("a", lambda item: None), Stage("b", lambda item: None)])
+        assert pipeline.depths() == {"a": 0, "b": 0}
+
+    def test_invalid_workers(self):
+        with pytest.raises(ValueError):
+            Stage("a", lambda item: None, workers=0)
+
+
+class TestStageRouting:
+    """Test how the execution stages route jobs."""
+
+    @pytest.mark.parametrize("name, content, expected", [
+        ("photo.jpg", b"\xff\xd8\xff\xe0", "metadata"),
+        ("scan.tif", b"II*\x00", "transform"),
+        ("clip.mp4", b"x", "video"),
+        ("clip.avi", b"x", "finalize"),
+        ("photo.dng", b"x", "finalize"),
+    ])
+    def test_prepare_routes_by_format(self, temp_media_dir, create_test_file, settings, name, content, expected):
+        create_test_file(name, content)
+        job = Job(PlannedOperation(name + ".json", temp_media_dir, name, 1609459200))
+
+        assert run_stage("prepare", job, settings) == expected
+
+    def test_unexpected_error_fails_job(self, temp_media_dir, settings):
+        """A stage error should end the job with a failed result."""
+        job = Job(PlannedOperation("photo.dng.json", temp_media_dir, "photo.dng", 1609459200))
+
+        assert run_stage("finalize", job, settings) is None
+        assert job.result is not None and not job.result.success
@@ -0,0 +1,318 @@
+"""Tests for the plan/execute engine.
+
+Tests include:
+- build_plan() resolving edited, (1) duplicate and truncated names
+- Deterministic plans independent of listing order
+- Planning errors for invalid sidecars
+- execute_operation() applying EditedRaw moves
+- Dry-run leaving the filesystem untouched
+- Output layouts (flat, year, month, hash)
+"""
+
+from __future__ import annotations
+
+import json
+import os
+
+import pytest
+
+from cli import CLIWindow
+from executor import execute_operation
+from media_index import MediaIndex, TreeIndex
+from planner import PlannedOperation, build_plan, build_tree_plan, layout_subdir
+
+
+def plan_folder(path: str, edited_word: str = "editado"):
+    index = MediaIndex.scan(path)
+    json_names = [name for name in index if name.endswith(".json")]
+    return build_plan(index, json_names, edited_word)
+
+
+class TestBuildPlan:
+    """Test match resolution in build_plan()."""
+
+    def test_plans_simple_match(self, temp_media_dir, create_test_file, write_sidecar):
+        """A JSON with an exact media name should produce one operation."""
+        create_test_file("photo.jpg")
+        write_sidecar("photo.jpg.json", "photo.jpg", geo=True)
+
+        plan = plan_folder(temp_media_dir)
+
+        assert len(plan.operations) == 1
+        op = plan.operations[0]
+        assert op.title == "photo.jpg"
+        assert op.timestamp == 1609459200
+        assert op.latitude == pytest.approx(40.7128)
+        assert op.raw_original is None
+
+    def test_plans_edited_pair(self, temp_media_dir, create_test_file, write_sidecar):
+        """Edited version should be matched and original planned for EditedRaw."""
+        create_test_file("photo.jpg")
+        create_test_file("photo-editado.jpg")
+        write_sidecar("photo.jpg.json", "photo.jpg")
+
+        plan = plan_folder(temp_media_dir)
+
+        assert plan.operations[0].title == "photo-editado.jpg"
+        assert plan.operations[0].raw_original == "photo.jpg"
+
+    def test_plans_duplicates_in_name_order(self, temp_media_dir, create_test_file, write_sidecar):
+        """photo.jpg.json should get photo.jpg and photo.jpg(1).json photo(1).jpg."""
+        create_test_file("photo.jpg")
+        create_test_file("photo(1).jpg")
+        write_sidecar("photo.jpg.json", "photo.jpg")
+        write_sidecar("photo.jpg(1).json", "photo.jpg")
+
+        plan = plan_folder(temp_media_dir)
+
+        matches = {op.json_name: op.title for op in plan.operations}
+        assert matches == {"photo.jpg.json": "photo.jpg", "photo.jpg(1).json": "photo(1).jpg"}
+
+    def test_plans_truncated_name(self, temp_media_dir, create_test_file, write_sidecar):
+        """Long titles should match the 47-character truncated media name."""
+        truncated = "a" * 47 + ".jpg"
+        create_test_file(truncated)
+        write_sidecar("a" * 46 + ".json", "a" * 50 + ".jpg")
+
+        plan = plan_folder(temp_media_dir)
+
+        assert plan.operations[0].title == truncated
+
+    def test_plan_is_deterministic(self, temp_media_dir, create_test_file, write_sidecar):
+        """The plan should not depend on the order JSON names are given in."""
+        create_test_file("photo.jpg")
+        create_test_file("photo(1).jpg")
+        write_sidecar("photo.jpg.json", "photo.jpg")
+        write_sidecar("photo.jpg(1).json", "photo.jpg")
+
+        forward = build_plan(MediaIndex.scan(temp_media_dir), ["photo.jpg.json", "photo.jpg(1).json"], "editado")
+        backward = build_plan(MediaIndex.scan(temp_media_dir), ["photo.jpg(1).json", "photo.jpg.json"], "editado")
+
+        assert forward == backward
+
+    def test_planning_does_not_touch_files(self, temp_media_dir, create_test_file, write_sidecar):
+        """Planning an edited pair should leave the original in place."""
+        create_test_file("photo.jpg")
+        create_test_file("photo-editado.jpg")
+        write_sidecar("photo.jpg.json", "photo.jpg")
+        before = sorted(os.listdir(temp_media_dir))
+
+        plan_folder(temp_media_dir)
+
+        assert sorted(os.listdir(temp_media_dir)) == before
+
+    def test_missing_geo_data(self, temp_media_dir, create_test_file, write_sidecar):
+        """Sidecars without geoData should still be planned."""
+        create_test_file("photo.jpg")
+        write_sidecar("photo.jpg.json", "photo.jpg")
+
+        plan = plan_folder(temp_media_dir)
+
+        assert plan.operations[0].has_location is False
+
+
+class TestPlanErrors:
+    """Test sidecars that cannot be planned."""
+
+    def test_missing_media(self, temp_media_dir, write_sidecar):
+        """A JSON without media should be reported as not found."""
+        write_sidecar("photo.jpg.json", "photo.jpg")
+
+        plan = plan_folder(temp_media_dir)
+
+        assert plan.operations == ()
+        assert plan.errors[0].error == "photo.jpg not found"
+
+    def test_missing_title(self, temp_media_dir, create_test_file):
+        """A JSON without title should be reported."""
+        create_test_file("photo.jpg.json", b'{"photoTakenTime": {"timestamp": "1"}}')
+
+        plan = plan_folder(temp_media_dir)
+
+        assert plan.errors[0].error == "Missing 'title' in JSON"
+
+    def test_missing_timestamp_does_not_claim(self, temp_media_dir, create_test_file):
+        """A JSON without timestamp should not claim its media."""
+        create_test_file("photo.jpg")
+        create_test_file("photo.jpg.json", b'{"title": "photo.jpg"}')
+        index = MediaIndex.scan(temp_media_dir)
+
+        plan = build_plan(index, ["photo.jpg.json"], "editado")
+
+        assert plan.errors[0].error == "Missing timestamp in JSON"
+        assert not index.is_claimed("photo.jpg")
+
+    def test_invalid_json(self, temp_media_dir, create_test_file):
+        """Unparseable JSON should be reported, not raised."""
+        create_test_file("photo.jpg.json", b"{not json")
+
+        plan = plan_folder(temp_media_dir)
+
+        assert len(plan.errors) == 1
+
+
+class TestBuildTreePlan:
+    """Test planning a whole Takeout tree in one pass."""
+
+    def test_plans_every_folder(self, temp_dir):
+        """Each folder should be matched independently with its own output folder."""
+        for folder in ["Photos from 2020", "Album"]:
+            os.makedirs(os.path.join(temp_dir, folder))
+            with open(os.path.join(temp_dir, folder, "photo.jpg"), "wb") as f:
+                f.write(b"x")
+            with open(os.path.join(temp_dir, folder, "photo.jpg.json"), "w", encoding="utf8") as f:
+                json.dump({"title": "photo.jpg", "photoTakenTime": {"timestamp": "1"}}, f)
+
+        tree = TreeIndex.scan(temp_dir, recursive=True, max_workers=2)
+        plan = build_tree_plan(tree, "editado", max_workers=2)
+
+        assert [op.output_subdir for op in plan.operations] == ["Album", "Photos from 2020"]
+        assert all(op.title == "photo.jpg" for op in plan.operations)
+        assert plan.output_subdirs == {"Album", "Photos from 2020"}
+
+
+class TestExecuteOperation:
+    """Test applying planned operations."""
+
+    def test_moves_media_and_original(self, temp_media_dir, create_test_file, settings):
+        """Executing should move the match, move the original and delete the JSON."""
+        create_test_file("photo.dng")
+        create_test_file("photo-editado.dng")
+        create_test_file("photo.dng.json", b"{}")
+        op = PlannedOperation("photo.dng.json", temp_media_dir, "photo-editado.dng", 1609459200,
+                              raw_original="photo.dng")
+
+        result = execute_operation(op, settings)
+
+        assert result.success
+        assert os.listdir(temp_media_dir) == []
+        assert os.path.exists(os.path.join(settings.fixed_media_path, "photo-editado.dng"))
+        assert os.path.exists(os.path.join(settings.non_edited_media_path, "photo.dng"))
+
+    def test_writes_to_output_subdir(self, temp_media_dir, create_test_file, settings):
+        """Media should land in the operation's output folder."""
+        create_test_file("photo.dng")
+        create_test_file("photo.dng.json", b"{}")
+        os.makedirs(os.path.join(settings.fixed_media_path, "Album"))
+        op = PlannedOperation("photo.dng.json", temp_media_dir, "photo.dng", 1609459200, output_subdir="Album")
+
+        assert execute_operation(op, settings).success
+        assert os.path.exists(os.path.join(settings.fixed_media_path, "Album", "photo.dng"))
+
+    def test_missing_source_reports_error(self, temp_media_dir, settings):
+        """A vanished media file should produce a failed result."""
+        op = PlannedOperation("photo.dng.json", temp_media_dir, "photo.dng", 1609459200)
+
+        result = execute_operation(op, settings)
+
+        assert not result.success
+
+
+class TestLayout:
+    """Test the output layouts."""
+
+    # 2021-06-06, far enough from a year or month boundary for any timezone
+    TIMESTAMP = 1623000000
+
+    def test_layout_subdir(self):
+        assert layout_subdir("flat", "a.jpg", self.TIMESTAMP) == ""
+        assert layout_subdir("year", "a.jpg", self.TIMESTAMP) == "2021"
+        assert layout_subdir("month", "a.jpg", self.TIMESTAMP) == os.path.join("2021", "06")
+        bucket = layout_subdir("hash", "a.jpg", self.TIMESTAMP)
+        assert len(bucket) == 2 and bucket == layout_subdir("hash", "a.jpg", 0)
+
+    def test_invalid_date(self):
+        assert layout_subdir("year", "a.jpg", 10 ** 20) == "unknown-date"
+
+    def test_layout_below_folder_output(self, temp_media_dir, create_test_file, write_sidecar):
+        os.makedirs(os.path.join(temp_media_dir, "Album"))
+        create_test_file(os.path.join("Album", "photo.jpg"))
+        write_sidecar(os.path.join("Album", "photo.jpg.json"), "photo.jpg", timestamp=self.TIMESTAMP)
+
+        plan = build_tree_plan(TreeIndex.scan(temp_media_dir, recursive=True), "editado", layout="month")
+
+        assert plan.operations[0].output_subdir == os.path.join("Album", "2021", "06")
+
+    def test_year_layout_run(self, temp_media_dir, create_test_file, write_sidecar):
+        from main import mainProcess
+
+        create_test_file("photo.dng")
+        create_test_file("photo-editado.dng")
+        write_sidecar("photo.dng.json", "photo.dng", timestamp=self.TIMESTAMP)
+
+        result = mainProcess(temp_media_dir, CLIWindow(quiet=True), "editado", max_workers=1, layout="year")
+
+        assert result["success_count"] == 1
+        assert os.listdir(os.path.join(temp_media_dir, "MatchedMedia", "2021")) == ["photo-editado.dng"]
+        assert os.listdir(os.path.join(temp_media_dir, "EditedRaw", "2021")) == ["photo.dng"]
+
+
+class TestDryRun:
+    """Test that dry-run mode is read-only."""
+
+    def test_dry_run_leaves_tree_untouched(self, temp_media_dir, create_test_file, write_sidecar):
+        """Dry-run should not move originals to EditedRaw or create folders."""
+        from main import mainProcess
+
+        create_test_file("photo.jpg")
+        create_test_file("photo-editado.jpg")
+        write_sidecar("photo.jpg.json", "photo.jpg")
+        before = sorted(os.listdir(temp_media_dir))
+
+        result = mainProcess(temp_media_dir, CLIWindow(quiet=True), "editado", dry_run=True, max_workers=1)
+
+        assert result["success_count"] == 1
+        assert result["operations"][0]["edited_raw"]["source"].endswith("photo.jpg")
+        assert sorted(os.listdir(temp_media_dir)) == before
+
+
+class TestVideoLane:
+    """Test that videos run in their own worker lane."""
+
+    def test_videos_use_video_threads(self, temp_media_dir, create_test_file, write_sidecar):
+        """Videos should be executed by the video pool, other media by the main pool."""
+        import threading
+        from unittest.mock import patch
+
+        from main import mainProcess
+
+        create_test_file("clip.mp4")
+        create_test_file("photo.dng")
+        write_sidecar("clip.mp4.json", "clip.mp4")
+        write_sidecar("photo.dng.json", "photo.dng")
+        threads: dict[str, str] = {}
+
+        def record(filepath, *args, **kwargs):
+            threads[os.path.basename(filepath)] = threading.current_thread().name
+            return True
+
+        with patch("executor.set_video_metadata", side_effect=record):
+            result = mainProcess(temp_media_dir, CLIWindow(quiet=True), "editado", max_workers=2, video_workers=1)
+
+        assert result["success_count"] == 2
+        assert threads["clip.mp4"].startswith("video")
+
+
+class TestProcessExecutor:
+    """Test the process-pool execution backend."""
+
+    def test_process_executor_moves_everything(self, temp_media_dir, create_test_file, write_sidecar):
+        """Batches run in worker processes should give the same result as threads."""
+        from main import mainProcess
+
+        for i in range(10):
+            create_test_file(f"photo{i}.dng")
+            write_sidecar(f"photo{i}.dng.json", f"photo{i}.dng")
+        write_sidecar("missing.dng.json", "missing.dng")
+
+        result = mainProcess(temp_media_dir, CLIWindow(quiet=True), "editado", max_workers=2, executor="process")
+
+        assert (result["success_count"], result["error_count"]) == (10, 1)
+        matched = os.path.join(temp_media_dir, "MatchedMedia")
+        assert sorted(os.listdir(matched)) == sorted(f"photo{i}.dng" for i in range(10))
+
+    def test_unknown_executor(self, temp_media_dir):
+        from main import mainProcess
+
+        with pytest.raises(ValueError):
+            mainProcess(temp_media_dir, CLIWindow(quiet=True), "editado", executor="fiber")
@@ -0,0 +1,176 @@
+"""Tests for bounded task submission and result tallying.
+
+Tests include:
+- Every item processed exactly once
+- Never more than the lane limit in flight
+- Items pulled lazily from the lane iterator
+- MemoryBudget holding reservations until they fit
+- ResultTally counters and dry-run operations
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from executor import ProcessResult, ResultTally
+from scheduler import Lane, MemoryBudget, batched, run_bounded
+
+
+class TestRunBounded:
+    """Test run_bounded() scheduling."""
+
+    def test_processes_every_item(self):
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            results = list(run_bounded(lambda x: x * 2, [Lane(pool, range(100), 8)]))
+
+        assert sorted(results) == [x * 2 for x in range(100)]
+
+    def test_limits_in_flight(self):
+        """No more than ``limit`` tasks should be outstanding at any time."""
+        lock = threading.Lock()
+        in_flight = 0
+        peak = 0
+
+        def produce():
+            nonlocal in_flight, peak
+            for i in range(50):
+                with lock:
+                    in_flight += 1
+                    peak = max(peak, in_flight)
+                yield i
+
+        def work(item):
+            time.sleep(0.001)
+            return item
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            for _ in run_bounded(work, [Lane(pool, produce(), 3)]):
+                with lock:
+                    in_flight -= 1
+
+        assert peak <= 3
+
+    def test_pulls_items_lazily(self):
+        """Items should not be consumed before slots are free."""
+        consumed = []
+
+        def produce():
+            for i in range(10):
+                consumed.append(i)
+                yield i
+
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            results = run_bounded(lambda x: x, [Lane(pool, produce(), 2)])
+            next(results)
+            assert len(consumed) <= 3
+            assert len(list(results)) == 9
+
+    def test_multiple_lanes(self):
+        """Each lane should run on its own executor."""
+        with ThreadPoolExecutor(max_workers=2, thread_name_prefix="image") as images, \
+                ThreadPoolExecutor(max_workers=1, thread_name_prefix="video") as videos:
+            lanes = [Lane(images, ["a", "b"], 4), Lane(videos, ["v"], 1)]
+            results = dict(run_bounded(lambda x: (x, threading.current_thread().name), lanes))
+
+        assert results["v"].startswith("video")
+        assert results["a"].startswith("image")
+
+    def test_empty_lanes(self):
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            assert list(run_bounded(lambda x: x, [Lane(pool, [], 4)])) == []
+
+    def test_invalid_limit(self):
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            with pytest.raises(ValueError):
+                Lane(pool, [], 0)
+
+
+class TestMemoryBudget:
+    """Test MemoryBudget reservations."""
+
+    def test_rejects_empty_budget(self):
+        with pytest.raises(ValueError):
+            MemoryBudget(0)
+
+    def test_released_after_block(self):
+        budget = MemoryBudget(100)
+        with budget.reserve(60):
+            assert budget.used == 60
+        assert budget.used == 0
+
+    def test_large_reservation_waits_for_headroom(self):
+        budget = MemoryBudget(100)
+        admitted = threading.Event()
+
+        def reserve_large():
+            with budget.reserve(70):
+                admitted.set()
+
+        with budget.reserve(50):
+            thread = threading.Thread(target=reserve_large)
+            thread.start()
+            # Small reservations still fit next to the held one
+            with budget.reserve(40):
+                assert budget.used == 90
+            assert not admitted.wait(0.05)
+        thread.join(timeout=5)
+        assert admitted.is_set()
+
+    def test_oversized_reservation_runs_alone(self):
+        budget = MemoryBudget(100)
+        with budget.reserve(10**12):
+            assert budget.used == 100
+        assert budget.used == 0
+
+    def test_never_exceeded(self):
+        budget = MemoryBudget(100)
+        lock = threading.Lock()
+        peak = 0
+
+        def work(amount):
+            nonlocal peak
+            with budget.reserve(amount):
+                with lock:
+                    peak = max(peak, budget.used)
+                time.sleep(0.001)
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(work, [10, 60, 30, 90, 20, 50] * 5))
+
+        assert peak <= 100 and budget.used == 0
+
+
+class TestBatched:
+    """Test grouping items into batches."""
+
+    def test_batches(self):
+        assert list(batched(range(7), 3)) == [(0, 1, 2), (3, 4, 5), (6,)]
+
+    def test_empty(self):
+        assert list(batched([], 3)) == []
+
+    def test_invalid_size(self):
+        with pytest.raises(ValueError):
+            list(batched([1], 0))
+
+
+class TestResultTally:
+    """Test folding results into counters."""
+
+    def test_counts(self):
+        tally = ResultTally()
+        tally.add(ProcessResult("a.json", success=True, title="a.jpg"))
+        tally.add(ProcessResult("b.json", success=False, error="b.jpg not found"))
+
+        assert (tally.success_count, tally.error_count, tally.total) == (1, 1, 2)
+        assert tally.operations == []
+
+    def test_keeps_dry_run_operations(self):
+        tally = ResultTally(keep_operations=True)
+        tally.add(ProcessResult("a.json", success=True, operation={"action": "move"}))
+
+        assert tally.operations == [{"action": "move"}]
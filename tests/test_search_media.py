@@ -3,7 +3,7 @@
 Tests media file search patterns including:
 - Finding original files
 - Finding edited versions (-editado suffix)
-- Finding truncated versions (47 char limit)
+- Finding truncated versions, at any truncation length
 - Returns None when not found
 - File moving behavior
 """
@@ -232,6 +232,89 @@ class TestFindsTruncatedVersions:
 
         assert result == truncated_dup
 
+    @pytest.mark.parametrize("on_disk", [
+        "Screenshot_20210101-120000_Some Application N.jpg",
+        "Screenshot_20210101-120000_Some Application Na.jpg",
+        "Screenshot_20210101-120000_Some Applicatio-editado.jpg",
+        "Screenshot_20210101-120000_Some Application(2).jpg",
+    ])
+    def test_finds_other_truncation_lengths(self, temp_media_dir, non_edited_dir, create_test_file,
+                                            empty_media_moved, on_disk):
+        """Should find names truncated at any length, with or without suffixes."""
+        create_test_file(on_disk)
+
+        result = searchMedia(
+            temp_media_dir,
+            "Screenshot_20210101-120000_Some Application Name.jpg",
+            empty_media_moved,
+            non_edited_dir,
+            "editado"
+        )
+
+        assert result == on_disk
+
+    def test_prefers_longest_truncation(self, temp_media_dir, non_edited_dir, create_test_file, empty_media_moved):
+        """Should pick the candidate sharing the most characters with the title."""
+        long_name = "b" * 30 + "x" * 20 + ".jpg"
+        create_test_file("b" * 30 + "x" * 12 + ".jpg")
+        create_test_file("b" * 30 + "x" * 14 + ".jpg")
+
+        result = searchMedia(temp_media_dir, long_name, empty_media_moved, non_edited_dir, "editado")
+
+        assert result == "b" * 30 + "x" * 14 + ".jpg"
+
+    def test_truncated_edited_moves_original(self, temp_media_dir, non_edited_dir, create_test_file,
+                                             empty_media_moved):
+        """The original of a truncated edited version should be moved aside."""
+        create_test_file("c" * 44 + "-editado.jpg")
+        create_test_file("c" * 44 + ".jpg")
+
+        result = searchMedia(temp_media_dir, "c" * 50 + ".jpg", empty_media_moved, non_edited_dir, "editado")
+
+        assert result == "c" * 44 + "-editado.jpg"
+        assert os.path.exists(os.path.join(non_edited_dir, "c" * 44 + ".jpg"))
+
+    def test_short_prefix_not_taken_for_truncation(self, temp_media_dir, non_edited_dir, create_test_file,
+                                                   empty_media_moved):
+        """A shorter name that only shares a prefix is a different file."""
+        create_test_file("holiday_photo_from_the_beach_2019.jpg")
+
+        result = searchMedia(
+            temp_media_dir,
+            "holiday_photo_from_the_beach_2019_final.jpg",
+            empty_media_moved,
+            non_edited_dir,
+            "editado"
+        )
+
+        assert result is None
+
+    def test_untruncated_title_not_matched_to_other_file(self, temp_media_dir, non_edited_dir, create_test_file,
+                                                         empty_media_moved):
+        """A title too short to be truncated is not matched to a name it extends."""
+        create_test_file("Screenshot_20200101-123456_WhatsApp-editado.jpg")
+        create_test_file("Screenshot_20200101-123456_WhatsApp.jpg")
+
+        result = searchMedia(
+            temp_media_dir,
+            "Screenshot_20200101-123456_WhatsApp_2.jpg",
+            empty_media_moved,
+            non_edited_dir,
+            "editado"
+        )
+
+        assert result is None
+        assert os.path.exists(os.path.join(temp_media_dir, "Screenshot_20200101-123456_WhatsApp.jpg"))
+
+    def test_name_not_cut_at_truncation_length_not_taken(self, temp_media_dir, non_edited_dir, create_test_file,
+                                                         empty_media_moved):
+        """Only names cut at a truncation length are taken for truncated ones."""
+        create_test_file("e" * 40 + ".jpg")
+
+        result = searchMedia(temp_media_dir, "e" * 60 + ".jpg", empty_media_moved, non_edited_dir, "editado")
+
+        assert result is None
+
     def test_prefers_non_truncated_over_truncated(self, temp_media_dir, non_edited_dir, create_test_file, empty_media_moved):
         """Should prefer non-truncated version when both exist."""
         long_name = "a" * 50 + ".jpg"
@@ -0,0 +1,95 @@
+"""Tests for sidecar decoding.
+
+Tests include:
+- Extraction of title, timestamp and geoData from full Takeout sidecars
+- Missing and oddly typed fields
+- Every installed backend returning the same records
+- Invalid JSON raising SidecarError
+"""
+
+from __future__ import annotations
+
+import json
+import pickle
+
+import pytest
+
+from sidecar import BACKENDS, SidecarError, SidecarRecord, decode_sidecar, read_sidecar
+
+FULL_SIDECAR = {
+    "title": "IMG_0001.jpg",
+    "description": "",
+    "imageViews": "12",
+    "creationTime": {"timestamp": "1610000000", "formatted": "7 Jan 2021"},
+    "photoTakenTime": {"timestamp": "1609459200", "formatted": "1 Jan 2021"},
+    "geoData": {"latitude": 40.7128, "longitude": -74.006, "altitude": 10.0,
+                "latitudeSpan": 0.0, "longitudeSpan": 0.0},
+    "geoDataExif": {"latitude": 40.7128, "longitude": -74.006, "altitude": 10.0},
+    "people": [{"name": "Someone"}],
+    "url": "https://photos.google.com/photo/abc",
+    "googlePhotosOrigin": {"mobileUpload": {"deviceType": "ANDROID_PHONE"}},
+}
+
+
+@pytest.fixture(params=BACKENDS)
+def backend(request) -> str:
+    return request.param
+
+
+def decode(data, backend: str) -> SidecarRecord:
+    return decode_sidecar(json.dumps(data).encode(), backend)
+
+
+class TestDecode:
+    """Test field extraction, for every installed backend."""
+
+    def test_full_sidecar(self, backend):
+        assert decode(FULL_SIDECAR, backend) == SidecarRecord("IMG_0001.jpg", 1609459200, 40.7128, -74.006, 10.0)
+
+    def test_integer_fields(self, backend):
+        """Numeric timestamps and integer coordinates should be accepted."""
+        data = {"title": "a.jpg", "photoTakenTime": {"timestamp": 5}, "geoData": {"latitude": 1, "longitude": 2}}
+        assert decode(data, backend) == SidecarRecord("a.jpg", 5, 1.0, 2.0, None)
+
+    def test_string_coordinates(self, backend):
+        data = {"title": "a.jpg", "photoTakenTime": {"timestamp": "5"}, "geoData": {"latitude": "1.5"}}
+        assert decode(data, backend).latitude == 1.5
+
+    def test_missing_fields(self, backend):
+        assert decode({"people": []}, backend) == SidecarRecord()
+
+    def test_invalid_timestamp(self, backend):
+        data = {"title": "a.jpg", "photoTakenTime": {"timestamp": "soon"}}
+        assert decode(data, backend).timestamp is None
+
+    def test_non_string_title(self, backend):
+        assert decode({"title": 12}, backend).title is None
+
+    def test_non_object(self, backend):
+        assert decode([1, 2, 3], backend) == SidecarRecord()
+
+    def test_invalid_json(self, backend):
+        with pytest.raises(SidecarError):
+            decode_sidecar(b"{not json", backend)
+
+    def test_unicode_title(self, backend):
+        assert decode({"title": "Café ñ 写真.jpg"}, backend).title == "Café ñ 写真.jpg"
+
+
+class TestRecord:
+    """Test the SidecarRecord container."""
+
+    def test_has_no_dict(self):
+        assert not hasattr(SidecarRecord(), "__dict__")
+
+    def test_pickles(self):
+        """Records are sent between processes."""
+        record = SidecarRecord("a.jpg", 1, 2.0, 3.0, None)
+        assert pickle.loads(pickle.dumps(record)) == record
+
+    def test_read_sidecar(self, temp_media_dir):
+        path = f"{temp_media_dir}/a.jpg.json"
+        with open(path, "w", encoding="utf8") as f:
+            json.dump(FULL_SIDECAR, f)
+
+        assert read_sidecar(path).title == "IMG_0001.jpg"
@@ -0,0 +1,107 @@
+"""Tests for skipping media that already has the sidecar metadata.
+
+Tests include:
+- exif_matches() comparing date and GPS from the JPEG header
+- Already correct JPEGs and videos only moved, not rewritten
+- Skips counted in the run summary
+"""
+
+from __future__ import annotations
+
+import os
+import shutil
+from dataclasses import replace
+from unittest.mock import patch
+
+import pytest
+
+from auxFunctions import exif_matches, set_EXIF
+from cli import CLIWindow
+from executor import execute_operation
+from main import mainProcess
+from mp4_atoms import set_mp4_metadata
+
+from .test_mp4_atoms import build_file
+
+TIMESTAMP = 1609459200
+
+
+class TestExifMatches:
+    """Test the header-only EXIF comparison."""
+
+    def test_no_exif(self, jpeg_path):
+        assert not exif_matches(jpeg_path, None, None, None, TIMESTAMP)
+
+    def test_after_set_exif(self, jpeg_path):
+        set_EXIF(jpeg_path, 40.7128, -74.006, 10.0, TIMESTAMP)
+
+        assert exif_matches(jpeg_path, 40.7128, -74.006, 10.0, TIMESTAMP)
+        assert exif_matches(jpeg_path, None, None, None, TIMESTAMP)
+
+    @pytest.mark.parametrize("lat, lng, altitude, timestamp", [
+        (40.7128, -74.006, 10.0, TIMESTAMP + 1),
+        (-40.7128, -74.006, 10.0, TIMESTAMP),
+        (40.7128, -74.007, 10.0, TIMESTAMP),
+        (40.7128, -74.006, 12.0, TIMESTAMP),
+    ])
+    def test_differences(self, jpeg_path, lat, lng, altitude, timestamp):
+        set_EXIF(jpeg_path, 40.7128, -74.006, 10.0, TIMESTAMP)
+        assert not exif_matches(jpeg_path, lat, lng, altitude, timestamp)
+
+    def test_date_only_file_lacks_gps(self, jpeg_path):
+        set_EXIF(jpeg_path, None, None, None, TIMESTAMP)
+        assert not exif_matches(jpeg_path, 40.7128, -74.006, None, TIMESTAMP)
+
+    def test_not_jpeg(self, create_test_file):
+        with pytest.raises(ValueError):
+            exif_matches(create_test_file("fake.jpg", b"not an image"), None, None, None, TIMESTAMP)
+
+
+class TestSkipExecution:
+    """Test that already correct media is not rewritten."""
+
+    def test_jpeg(self, jpeg_path, settings, make_operation):
+        set_EXIF(jpeg_path, 40.7128, -74.006, 10.0, TIMESTAMP)
+
+        with patch("executor.set_EXIF", side_effect=AssertionError("rewritten")):
+            result = execute_operation(make_operation("photo.jpg"), settings)
+
+        assert result.success and result.skipped
+        destination = os.path.join(settings.fixed_media_path, "photo.jpg")
+        assert os.path.getmtime(destination) == TIMESTAMP
+
+    def test_jpeg_not_reencoded(self, jpeg_path, settings, make_operation):
+        set_EXIF(jpeg_path, 40.7128, -74.006, 10.0, TIMESTAMP)
+        settings = replace(settings, reencode_jpeg=True)
+
+        with patch("executor._convert_to_jpeg", side_effect=AssertionError("re-encoded")):
+            assert execute_operation(make_operation("photo.jpg"), settings).skipped
+
+    def test_jpeg_with_other_metadata_is_written(self, jpeg_path, settings, make_operation):
+        result = execute_operation(make_operation("photo.jpg"), settings)
+
+        assert result.success and not result.skipped
+        assert exif_matches(os.path.join(settings.fixed_media_path, "photo.jpg"), 40.7128, -74.006, 10.0,
+                            TIMESTAMP)
+
+    def test_video(self, temp_media_dir, settings, make_operation):
+        path = os.path.join(temp_media_dir, "clip.mp4")
+        build_file(path, "moov-last")
+        set_mp4_metadata(path, TIMESTAMP, 40.7128, -74.006)
+
+        with patch("executor.set_video_metadata", side_effect=AssertionError("patched")):
+            result = execute_operation(make_operation("clip.mp4"), settings)
+
+        assert result.success and result.skipped
+
+
+def test_summary_counts_skips(temp_media_dir, jpeg_path, write_sidecar):
+    set_EXIF(jpeg_path, None, None, None, TIMESTAMP)
+    shutil.copyfile(jpeg_path, os.path.join(temp_media_dir, "other.jpg"))
+    set_EXIF(os.path.join(temp_media_dir, "other.jpg"), None, None, None, TIMESTAMP + 60)
+    for title in ("photo.jpg", "other.jpg"):
+        write_sidecar(title + ".json", title)
+
+    result = mainProcess(temp_media_dir, CLIWindow(quiet=True), "editado", max_workers=1)
+
+    assert (result["success_count"], result["skipped_count"]) == (2, 1)
@@ -0,0 +1,100 @@
+"""Tests for the cached ffmpeg/ffprobe toolchain.
+
+Tests include:
+- Parsing version and features from '-version' output
+- Missing tools reported as unavailable
+- Probing once per process
+- Size-scaled ffmpeg timeouts
+"""
+
+from __future__ import annotations
+
+import subprocess
+from unittest.mock import patch
+
+import pytest
+
+import toolchain
+from toolchain import ffmpeg_timeout, get_toolchain, probe_tool
+from video_metadata import is_ffmpeg_available
+
+VERSION_OUTPUT = b"""ffmpeg version 6.1.1 Copyright (c) 2000-2023 the FFmpeg developers
+built with gcc 13 (GCC)
+configuration: --prefix=/usr --enable-gpl --enable-libx264 --disable-debug
+libavutil      58. 29.100 / 58. 29.100
+"""
+
+
+@pytest.fixture(autouse=True)
+def reset_cache():
+    """Each test starts without a cached toolchain."""
+    toolchain._toolchain = None
+    yield
+    toolchain._toolchain = None
+
+
+def completed(returncode: int = 0, stdout: bytes = VERSION_OUTPUT) -> subprocess.CompletedProcess:
+    return subprocess.CompletedProcess(["ffmpeg", "-version"], returncode, stdout, b"")
+
+
+class TestProbeTool:
+    """Test probing a single executable."""
+
+    def test_parses_version_and_features(self):
+        with patch("toolchain.shutil.which", return_value="/usr/bin/ffmpeg"), \
+                patch("toolchain.subprocess.run", return_value=completed()):
+            info = probe_tool("ffmpeg")
+
+        assert info.available
+        assert info.path == "/usr/bin/ffmpeg"
+        assert info.version == "6.1.1"
+        assert info.features == {"gpl", "libx264"}
+
+    def test_missing_tool(self):
+        with patch("toolchain.shutil.which", return_value=None), \
+                patch("toolchain.subprocess.run", side_effect=AssertionError("spawned")):
+            info = probe_tool("ffprobe")
+
+        assert not info.available
+
+    def test_failing_tool(self):
+        with patch("toolchain.shutil.which", return_value="/usr/bin/ffmpeg"), \
+                patch("toolchain.subprocess.run", return_value=completed(returncode=1)):
+            assert not probe_tool("ffmpeg").available
+
+    def test_hanging_tool(self):
+        with patch("toolchain.shutil.which", return_value="/usr/bin/ffmpeg"), \
+                patch("toolchain.subprocess.run", side_effect=subprocess.TimeoutExpired("ffmpeg", 5)):
+            assert not probe_tool("ffmpeg").available
+
+
+class TestCaching:
+    """Test that tools are probed once per process."""
+
+    def test_probed_once(self):
+        with patch("toolchain.shutil.which", return_value="/usr/bin/ffmpeg"), \
+                patch("toolchain.subprocess.run", return_value=completed()) as run:
+            for _ in range(5):
+                assert is_ffmpeg_available()
+
+        # One probe each for ffmpeg and ffprobe
+        assert run.call_count == 2
+
+    def test_refresh_probes_again(self):
+        with patch("toolchain.shutil.which", return_value=None):
+            first = get_toolchain()
+            assert get_toolchain() is first
+            assert get_toolchain(refresh=True) is not first
+
+
+class TestTimeout:
+    """Test size-scaled ffmpeg timeouts."""
+
+    def test_small_file_gets_base_timeout(self):
+        assert ffmpeg_timeout(0) == toolchain.FFMPEG_BASE_TIMEOUT
+
+    def test_scales_with_size(self):
+        small = ffmpeg_timeout(100 * 1024 * 1024)
+        large = ffmpeg_timeout(10 * 1024 * 1024 * 1024)
+        assert small < large
+        assert large > 300
@@ -0,0 +1,137 @@
+"""Tests for the XMP sidecar metadata mode.
+
+Tests include:
+- XMP packets with the date, GPS position and altitude
+- Media placed byte for byte, with a .xmp file next to them
+- Edited originals and RAW files getting sidecars too
+- Dry-run descriptions naming the sidecar
+"""
+
+from __future__ import annotations
+
+import os
+import xml.etree.ElementTree as ET
+from dataclasses import replace
+from datetime import datetime
+
+import pytest
+from PIL import Image
+
+from cli import CLIWindow
+from executor import execute_operation
+from main import mainProcess
+from xmp import write_xmp, xmp_packet, xmp_path
+
+TIMESTAMP = 1609459200
+EXIF = "{http://ns.adobe.com/exif/1.0/}"
+
+
+def properties(packet: str) -> dict[str, str]:
+    """Attributes of the rdf:Description in ``packet``, by local name."""
+    root = ET.fromstring(packet.split("?>", 1)[1].rsplit("<?", 1)[0])
+    description = next(root.iter("{http://www.w3.org/1999/02/22-rdf-syntax-ns#}Description"))
+    return {name.removeprefix(EXIF): value for name, value in description.attrib.items() if name.startswith(EXIF)}
+
+
+class TestPacket:
+    """Test the XMP packet contents."""
+
+    def test_date_and_location(self):
+        tags = properties(xmp_packet(TIMESTAMP, 40.7128, -74.006, 10.0))
+
+        assert datetime.fromisoformat(tags["DateTimeOriginal"]).timestamp() == TIMESTAMP
+        assert tags["GPSLatitude"] == "40,42.768000N"
+        assert tags["GPSLongitude"] == "74,0.360000W"
+        assert (tags["GPSAltitudeRef"], tags["GPSAltitude"]) == ("0", "10/1")
+
+    def test_southern_hemisphere_below_sea_level(self):
+        tags = properties(xmp_packet(TIMESTAMP, -33.8688, 151.2093, -12.5))
+
+        assert tags["GPSLatitude"] == "33,52.128000S"
+        assert tags["GPSLongitude"] == "151,12.558000E"
+        assert (tags["GPSAltitudeRef"], tags["GPSAltitude"]) == ("1", "25/2")
+
+    def test_date_only(self):
+        assert set(properties(xmp_packet(TIMESTAMP))) == {"DateTimeOriginal"}
+
+    def test_write_replaces(self, temp_dir):
+        media = os.path.join(temp_dir, "photo.jpg")
+        write_xmp(media, TIMESTAMP, 1.0, 2.0)
+
+        assert write_xmp(media, TIMESTAMP) == xmp_path(media) == media + ".xmp"
+        with open(media + ".xmp", encoding="utf-8") as f:
+            assert "GPSLatitude" not in properties(f.read())
+
+
+class TestXmpMode:
+    """Test execute_operation() in the xmp metadata mode."""
+
+    @pytest.fixture
+    def settings(self, settings):
+        return replace(settings, metadata_mode="xmp")
+
+    @pytest.mark.parametrize("title", ["photo.jpg", "scan.tif", "clip.mp4", "photo.dng"])
+    def test_media_not_rewritten(self, temp_media_dir, settings, make_operation, title):
+        path = os.path.join(temp_media_dir, title)
+        if title.endswith((".jpg", ".tif")):
+            Image.new("RGB", (8, 8), "red").save(path)
+        else:
+            with open(path, "wb") as f:
+                f.write(b"\x00\x00\x00\x18ftypisom" + bytes(32))
+        with open(path, "rb") as f:
+            original = f.read()
+
+        result = execute_operation(make_operation(title), settings)
+
+        assert result.success and result.title == title
+        destination = os.path.join(settings.fixed_media_path, title)
+        with open(destination, "rb") as f:
+            assert f.read() == original
+        assert os.path.getmtime(destination) == TIMESTAMP
+        with open(destination + ".xmp", encoding="utf-8") as f:
+            assert properties(f.read())["GPSLatitude"] == "40,42.768000N"
+
+    def test_edited_original_gets_sidecar(self, create_test_file, settings, make_operation):
+        create_test_file("photo-editado.dng")
+        create_test_file("photo.dng")
+
+        op = make_operation("photo-editado.dng", raw_original="photo.dng")
+        assert execute_operation(op, settings).success
+
+        assert os.path.exists(os.path.join(settings.fixed_media_path, "photo-editado.dng.xmp"))
+        assert os.path.exists(os.path.join(settings.non_edited_media_path, "photo.dng.xmp"))
+
+    def test_copy_mode_leaves_source(self, temp_media_dir, create_test_file, settings, make_operation):
+        create_test_file("photo.dng", b"raw data")
+        result = execute_operation(make_operation("photo.dng"), replace(settings, output_mode="copy"))
+
+        assert result.success
+        assert sorted(os.listdir(temp_media_dir)) == ["photo.dng", "photo.dng.json"]
+
+
+class TestMainProcess:
+    """Test --metadata-mode through mainProcess()."""
+
+    def test_dry_run_names_sidecar(self, temp_media_dir, write_sidecar):
+        Image.new("RGB", (8, 8), "red").save(os.path.join(temp_media_dir, "scan.tif"))
+        write_sidecar("scan.tif.json", "scan.tif")
+
+        result = mainProcess(temp_media_dir, CLIWindow(quiet=True), "editado", dry_run=True, metadata_mode="xmp")
+
+        [operation] = result["operations"]
+        assert os.path.basename(operation["destination"]) == "scan.tif"
+        assert os.path.basename(operation["xmp_sidecar"]) == "scan.tif.xmp"
+        assert "transform" not in operation and "exif_changes" not in operation
+
+    def test_run(self, temp_media_dir, write_sidecar):
+        Image.new("RGB", (8, 8), "red").save(os.path.join(temp_media_dir, "scan.tif"))
+        write_sidecar("scan.tif.json", "scan.tif")
+
+        result = mainProcess(temp_media_dir, CLIWindow(quiet=True), "editado", max_workers=2, metadata_mode="xmp")
+
+        assert (result["success_count"], result["error_count"]) == (1, 0)
+        assert sorted(os.listdir(os.path.join(temp_media_dir, "MatchedMedia"))) == ["scan.tif", "scan.tif.xmp"]
+
+    def test_unknown_mode(self, temp_media_dir):
+        with pytest.raises(ValueError):
+            mainProcess(temp_media_dir, CLIWindow(quiet=True), "editado", metadata_mode="iptc")